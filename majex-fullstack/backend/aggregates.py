@@ -0,0 +1,155 @@
+# backend/aggregates.py
+# Bảng tổng hợp cho dashboard admin, cập nhật tăng dần (delta) ngay trong transaction
+# của thao tác ghi: tạo hóa đơn, thanh toán, đặt / hủy booking. /admin/summary chỉ đọc
+# các bảng này (số dòng phụ thuộc số tháng x loại x trạng thái, không phụ thuộc số
+# hóa đơn / booking), nên trả lời trong thời gian gần như hằng số.
+#
+#   python aggregates.py rebuild    # tính lại toàn bộ từ bills/bookings (sửa lệch)
+import sys
+from collections import defaultdict
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import database
+import models
+
+# Trạng thái hóa đơn còn phải thu
+OUTSTANDING_BILL_STATUSES = ("Unpaid", "Overdue")
+ACTIVE_BOOKING_STATUSES = ("Confirmed",)
+
+
+def booking_month(value) -> str:
+    return value.strftime("%Y-%m") if value else ""
+
+
+def _apply(db: Session, model, keys: dict, deltas: dict):
+    """Cộng delta vào dòng tổng hợp `keys`; tạo dòng nếu chưa có."""
+    table = model.__table__
+    where = [table.c[name] == value for name, value in keys.items()]
+    values = {name: table.c[name] + delta for name, delta in deltas.items()}
+    if db.execute(update(table).where(*where).values(**values)).rowcount:
+        return
+    try:
+        # Savepoint: nếu request khác vừa tạo cùng dòng thì chỉ hủy lệnh INSERT này
+        with db.begin_nested():
+            db.execute(insert(table).values(**keys, **deltas))
+    except IntegrityError:
+        db.execute(update(table).where(*where).values(**values))
+
+
+def bills_changed(db: Session, changes):
+    """changes: các (month, type, status, count_delta, amount_delta). Gộp theo khóa trước khi ghi."""
+    merged = defaultdict(lambda: [0, 0.0])
+    for month, bill_type, status, count, amount in changes:
+        entry = merged[(month or "", bill_type or "", status or "")]
+        entry[0] += count
+        entry[1] += amount or 0
+    for (month, bill_type, status), (count, amount) in merged.items():
+        if count or amount:
+            _apply(db, models.BillSummary, {"month": month, "type": bill_type, "status": status},
+                   {"count": count, "amount": amount})
+
+
+def bills_created(db: Session, rows):
+    bills_changed(db, ((r["month"], r["type"], r["status"], 1, r["amount"]) for r in rows))
+
+
+def bill_status_changed(db: Session, bill: models.Bill, old_status: str):
+    if old_status == bill.status:
+        return
+    bills_changed(db, [
+        (bill.month, bill.type, old_status, -1, -(bill.amount or 0)),
+        (bill.month, bill.type, bill.status, 1, bill.amount or 0),
+    ])
+
+
+def bookings_changed(db: Session, changes):
+    """changes: các (facility_id, date, status, count_delta)."""
+    merged = defaultdict(int)
+    for facility_id, date, status, count in changes:
+        merged[(facility_id or "", booking_month(date), status or "")] += count
+    for (facility_id, month, status), count in merged.items():
+        if count:
+            _apply(db, models.BookingSummary, {"facility_id": facility_id, "month": month, "status": status},
+                   {"count": count})
+
+
+def booking_created(db: Session, booking: models.Booking):
+    bookings_changed(db, [(booking.facility_id, booking.date, booking.status, 1)])
+
+
+def booking_status_changed(db: Session, booking: models.Booking, old_status: str):
+    if old_status == booking.status:
+        return
+    bookings_changed(db, [
+        (booking.facility_id, booking.date, old_status, -1),
+        (booking.facility_id, booking.date, booking.status, 1),
+    ])
+
+
+# --- ĐỌC ---
+
+def get_summary(db: Session) -> dict:
+    bills = db.query(models.BillSummary).filter(models.BillSummary.count != 0) \
+        .order_by(models.BillSummary.month, models.BillSummary.type, models.BillSummary.status).all()
+    bookings = db.query(models.BookingSummary).filter(models.BookingSummary.count != 0) \
+        .order_by(models.BookingSummary.month, models.BookingSummary.facility_id, models.BookingSummary.status).all()
+    facilities = {f.id: f for f in db.query(models.Facility)}
+
+    booking_rows = []
+    for row in bookings:
+        facility = facilities.get(row.facility_id)
+        price = (facility.price or 0) if facility else 0
+        booking_rows.append({
+            "facility_id": row.facility_id,
+            "facility_name": facility.name if facility else None,
+            "month": row.month,
+            "status": row.status,
+            "count": row.count,
+            # Doanh thu tiện ích = số lượt x giá hiện tại (như màn hình quản lý tiện ích)
+            "revenue": row.count * price if row.status != "Cancelled" else 0,
+        })
+
+    return {
+        "collected": sum(r.amount for r in bills if r.status == "Paid"),
+        "outstanding": sum(r.amount for r in bills if r.status in OUTSTANDING_BILL_STATUSES),
+        "paid_bills": sum(r.count for r in bills if r.status == "Paid"),
+        "outstanding_bills": sum(r.count for r in bills if r.status in OUTSTANDING_BILL_STATUSES),
+        "active_bookings": sum(r.count for r in bookings if r.status in ACTIVE_BOOKING_STATUSES),
+        "bills": bills,
+        "bookings": booking_rows,
+    }
+
+
+# --- REBUILD ---
+
+def rebuild(db: Session):
+    """Tính lại toàn bộ bảng tổng hợp bằng GROUP BY (dùng khi nghi ngờ bị lệch)."""
+    keys = [func.coalesce(models.Bill.month, ""), func.coalesce(models.Bill.type, ""),
+            func.coalesce(models.Bill.status, "")]
+    bill_totals = select(*keys, func.count(), func.coalesce(func.sum(models.Bill.amount), 0)).group_by(*keys)
+    booking_rows = db.execute(
+        select(models.Booking.facility_id, models.Booking.date, models.Booking.status, func.count())
+        .group_by(models.Booking.facility_id, models.Booking.date, models.Booking.status)
+    ).all()
+
+    db.execute(delete(models.BillSummary))
+    db.execute(delete(models.BookingSummary))
+    db.execute(insert(models.BillSummary).from_select(["month", "type", "status", "count", "amount"], bill_totals))
+    # Gom theo tháng trong Python: hàm định dạng ngày khác nhau giữa SQL Server và SQLite
+    bookings_changed(db, booking_rows)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "rebuild":
+        session = database.SessionLocal()
+        try:
+            rebuild(session)
+            session.commit()
+        finally:
+            session.close()
+        print("✅ Aggregates rebuilt!")
+    else:
+        print("Usage: python aggregates.py rebuild")
@@ -0,0 +1,129 @@
+# backend/availability.py
+# Tính lịch trống của một tiện ích theo (facility_id, date) ngay trên server và
+# đặt chỗ có kiểm tra trùng lịch, thay cho việc frontend tải toàn bộ bookings về lọc.
+import threading
+from datetime import date as date_type, datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import aggregates
+import checkin
+import models
+
+# Các trạng thái còn chiếm chỗ trong khung giờ
+ACTIVE_STATUSES = ("Confirmed",)
+
+DEFAULT_SLOT_MINUTES = 120
+
+# Khóa theo facility trong process (bổ sung cho khóa dòng ở DB)
+_facility_locks = {}
+_facility_locks_guard = threading.Lock()
+
+
+def _facility_lock(facility_id: str) -> threading.Lock:
+    with _facility_locks_guard:
+        return _facility_locks.setdefault(facility_id, threading.Lock())
+
+
+def parse_date(value) -> date_type:
+    if isinstance(value, date_type):
+        return value
+    try:
+        return date_type.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid date, expected YYYY-MM-DD")
+
+
+def slot_times(facility: models.Facility) -> list:
+    """Các khung giờ bắt đầu ('HH:MM') từ open_time, kết thúc không quá close_time."""
+    step = timedelta(minutes=facility.slot_minutes or DEFAULT_SLOT_MINUTES)
+    try:
+        start = datetime.strptime(facility.open_time, "%H:%M")
+        end = datetime.strptime(facility.close_time, "%H:%M")
+    except (TypeError, ValueError):
+        # Dữ liệu cũ nhập trước khi FacilityCreate kiểm tra định dạng (vd: '9:00am', '')
+        raise HTTPException(status_code=422, detail="Facility opening hours must be HH:MM")
+    if step <= timedelta(0):
+        raise HTTPException(status_code=422, detail="Facility slot length must be positive")
+    slots = []
+    while start + step <= end:
+        slots.append(start.strftime("%H:%M"))
+        start += step
+    return slots
+
+
+def slot_capacity(facility: models.Facility) -> int:
+    if facility.booking_mode == "capacity":
+        return max(facility.capacity or 1, 1)
+    return 1
+
+
+def _booked_counts(db: Session, facility_id: str, date: date_type) -> dict:
+    # Dùng index (facility_id, date, time_slot) trên bookings
+    rows = db.query(models.Booking.time_slot, func.count(models.Booking.id)) \
+        .filter(models.Booking.facility_id == facility_id,
+                models.Booking.date == date,
+                models.Booking.status.in_(ACTIVE_STATUSES)) \
+        .group_by(models.Booking.time_slot).all()
+    return dict(rows)
+
+
+def get_facility(db: Session, facility_id: str, lock: bool = False) -> models.Facility:
+    query = db.query(models.Facility).filter(models.Facility.id == facility_id)
+    if lock:
+        # Khóa dòng facility tới hết transaction để các lượt đặt cùng facility chạy tuần tự
+        query = query.with_for_update().with_hint(models.Facility, "WITH (UPDLOCK, ROWLOCK)", "mssql")
+    facility = query.first()
+    if not facility:
+        raise HTTPException(status_code=404, detail="Facility not found")
+    return facility
+
+
+def get_availability(db: Session, facility_id: str, date: str) -> dict:
+    date = parse_date(date)
+    facility = get_facility(db, facility_id)
+    capacity = slot_capacity(facility)
+    counts = _booked_counts(db, facility_id, date)
+    slots = []
+    for slot in slot_times(facility):
+        booked = counts.get(slot, 0)
+        slots.append({
+            "time_slot": slot,
+            "booked": booked,
+            "remaining": max(capacity - booked, 0),
+            "available": booked < capacity,
+        })
+    return {
+        "facility_id": facility_id,
+        "date": date,
+        "booking_mode": facility.booking_mode or "slot",
+        "capacity": capacity,
+        "slots": slots,
+    }
+
+
+def reserve(db: Session, data: dict) -> models.Booking:
+    """Tạo booking nếu khung giờ còn chỗ; kiểm tra và ghi trong cùng một transaction có khóa."""
+    data = dict(data, date=parse_date(data["date"]))
+    with _facility_lock(data["facility_id"]):
+        try:
+            facility = get_facility(db, data["facility_id"], lock=True)
+            if data["time_slot"] not in slot_times(facility):
+                raise HTTPException(status_code=400, detail="Time slot is outside opening hours")
+            if data.get("status", "Confirmed") in ACTIVE_STATUSES:
+                booked = _booked_counts(db, facility.id, data["date"]).get(data["time_slot"], 0)
+                if booked >= slot_capacity(facility):
+                    raise HTTPException(status_code=409, detail="Time slot is already fully booked")
+            booking = models.Booking(**data)
+            booking.id = booking.id or models.generate_uuid()
+            checkin.assign_code(booking)
+            db.add(booking)
+            aggregates.booking_created(db, booking)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+    db.refresh(booking)
+    return booking
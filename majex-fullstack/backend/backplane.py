@@ -0,0 +1,214 @@
+# backend/backplane.py
+# Backplane pub/sub nằm dưới ConnectionManager: mọi broadcast và số người online
+# đi qua đây để nhiều worker uvicorn / nhiều máy cùng thấy một luồng sự kiện.
+#   - InProcessBackplane: chỉ một process (mặc định, như trước đây)
+#   - DatabaseBackplane: dùng chung database làm kênh sự kiện + bảng presence,
+#     chạy được với nhiều worker trên một máy hoặc nhiều máy dùng chung DB.
+# Chọn bằng biến môi trường BACKPLANE=memory|database.
+import asyncio
+import json
+import os
+import socket
+import uuid
+
+from sqlalchemy import func
+
+import database
+import models
+
+BACKPLANE = os.getenv("BACKPLANE", "memory")
+BACKPLANE_POLL_INTERVAL = float(os.getenv("BACKPLANE_POLL_INTERVAL", "0.1"))
+BACKPLANE_HEARTBEAT_INTERVAL = float(os.getenv("BACKPLANE_HEARTBEAT_INTERVAL", "5"))
+# Worker không gửi heartbeat quá lâu thì không tính vào số online nữa
+BACKPLANE_PRESENCE_TTL = 3 * BACKPLANE_HEARTBEAT_INTERVAL
+# Sự kiện cũ hơn số giây này sẽ bị dọn khỏi bảng backplane_events
+BACKPLANE_EVENT_RETENTION = 60.0
+# Khoảng trống id (transaction commit trễ) được chờ tối đa bao lâu
+BACKPLANE_GAP_TIMEOUT = 2.0
+BACKPLANE_POLL_BATCH = 500
+
+# Sự kiện nội bộ: số kết nối local của một worker
+_PRESENCE = "_presence"
+
+
+class Backplane:
+    """Giao diện chung. on_message(message) được gọi cho mọi sự kiện cần giao tới socket local."""
+
+    async def start(self, on_message):
+        raise NotImplementedError
+
+    async def stop(self):
+        pass
+
+    async def publish(self, message: dict):
+        raise NotImplementedError
+
+    async def update_presence(self, local_count: int) -> int:
+        """Cập nhật số kết nối của process này, trả về tổng số online toàn hệ thống.
+        Backplane tự báo số online mới cho các worker khác qua on_message."""
+        raise NotImplementedError
+
+
+class InProcessBackplane(Backplane):
+    def __init__(self):
+        self.on_message = None
+
+    async def start(self, on_message):
+        self.on_message = on_message
+
+    async def publish(self, message: dict):
+        await self.on_message(message)
+
+    async def update_presence(self, local_count: int) -> int:
+        return local_count
+
+
+def _fetch_events(db, after_id, gap_ids):
+    query = db.query(models.BackplaneEvent)
+    rows = query.filter(models.BackplaneEvent.id > after_id) \
+        .order_by(models.BackplaneEvent.id.asc()).limit(BACKPLANE_POLL_BATCH).all()
+    late = query.filter(models.BackplaneEvent.id.in_(gap_ids)).all() if gap_ids else []
+    return rows, late
+
+
+def _max_event_id(db):
+    return db.query(func.max(models.BackplaneEvent.id)).scalar() or 0
+
+
+def _insert_event(db, worker_id, payload):
+    event = models.BackplaneEvent(origin=worker_id, payload=payload)
+    db.add(event)
+    db.commit()
+    return event.id
+
+
+def _write_presence(db, worker_id, count):
+    now = models.now_ms()
+    updated = db.query(models.BackplanePresence) \
+        .filter(models.BackplanePresence.worker_id == worker_id) \
+        .update({"count": count, "heartbeat": now})
+    if not updated:
+        db.add(models.BackplanePresence(worker_id=worker_id, count=count, heartbeat=now))
+    db.commit()
+
+
+def _load_presence(db):
+    alive_since = models.now_ms() - BACKPLANE_PRESENCE_TTL * 1000
+    rows = db.query(models.BackplanePresence) \
+        .filter(models.BackplanePresence.heartbeat >= alive_since).all()
+    return {row.worker_id: row.count for row in rows}
+
+
+def _remove_presence(db, worker_id):
+    db.query(models.BackplanePresence).filter(models.BackplanePresence.worker_id == worker_id).delete()
+    db.commit()
+
+
+def _purge_events(db):
+    cutoff = models.now_ms() - BACKPLANE_EVENT_RETENTION * 1000
+    db.query(models.BackplaneEvent).filter(models.BackplaneEvent.created_at < cutoff).delete()
+    db.commit()
+
+
+class DatabaseBackplane(Backplane):
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"[:50]
+        self.on_message = None
+        self.last_id = 0
+        self.gaps = {}  # id còn thiếu -> hạn chờ (giây, loop time)
+        self.local_count = 0
+        # Số kết nối mới nhất của từng worker (worker_id -> (seq, count))
+        self.counts = {}
+        self.seq = 0
+        self.tasks = []
+
+    async def start(self, on_message):
+        self.on_message = on_message
+        self.last_id = await database.run_in_session(_max_event_id)
+        self.counts = {w: (0, c) for w, c in (await database.run_in_session(_load_presence)).items()}
+        self.tasks = [
+            asyncio.create_task(self._poll_loop()),
+            asyncio.create_task(self._heartbeat_loop()),
+        ]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        await database.run_in_session(_remove_presence, self.worker_id)
+
+    async def publish(self, message: dict):
+        # Giao cho socket local ngay, các worker khác nhận qua vòng poll
+        await self.on_message(message)
+        await database.run_in_session(_insert_event, self.worker_id, json.dumps(message))
+
+    def total_online(self) -> int:
+        return sum(count for _seq, count in self.counts.values())
+
+    async def update_presence(self, local_count: int) -> int:
+        self.local_count = local_count
+        self.seq += 1
+        self.counts[self.worker_id] = (self.seq, local_count)
+        # Gửi số kết nối local (không phải tổng) để worker khác tự cộng lại,
+        # tránh việc tổng cũ đến muộn ghi đè tổng mới
+        event = {"type": _PRESENCE, "worker": self.worker_id, "seq": self.seq, "count": local_count}
+        await database.run_in_session(_insert_event, self.worker_id, json.dumps(event))
+        await database.run_in_session(_write_presence, self.worker_id, local_count)
+        return self.total_online()
+
+    async def _poll_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                rows, late = await database.run_in_session(
+                    _fetch_events, self.last_id, list(self.gaps))
+                now = loop.time()
+                for row in late:
+                    self.gaps.pop(row.id, None)
+                    await self._deliver(row)
+                for row in rows:
+                    # Id bị nhảy cóc: transaction khác có thể chưa commit, đánh dấu để đọc lại
+                    for missing in range(self.last_id + 1, row.id):
+                        self.gaps[missing] = now + BACKPLANE_GAP_TIMEOUT
+                    self.last_id = row.id
+                    await self._deliver(row)
+                self.gaps = {i: exp for i, exp in self.gaps.items() if exp > now}
+                if len(rows) == BACKPLANE_POLL_BATCH:
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Backplane poll error: {e}")
+            await asyncio.sleep(BACKPLANE_POLL_INTERVAL)
+
+    async def _deliver(self, row):
+        # Sự kiện do chính worker này phát đã được giao local trong publish()
+        if row.origin == self.worker_id:
+            return
+        message = json.loads(row.payload)
+        if message.get("type") != _PRESENCE:
+            await self.on_message(message)
+            return
+        seq, _count = self.counts.get(message["worker"], (0, 0))
+        if message["seq"] > seq:
+            self.counts[message["worker"]] = (message["seq"], message["count"])
+            await self.on_message({"type": "online_count", "count": self.total_online()})
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(BACKPLANE_HEARTBEAT_INTERVAL)
+            try:
+                await database.run_in_session(_write_presence, self.worker_id, self.local_count)
+                # Bỏ các worker đã chết (hết hạn heartbeat) khỏi tổng số online
+                alive = await database.run_in_session(_load_presence)
+                self.counts = {w: v for w, v in self.counts.items() if w in alive or w == self.worker_id}
+                await database.run_in_session(_purge_events)
+            except Exception as e:
+                print(f"Backplane heartbeat error: {e}")
+
+
+def create_backplane() -> Backplane:
+    if BACKPLANE == "database":
+        return DatabaseBackplane()
+    return InProcessBackplane()
@@ -0,0 +1,245 @@
+# backend/benchmarks/load.py
+# Load benchmark: gọi song song các endpoint REST và /ws/chat của một server đang chạy,
+# báo cáo p50/p95/p99 và throughput theo từng endpoint.
+#
+#   DATABASE_URL=sqlite:///./bench.db python seed.py --synthetic
+#   DATABASE_URL=sqlite:///./bench.db uvicorn main:app --port 8000
+#   python -m benchmarks.load --url http://127.0.0.1:8000 --duration 30 --json baseline.json
+#   python -m benchmarks.load ... --compare baseline.json     # so với lần chạy trước
+#
+# Cần: httpx, websockets (pip install httpx websockets).
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import defaultdict
+from datetime import date, timedelta
+
+import httpx
+import websockets
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        # Sự kiện chỉ đếm số lượng, không đo độ trễ (vd: số frame broadcast nhận được)
+        self.counts = defaultdict(int)
+
+    def tally(self, name: str):
+        self.counts[name] += 1
+
+    def record(self, name: str, seconds: float, ok: bool = True):
+        if ok:
+            self.latencies[name].append(seconds * 1000)
+        else:
+            self.errors[name] += 1
+
+    def summary(self, elapsed: float) -> dict:
+        result = {}
+        for name in sorted(set(self.latencies) | set(self.errors) | set(self.counts)):
+            values = sorted(self.latencies[name])
+            count = len(values) + self.counts[name]
+            result[name] = {
+                "count": count,
+                "errors": self.errors[name],
+                "rps": round(count / elapsed, 1),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99),
+                "max": round(values[-1], 2) if values else None,
+            }
+        return result
+
+
+def percentile(values: list, pct: float):
+    """Nearest-rank percentile trên danh sách đã sắp xếp (ms)."""
+    if not values:
+        return None
+    rank = max(int(round(pct / 100 * len(values) + 0.5)) - 1, 0)
+    return round(values[min(rank, len(values) - 1)], 2)
+
+
+# --- REST ---
+
+def rest_scenarios(ctx: dict, writes: bool) -> list:
+    """(tên, trọng số, hàm tạo (method, path, body)) cho các endpoint được đo."""
+    today = date.today()
+
+    def resident():
+        return random.choice(ctx["residents"])
+
+    scenarios = [
+        ("GET /users", 5, lambda: ("GET", "/users?limit=50", None)),
+        ("GET /facilities", 10, lambda: ("GET", "/facilities", None)),
+        ("GET /facilities/{id}/availability", 15, lambda: (
+            "GET", f"/facilities/{random.choice(ctx['facilities'])}/availability"
+                   f"?date={today + timedelta(days=random.randint(0, 14))}", None)),
+        ("GET /bookings?userId", 10, lambda: ("GET", f"/bookings?userId={resident()}&limit=50", None)),
+        ("GET /bills/{userId}", 15, lambda: ("GET", f"/bills/{resident()}?limit=50", None)),
+        ("GET /messages", 15, lambda: ("GET", "/messages?limit=50", None)),
+        ("GET /announcements", 10, lambda: ("GET", "/announcements?limit=20", None)),
+        ("GET /reports", 5, lambda: ("GET", "/reports?limit=50", None)),
+        ("GET /sync", 5, lambda: ("GET", f"/sync?userId={resident()}", None)),
+    ]
+    if writes:
+        def booking():
+            uid = resident()
+            facility_id = random.choice(ctx["facilities"])
+            return ("POST", "/bookings", {
+                "id": str(uuid.uuid4()), "facilityId": facility_id,
+                "facilityName": "bench", "userId": uid, "userName": uid,
+                "date": str(today + timedelta(days=random.randint(30, 400))),
+                "timeSlot": random.choice(ctx["slots"][facility_id]), "qrCodeData": "bench",
+                "status": "Confirmed",
+            })
+        scenarios.append(("POST /bookings", 5, booking))
+    return scenarios
+
+
+async def rest_worker(client: httpx.AsyncClient, scenarios: list, deadline: float, recorder: Recorder):
+    names = [s[0] for s in scenarios]
+    weights = [s[1] for s in scenarios]
+    builders = dict((s[0], s[2]) for s in scenarios)
+    while time.monotonic() < deadline:
+        name = random.choices(names, weights)[0]
+        method, path, body = builders[name]()
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=body)
+            # 409 = khung giờ đã đầy: phản hồi hợp lệ của endpoint đặt chỗ
+            ok = response.status_code < 400 or response.status_code == 409
+        except httpx.HTTPError:
+            ok = False
+        recorder.record(name, time.perf_counter() - started, ok)
+
+
+# --- WEBSOCKET ---
+
+async def ws_client(url: str, user_id: str, rate: float, deadline: float, recorder: Recorder, ready: asyncio.Event):
+    """Gửi tin nhắn với tốc độ `rate`/giây, đo thời gian tới khi nhận lại broadcast của chính mình."""
+    sent = {}
+    try:
+        async with websockets.connect(url, max_queue=None) as ws:
+            await ready.wait()
+
+            async def sender():
+                while time.monotonic() < deadline:
+                    token = uuid.uuid4().hex
+                    sent[token] = time.perf_counter()
+                    await ws.send(json.dumps({"type": "message", "senderId": user_id,
+                                              "senderName": user_id, "text": token}))
+                    await asyncio.sleep(random.expovariate(rate) if rate > 0 else 1)
+
+            task = asyncio.create_task(sender())
+            try:
+                while time.monotonic() < deadline:
+                    try:
+                        raw = await asyncio.wait_for(ws.recv(), timeout=max(deadline - time.monotonic(), 0.01))
+                    except asyncio.TimeoutError:
+                        break
+                    frame = json.loads(raw)
+                    if frame.get("type") != "message":
+                        continue
+                    recorder.tally("WS fan-out (frames received)")
+                    started = sent.pop(frame.get("text"), None)
+                    if started is not None:
+                        recorder.record("WS /ws/chat round-trip", time.perf_counter() - started)
+            finally:
+                task.cancel()
+    except (OSError, websockets.WebSocketException):
+        recorder.record("WS /ws/chat round-trip", 0, ok=False)
+
+
+# --- RUNNER ---
+
+async def prepare(client: httpx.AsyncClient) -> dict:
+    # Chỉ đo khi worker đã khởi động xong (migration, pool, cache), như load balancer
+    for _ in range(300):
+        if (await client.get("/readyz")).status_code == 200:
+            break
+        await asyncio.sleep(0.1)
+    else:
+        raise SystemExit("Server is not ready (GET /readyz), check its startup log")
+    users = (await client.get("/users", params={"role": "RESIDENT", "limit": 500})).json()["items"]
+    facilities = (await client.get("/facilities", params={"paginate": "false"})).json()
+    if not users or not facilities:
+        raise SystemExit("No residents/facilities found: seed the database first (python seed.py --synthetic)")
+    slots = {}
+    for f in facilities:
+        day = (await client.get(f"/facilities/{f['id']}/availability", params={"date": str(date.today())})).json()
+        slots[f["id"]] = [s["timeSlot"] for s in day["slots"]]
+    return {"residents": [u["id"] for u in users], "facilities": [f["id"] for f in facilities], "slots": slots}
+
+
+async def run(args) -> dict:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30) as client:
+        ctx = await prepare(client)
+        scenarios = rest_scenarios(ctx, args.writes)
+        ws_url = args.url.replace("http", "ws", 1) + "/ws/chat"
+        ready = asyncio.Event()
+        started = time.monotonic()
+        deadline = started + args.duration
+        tasks = [asyncio.create_task(ws_client(ws_url, random.choice(ctx["residents"]), args.ws_rate,
+                                               deadline, recorder, ready))
+                 for _ in range(args.ws_clients)]
+        ready.set()
+        tasks += [asyncio.create_task(rest_worker(client, scenarios, deadline, recorder))
+                  for _ in range(args.concurrency)]
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - started
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "compare")},
+        "elapsed": round(elapsed, 2),
+        "endpoints": recorder.summary(elapsed),
+    }
+
+
+def print_report(result: dict, baseline: dict = None):
+    print(f"\nDuration {result['elapsed']}s, config {result['config']}")
+    header = f"{'endpoint':<38}{'count':>8}{'err':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, row in result["endpoints"].items():
+        fmt = lambda v: "-" if v is None else f"{v:.1f}"
+        print(f"{name:<38}{row['count']:>8}{row['errors']:>6}{row['rps']:>9.1f}"
+              f"{fmt(row['p50']):>9}{fmt(row['p95']):>9}{fmt(row['p99']):>9}{fmt(row['max']):>9}")
+        base = (baseline or {}).get("endpoints", {}).get(name)
+        if base and base.get("rps"):
+            change = lambda key: f"{(row[key] - base[key]) / base[key] * 100:+.0f}%" if base.get(key) and row[key] else "-"
+            print(f"{'  vs baseline':<38}{'':>8}{'':>6}{change('rps'):>9}{change('p50'):>9}"
+                  f"{change('p95'):>9}{change('p99'):>9}")
+    print("(latency in ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MajeX REST + WebSocket load benchmark")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--duration", type=float, default=30, help="giây")
+    parser.add_argument("--concurrency", type=int, default=32, help="số worker REST song song")
+    parser.add_argument("--ws-clients", type=int, default=50)
+    parser.add_argument("--ws-rate", type=float, default=1.0, help="tin nhắn/giây mỗi client WS")
+    parser.add_argument("--writes", action="store_true", help="thêm POST /bookings vào tải")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="lưu kết quả ra file JSON (dùng làm baseline)")
+    parser.add_argument("--compare", help="file JSON baseline để so sánh")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    result = asyncio.run(run(args))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# backend/benchmarks/serialization.py
+# Micro-benchmark: so sánh đường serialize mặc định (ORM object + validate response_model
+# + json stdlib, như FastAPI làm) với đường nhanh trong serialization.py trên cùng một
+# truy vấn. Chạy trực tiếp trên DB (không qua HTTP) và kiểm tra hai body giống hệt nhau.
+#
+#   DATABASE_URL=sqlite:///./bench.db python seed.py --synthetic
+#   DATABASE_URL=sqlite:///./bench.db python -m benchmarks.serialization --rows 1000 --repeat 20
+import argparse
+import json
+import statistics
+import time
+from typing import List
+
+from pydantic import TypeAdapter
+
+import database
+import models
+import schemas
+import serialization
+
+LISTS = {
+    "bookings": (models.Booking, schemas.BookingOut, [models.Booking.date, models.Booking.id]),
+    "bills": (models.Bill, schemas.BillOut, [models.Bill.due_date, models.Bill.id]),
+    "reports": (models.Report, schemas.ReportOut, [models.Report.timestamp, models.Report.id]),
+    "messages": (models.Message, schemas.MessageOut, [models.Message.timestamp, models.Message.id]),
+}
+
+
+def default_path(db, model, schema, keys, rows: int) -> bytes:
+    adapter = TypeAdapter(List[schema])
+    db.expunge_all()  # như một request mới: không dùng lại object trong identity map
+    objects = db.query(model).order_by(*keys).limit(rows).all()
+    content = adapter.dump_python(adapter.validate_python(objects, from_attributes=True),
+                                  mode="json", by_alias=True)
+    # Cùng tùy chọn với starlette JSONResponse
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(db, fast: serialization.ListSerializer, model, keys, rows: int) -> bytes:
+    result = db.query(model).with_entities(*fast.columns).order_by(*keys).limit(rows).all()
+    return serialization.dumps(fast.items(result))
+
+
+def measure(fn, repeat: int) -> tuple:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description="So sánh đường serialize mặc định và đường nhanh")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--lists", default=",".join(LISTS), help="danh sách cần đo, cách nhau bởi dấu phẩy")
+    args = parser.parse_args()
+
+    encoder = "orjson" if serialization.orjson is not None else "json"
+    print(f"{args.rows} rows x {args.repeat} lần, encoder đường nhanh: {encoder}")
+    print(f"{'list':<10} {'default p50':>12} {'fast p50':>10} {'speedup':>8} {'bytes':>9}  identical")
+    db = database.SessionLocal()
+    try:
+        for name in args.lists.split(","):
+            model, schema, keys = LISTS[name]
+            fast = serialization.ListSerializer(model, schema)
+            slow_ms, slow_body = measure(lambda: default_path(db, model, schema, keys, args.rows), args.repeat)
+            fast_ms, fast_body = measure(lambda: fast_path(db, fast, model, keys, args.rows), args.repeat)
+            slow, quick = statistics.median(slow_ms), statistics.median(fast_ms)
+            print(f"{name:<10} {slow:>10.2f}ms {quick:>8.2f}ms {slow / quick:>7.1f}x {len(fast_body):>9}  "
+                  f"{'yes' if slow_body == fast_body else 'NO'}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# backend/benchmarks/ws_protocol.py
+# Micro-benchmark cho /ws/chat: so sánh giao thức JSON (mỗi sự kiện một text frame) với
+# "majex.v2" (MessagePack, gom sự kiện theo cửa sổ, số online chỉ gửi khi đổi), có và không
+# có permessage-deflate. Chạy ConnectionManager thật trong process với socket giả: phát M tin
+# nhắn chat (kèm số online thay đổi liên tục) tới N kết nối, rồi báo số byte trên dây và CPU
+# cho mỗi tin nhắn đã giao. Deflate được mô phỏng như websockets làm (raw deflate, giữ
+# context giữa các frame, bỏ 4 byte đuôi 00 00 ff ff).
+#
+#   python -m benchmarks.ws_protocol --connections 200 --messages 2000
+import argparse
+import asyncio
+import json
+import random
+import time
+import zlib
+
+import realtime
+
+TAIL = b"\x00\x00\xff\xff"
+
+
+class FakeWebSocket:
+    def __init__(self, subprotocols, deflate: bool, keep: bool = False):
+        self.scope = {"subprotocols": subprotocols}
+        self.client = None
+        self.compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS) if deflate else None
+        self.frames = 0
+        self.payload_bytes = 0
+        self.wire_bytes = 0
+        self.received = [] if keep else None
+
+    async def accept(self, subprotocol=None):
+        self.subprotocol = subprotocol
+
+    async def close(self, code=1000):
+        pass
+
+    def _write(self, data: bytes):
+        self.frames += 1
+        self.payload_bytes += len(data)
+        if self.compressor is not None:
+            data = self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data.endswith(TAIL):
+                data = data[:-4]
+        # Header frame server -> client: 2 byte, +2 nếu payload >= 126, +8 nếu >= 64KiB
+        self.wire_bytes += len(data) + (2 if len(data) < 126 else 4 if len(data) < 65536 else 10)
+
+    async def send_text(self, text: str):
+        data = text.encode("utf-8")
+        self._write(data)
+        if self.received is not None:
+            self.received.append(json.loads(data))
+
+    async def send_bytes(self, data: bytes):
+        self._write(data)
+        if self.received is not None:
+            self.received.extend(realtime.msgpack.unpackb(data))
+
+
+def chat_frames(count: int, seed: int = 1) -> list:
+    rnd = random.Random(seed)
+    words = ["chào", "mọi", "người", "thang", "máy", "tầng", "bể", "bơi", "hôm", "nay", "sửa", "điện",
+             "nước", "phí", "dịch", "vụ", "ok", "cảm", "ơn", "ban", "quản", "lý", "bãi", "xe"]
+    started = 1765000000000
+    return [{
+        "type": "message",
+        "id": 1000000 + i,
+        "senderId": f"user{rnd.randint(1, 10000)}",
+        "senderName": f"Resident {rnd.randint(1, 10000)}",
+        "text": " ".join(rnd.choice(words) for _ in range(rnd.randint(3, 20))),
+        "timestamp": started + i * 250,
+    } for i in range(count)]
+
+
+async def run(protocol: str, deflate: bool, args, frames: list) -> dict:
+    manager = realtime.ConnectionManager(max_queue=100000, max_lag=3600)
+    subprotocols = [realtime.PROTOCOL_V2] if protocol == "msgpack" else []
+    sockets = [FakeWebSocket(subprotocols, deflate, keep=i == 0) for i in range(args.connections)]
+    for ws in sockets:
+        await manager.connect(ws)
+        manager.connections[ws].batch_window = args.window / 1000
+    await manager.start()
+    online = 5000
+    expected = []
+    started = time.process_time()
+    for i, frame in enumerate(frames):
+        await manager.broadcast(frame)
+        expected.append(frame)
+        if i % args.presence_every == 0:
+            # Cư dân vào / ra liên tục: mỗi lần là một sự kiện online_count
+            online += random.choice((-1, 1))
+            await manager.deliver_local({"type": "online_count", "count": online})
+        if i % args.burst == args.burst - 1:
+            # Nhường event loop sau mỗi đợt tin (giống tin đến sát nhau rồi nghỉ)
+            await asyncio.sleep(args.gap / 1000)
+    while any(conn.pending or conn.presence != conn.presence_sent for conn in manager.connections.values()):
+        await asyncio.sleep(0.005)
+    cpu = time.process_time() - started
+    await manager.stop()
+    for ws in list(manager.connections):
+        manager.disconnect(ws)
+
+    sample = sockets[0].received
+    messages = [m for m in sample if m.get("type") == "message"]
+    presence = [m["count"] for m in sample if m.get("type") == "online_count"]
+    delivered = len(frames) * len(sockets)
+    return {
+        "name": protocol + ("+deflate" if deflate else ""),
+        "identical": messages == expected and (not presence or presence[-1] == online),
+        "frames": sum(ws.frames for ws in sockets) / len(sockets),
+        "presence": len(presence),
+        "payload": sum(ws.payload_bytes for ws in sockets) / delivered,
+        "wire": sum(ws.wire_bytes for ws in sockets) / delivered,
+        "cpu_us": cpu / delivered * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="So sánh giao thức WebSocket JSON và MessagePack (majex.v2)")
+    parser.add_argument("--connections", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--burst", type=int, default=20, help="số tin phát liền nhau trước mỗi lần nghỉ")
+    parser.add_argument("--gap", type=float, default=5, help="ms nghỉ giữa các đợt tin")
+    parser.add_argument("--presence-every", type=int, default=4, help="số online đổi sau mỗi N tin")
+    parser.add_argument("--window", type=float, default=realtime.WS_BATCH_WINDOW * 1000,
+                        help="cửa sổ gom (ms) cho majex.v2")
+    args = parser.parse_args()
+    if realtime.msgpack is None:
+        raise SystemExit("msgpack chưa được cài: pip install msgpack")
+
+    frames = chat_frames(args.messages)
+    print(f"{args.connections} kết nối x {args.messages} tin, online đổi sau mỗi {args.presence_every} tin, "
+          f"cửa sổ gom {args.window:g}ms")
+    print(f"{'protocol':<17} {'frames/conn':>11} {'presence':>9} {'payload B/msg':>14} {'wire B/msg':>11} "
+          f"{'CPU us/msg':>11}  identical")
+    baseline = None
+    for protocol in ("json", "msgpack"):
+        for deflate in (False, True):
+            random.seed(2)
+            r = asyncio.run(run(protocol, deflate, args, frames))
+            baseline = baseline or r
+            print(f"{r['name']:<17} {r['frames']:>11.0f} {r['presence']:>9} {r['payload']:>14.1f} "
+                  f"{r['wire']:>11.1f} {r['cpu_us']:>11.2f}  {'yes' if r['identical'] else 'NO'}"
+                  f"   ({r['wire'] / baseline['wire']:.0%} bytes, {r['cpu_us'] / baseline['cpu_us']:.0%} CPU)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+# backend/billing.py
+# Tạo hóa đơn hàng loạt: import CSV/NDJSON dạng stream hoặc chạy theo mẫu (rules)
+# cho toàn bộ resident. Dữ liệu được parse, kiểm tra và ghi theo từng chunk bằng
+# executemany nên bộ nhớ không phụ thuộc kích thước file. Idempotent theo
+# (user_id, type, month): dòng đã tồn tại sẽ được bỏ qua chứ không tạo trùng.
+import csv
+import json
+import time
+from datetime import date
+
+from sqlalchemy import insert, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import aggregates
+import notifications
+import database
+import models
+
+BILLING_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+# Cho phép header kiểu camelCase giống JSON của frontend
+FIELD_ALIASES = {"userId": "user_id", "dueDate": "due_date", "paidDate": "paid_date"}
+BILL_STATUSES = ("Unpaid", "Paid", "Overdue")
+
+
+class BillingReport:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.received = 0
+        self.inserted = 0
+        self.skipped = 0
+        self.failed = 0
+        self.chunks = 0
+        self.errors = []
+
+    def error(self, line: int, message: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "received": self.received,
+            "inserted": self.inserted,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "chunks": self.chunks,
+            "elapsedMs": round((time.monotonic() - self.started) * 1000, 1),
+            "errors": self.errors,
+        }
+
+
+def validate_row(raw: dict) -> dict:
+    """Chuẩn hóa một dòng hóa đơn, ném ValueError nếu dữ liệu không hợp lệ."""
+    row = {FIELD_ALIASES.get(k, k): v for k, v in raw.items() if v not in (None, "")}
+    for field in ("user_id", "type", "amount", "due_date", "month"):
+        if field not in row:
+            raise ValueError(f"missing {field}")
+    status = row.get("status", "Unpaid")
+    if status not in BILL_STATUSES:
+        raise ValueError(f"invalid status {status!r}")
+    amount = float(row["amount"])
+    if amount < 0:
+        raise ValueError("amount must not be negative")
+    due_date = row["due_date"] if isinstance(row["due_date"], date) else date.fromisoformat(str(row["due_date"]))
+    paid_date = row.get("paid_date")
+    if paid_date is not None and not isinstance(paid_date, date):
+        paid_date = date.fromisoformat(str(paid_date))
+    return {
+        "id": str(row.get("id") or models.generate_uuid()),
+        "user_id": str(row["user_id"]),
+        "type": str(row["type"]),
+        "amount": amount,
+        "due_date": due_date,
+        "status": status,
+        "month": str(row["month"]),
+        "paid_date": paid_date,
+    }
+
+
+def _key(row: dict) -> tuple:
+    return (row["user_id"], row["type"], row["month"])
+
+
+def insert_chunk(db: Session, rows: list, notify: bool = True) -> tuple:
+    """Ghi một chunk, bỏ qua các hóa đơn (user_id, type, month) đã có. Trả về (inserted, skipped, unknown_users).
+    notify=True: báo cho từng user có hóa đơn mới (cùng transaction với hóa đơn)."""
+    user_ids = {row["user_id"] for row in rows}
+    known_users = {uid for (uid,) in db.query(models.User.id).filter(models.User.id.in_(user_ids))}
+    unknown = [row for row in rows if row["user_id"] not in known_users]
+    rows = [row for row in rows if row["user_id"] in known_users]
+
+    keys = {_key(row) for row in rows}
+    existing = set()
+    if keys:
+        query = db.query(models.Bill.user_id, models.Bill.type, models.Bill.month)
+        if db.bind.dialect.name == "mssql":
+            # SQL Server không hỗ trợ IN trên tuple: lọc thô theo user + tháng rồi so khớp trong Python
+            query = query.filter(models.Bill.user_id.in_({k[0] for k in keys}),
+                                 models.Bill.month.in_({k[2] for k in keys}))
+        else:
+            query = query.filter(tuple_(models.Bill.user_id, models.Bill.type, models.Bill.month).in_(keys))
+        existing = {tuple(k) for k in query} & keys
+
+    fresh, seen = [], set()
+    for row in rows:
+        key = _key(row)
+        if key in existing or key in seen:
+            continue
+        seen.add(key)
+        fresh.append(row)
+
+    if fresh:
+        now = models.utcnow()
+        for row in fresh:
+            row["updated_at"] = now
+        try:
+            db.execute(insert(models.Bill.__table__), fresh)
+            aggregates.bills_created(db, fresh)
+            if notify:
+                notifications.bills_issued(db, fresh)
+            db.commit()
+        except IntegrityError:
+            # Import khác chạy song song vừa ghi cùng khóa: ghi lại từng dòng
+            db.rollback()
+            inserted = 0
+            for row in fresh:
+                try:
+                    db.execute(insert(models.Bill.__table__), row)
+                    aggregates.bills_created(db, [row])
+                    if notify:
+                        notifications.bills_issued(db, [row])
+                    db.commit()
+                    inserted += 1
+                except IntegrityError:
+                    db.rollback()
+            return inserted, len(rows) - inserted, unknown
+    return len(fresh), len(rows) - len(fresh), unknown
+
+
+async def _flush(pending: list, report: BillingReport, notify: bool = True):
+    lines = [line for line, _row in pending]
+    rows = [row for _line, row in pending]
+    inserted, skipped, unknown = await database.run_in_session(insert_chunk, rows, notify)
+    report.inserted += inserted
+    report.skipped += skipped
+    report.chunks += 1
+    unknown_ids = {id(row) for row in unknown}
+    for line, row in zip(lines, rows):
+        if id(row) in unknown_ids:
+            report.error(line, f"unknown user {row['user_id']!r}")
+
+
+async def _iter_lines(chunks):
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8-sig").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8-sig").rstrip("\r")
+
+
+async def import_stream(chunks, fmt: str) -> dict:
+    """Import từ một async iterator các chunk bytes (CSV có header, hoặc NDJSON)."""
+    report = BillingReport()
+    pending = []
+    header = None
+    line_no = 0
+    async for line in _iter_lines(chunks):
+        line_no += 1
+        if not line.strip():
+            continue
+        if fmt == "csv" and header is None:
+            header = [FIELD_ALIASES.get(h.strip(), h.strip()) for h in next(csv.reader([line]))]
+            continue
+        report.received += 1
+        try:
+            if fmt == "csv":
+                raw = dict(zip(header, next(csv.reader([line]))))
+            else:
+                raw = json.loads(line)
+                if not isinstance(raw, dict):
+                    raise ValueError("expected a JSON object")
+            pending.append((line_no, validate_row(raw)))
+        except (ValueError, TypeError) as e:
+            report.error(line_no, str(e))
+        if len(pending) >= BILLING_CHUNK_SIZE:
+            await _flush(pending, report)
+            pending = []
+    if pending:
+        await _flush(pending, report)
+    return report.as_dict()
+
+
+def _resident_ids(db: Session, after: str, limit: int) -> list:
+    query = db.query(models.User.id).filter(models.User.role == "RESIDENT", models.User.status == "Active")
+    if after is not None:
+        query = query.filter(models.User.id > after)
+    return [uid for (uid,) in query.order_by(models.User.id).limit(limit)]
+
+
+async def run_template(month: str, due_date: date, items: list) -> dict:
+    """Phát hành hóa đơn `items` (type, amount) cho mọi resident đang Active trong tháng `month`."""
+    report = BillingReport()
+    per_chunk = max(BILLING_CHUNK_SIZE // max(len(items), 1), 1)
+    after = None
+    while True:
+        # Duyệt resident theo keyset để không nạp cả bảng users vào bộ nhớ
+        user_ids = await database.run_in_session(_resident_ids, after, per_chunk)
+        if not user_ids:
+            break
+        after = user_ids[-1]
+        pending = []
+        for uid in user_ids:
+            for item in items:
+                report.received += 1
+                pending.append((0, validate_row({
+                    "user_id": uid, "type": item["type"], "amount": item["amount"],
+                    "due_date": due_date, "month": month,
+                })))
+        # Không báo từng người: cả đợt phát hành chỉ cần một thông báo chung ở cuối
+        await _flush(pending, report, notify=False)
+    if report.inserted:
+        await database.run_in_session(_announce_run, month, due_date, items)
+    return report.as_dict()
+
+
+def _announce_run(db: Session, month: str, due_date: date, items: list):
+    notifications.notify(db, "all", "", "bill", f"Hóa đơn tháng {month} đã được phát hành",
+                         f"{', '.join(item['type'] for item in items)} - hạn thanh toán {due_date.isoformat()}")
+    db.commit()
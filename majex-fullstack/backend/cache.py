@@ -0,0 +1,166 @@
+# backend/cache.py
+# Cache đọc-xuyên (read-through) trong process cho dữ liệu ít thay đổi
+# (facilities, users, announcements). Lưu sẵn body JSON đã encode kèm ETag mạnh,
+# hết hạn theo TTL và loại bỏ theo LRU. Các handler POST/PUT gọi invalidate()
+# cho đúng namespace sau khi commit: cache của worker hiện tại bị xóa ngay, các worker
+# khác nhận sự kiện qua backplane (với BACKPLANE=database: trễ khoảng một chu kỳ poll).
+import asyncio
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "30"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "256"))
+
+# Sự kiện nội bộ trên backplane (không gửi cho client), xem ConnectionManager.deliver_local
+INVALIDATE = "cache_invalidate"
+# Nhận diện worker này để bỏ qua sự kiện do chính nó phát (cache local đã được xóa)
+WORKER_ID = uuid.uuid4().hex
+
+
+class CacheEntry:
+    __slots__ = ("body", "etag", "expires_at")
+
+    def __init__(self, body: bytes, etag: str, expires_at: float):
+        self.body = body
+        self.etag = etag
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    def __init__(self, ttl: float = CACHE_TTL_SECONDS, max_entries: int = CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (namespace, key) -> CacheEntry
+        # Tăng mỗi lần invalidate; kết quả load xong sau khi bị invalidate sẽ không được lưu
+        self.generations = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.not_modified = 0
+
+    def get(self, namespace: str, key: str):
+        with self.lock:
+            entry = self.entries.get((namespace, key))
+            if entry is None or entry.expires_at <= time.monotonic():
+                if entry is not None:
+                    del self.entries[(namespace, key)]
+                self.misses += 1
+                return None
+            self.entries.move_to_end((namespace, key))
+            self.hits += 1
+            return entry
+
+    def generation(self, namespace: str) -> int:
+        return self.generations.get(namespace, 0)
+
+    def set(self, namespace: str, key: str, body: bytes, generation: int = None) -> CacheEntry:
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        entry = CacheEntry(body, etag, time.monotonic() + self.ttl)
+        with self.lock:
+            if generation is not None and generation != self.generation(namespace):
+                return entry
+            self.entries[(namespace, key)] = entry
+            self.entries.move_to_end((namespace, key))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def invalidate(self, namespace: str):
+        with self.lock:
+            self.generations[namespace] = self.generation(namespace) + 1
+            for cache_key in [k for k in self.entries if k[0] == namespace]:
+                del self.entries[cache_key]
+            self.invalidations += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRatio": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "notModified": self.not_modified,
+            }
+
+
+response_cache = ResponseCache()
+
+_publisher = None  # (event loop, coroutine function phát một frame qua backplane)
+
+
+def attach(loop, publish):
+    """Gọi lúc khởi động: publish(frame) là coroutine phát frame qua backplane."""
+    global _publisher
+    _publisher = (loop, publish)
+
+
+def _schedule(publish, frame):
+    asyncio.ensure_future(publish(frame))
+
+
+def invalidate(namespace: str):
+    """Xóa namespace khỏi cache của mọi worker. Gọi được từ endpoint sync (thread pool) lẫn async."""
+    response_cache.invalidate(namespace)
+    if _publisher is not None:
+        loop, publish = _publisher
+        loop.call_soon_threadsafe(_schedule, publish, {"type": INVALIDATE, "namespace": namespace,
+                                                       "origin": WORKER_ID})
+
+
+def on_invalidate(message: dict):
+    """Sự kiện INVALIDATE từ backplane."""
+    if message.get("origin") != WORKER_ID:
+        response_cache.invalidate(message["namespace"])
+
+_adapters = {}
+
+
+def render(response_type, data) -> bytes:
+    """Encode dữ liệu theo response_model (alias camelCase) giống output của FastAPI."""
+    adapter = _adapters.get(response_type)
+    if adapter is None:
+        adapter = _adapters[response_type] = TypeAdapter(response_type)
+    return adapter.dump_json(adapter.validate_python(data, from_attributes=True), by_alias=True)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+async def warm(namespace: str, key: str, response_type, load) -> CacheEntry:
+    """Nạp `await load()` vào cache (key = query string của request, vd: "" hoặc "paginate=false")."""
+    generation = response_cache.generation(namespace)
+    return response_cache.set(namespace, key, render(response_type, await load()), generation)
+
+
+async def cached_response(request: Request, namespace: str, response_type, load) -> Response:
+    """Trả body từ cache (hoặc gọi `await load()` khi miss); 304 nếu If-None-Match khớp ETag."""
+    key = str(request.url.query)
+    entry = response_cache.get(namespace, key)
+    if entry is None:
+        entry = await warm(namespace, key, response_type, load)
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+        response_cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
@@ -0,0 +1,160 @@
+# backend/chat_history.py
+# Lịch sử chat gần đây giữ trong bộ nhớ (ring buffer) để client mở /ws/chat nhận ngay
+# N tin nhắn cuối, thay cho GET /messages trả cả bảng. Buffer được nạp từ DB một lần
+# lúc khởi động, sau đó đường broadcast (kể cả tin từ worker khác qua backplane) thêm
+# tin mới vào, nên buffer luôn là một đoạn liên tục từ tin cũ nhất của nó tới hiện tại.
+# Tin cũ hơn được client xin thêm bằng frame {"type": "backfill", "cursor": ...} với
+# cursor (timestamp, id); chỉ khi vượt quá phần có trong buffer mới đọc một trang từ DB.
+import asyncio
+import bisect
+import os
+
+from fastapi import HTTPException
+
+import database
+import models
+import pagination
+
+CHAT_HISTORY_SIZE = int(os.getenv("CHAT_HISTORY_SIZE", "1000"))
+# Số tin nhắn gửi kèm lúc mới kết nối
+CHAT_HISTORY_ON_CONNECT = int(os.getenv("CHAT_HISTORY_ON_CONNECT", "50"))
+CHAT_BACKFILL_MAX = 200
+
+_COLUMNS = (models.Message.id, models.Message.sender_id, models.Message.sender_name,
+            models.Message.text, models.Message.timestamp)
+_KEYS = [models.Message.timestamp, models.Message.id]
+
+
+def to_frame(row) -> dict:
+    """Tin nhắn (dict/Row có các cột của messages) -> frame gửi qua WebSocket."""
+    return {
+        "type": "message",
+        "id": row["id"],
+        "senderId": row["sender_id"],
+        "senderName": row["sender_name"],
+        "text": row["text"],
+        "timestamp": models.to_ms(row["timestamp"]),
+    }
+
+
+def _sort_key(frame: dict) -> tuple:
+    # Cùng khóa với index (timestamp, id); from_ms(to_ms(x)) trả lại đúng x tới micro giây
+    return (models.from_ms(frame["timestamp"]), frame["id"])
+
+
+def history_frame(frames: list, cursor, has_more: bool) -> dict:
+    return {"type": "history", "messages": frames, "cursor": cursor if has_more else None, "hasMore": has_more}
+
+
+class RecentMessages:
+    """Các tin nhắn mới nhất, sắp theo (timestamp, id). Chỉ dùng trên event loop."""
+
+    def __init__(self, capacity: int = CHAT_HISTORY_SIZE):
+        self.capacity = capacity
+        self.keys = []
+        self.frames = []
+        self.ids = set()
+        self.primed = False
+        # True khi buffer chứa toàn bộ lịch sử (DB có ít tin hơn capacity và chưa bị đẩy ra)
+        self.complete = False
+
+    def add(self, frame: dict):
+        if frame["id"] in self.ids:
+            return
+        key = _sort_key(frame)
+        # Tin thường đến đúng thứ tự nên gần như luôn chèn ở cuối
+        index = bisect.bisect(self.keys, key)
+        self.keys.insert(index, key)
+        self.frames.insert(index, frame)
+        self.ids.add(frame["id"])
+        excess = len(self.keys) - self.capacity
+        if excess > 0:
+            for old in self.frames[:excess]:
+                self.ids.discard(old["id"])
+            del self.keys[:excess]
+            del self.frames[:excess]
+            self.complete = False
+
+    def prime(self, frames: list):
+        self.complete = len(frames) < self.capacity
+        for frame in frames:
+            self.add(frame)
+        self.primed = True
+
+    def _page(self, end: int, limit: int) -> dict:
+        start = max(end - limit, 0)
+        has_more = start > 0 or not self.complete
+        cursor = pagination.encode_cursor(self.keys[start]) if start < end else None
+        return history_frame(self.frames[start:end], cursor, has_more)
+
+    def latest(self, limit: int) -> dict:
+        return self._page(len(self.frames), limit)
+
+    def before(self, key: tuple, limit: int):
+        """Trang tin nhắn ngay trước `key`, hoặc None nếu buffer không đủ để trả lời."""
+        if not self.primed:
+            return None
+        end = bisect.bisect_left(self.keys, key)
+        if end < limit and not self.complete:
+            return None
+        return self._page(end, limit)
+
+
+def _load_latest(db, limit: int) -> list:
+    rows = db.query(*_COLUMNS).order_by(*(k.desc() for k in _KEYS)).limit(limit).all()
+    return [to_frame(row._mapping) for row in reversed(rows)]
+
+
+def _load_before(db, cursor: str, limit: int) -> dict:
+    rows, next_cursor = pagination.paginate(db.query(*_COLUMNS), _KEYS, cursor, limit, descending=True)
+    return history_frame([to_frame(row._mapping) for row in reversed(rows)], next_cursor, next_cursor is not None)
+
+
+class ChatHistory:
+    def __init__(self, capacity: int = CHAT_HISTORY_SIZE):
+        self.buffer = RecentMessages(capacity)
+        self.prime_lock = asyncio.Lock()
+        self.buffer_hits = 0
+        self.db_pages = 0
+
+    async def prime(self):
+        """Nạp các tin nhắn mới nhất từ DB (một lần); tin broadcast trong lúc nạp được gộp theo id."""
+        async with self.prime_lock:
+            if self.buffer.primed:
+                return
+            frames = await database.run_in_session(_load_latest, self.buffer.capacity)
+            self.buffer.prime(frames)
+
+    def add(self, frame: dict):
+        self.buffer.add(frame)
+
+    async def on_connect(self, limit: int = CHAT_HISTORY_ON_CONNECT) -> dict:
+        if not self.buffer.primed:
+            try:
+                await self.prime()
+            except Exception as e:
+                # DB lỗi: vẫn gửi những gì đang có, client có thể backfill sau
+                print(f"Chat history prime error: {e}")
+        self.buffer_hits += 1
+        return self.buffer.latest(limit)
+
+    async def backfill(self, cursor: str, limit=None) -> dict:
+        if not cursor:
+            raise HTTPException(status_code=400, detail="backfill requires a cursor")
+        try:
+            limit = min(max(int(limit or CHAT_HISTORY_ON_CONNECT), 1), CHAT_BACKFILL_MAX)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid limit")
+        key = tuple(pagination.decode_keys(cursor, _KEYS))
+        # Bộ đệm chỉ so sánh được khóa đầy đủ; cursor có timestamp NULL thì đọc thẳng từ DB
+        page = self.buffer.before(key, limit) if None not in key else None
+        if page is not None:
+            self.buffer_hits += 1
+            return page
+        self.db_pages += 1
+        return await database.run_in_session(_load_before, cursor, limit)
+
+    def stats(self) -> dict:
+        return {"buffered": len(self.buffer.frames), "capacity": self.buffer.capacity,
+                "primed": self.buffer.primed, "complete": self.buffer.complete,
+                "bufferHits": self.buffer_hits, "dbPages": self.db_pages}
@@ -0,0 +1,227 @@
+# backend/checkin.py
+# Xác thực mã QR ở cổng (AdminScanner) và check-in một lần cho mỗi booking.
+# - Mã mới là token ký HMAC gọn "MJ1.<booking id>.<YYYYMMDD>.<chữ ký>": mã giả / sửa
+#   hoặc sai ngày bị từ chối ngay mà không cần đọc DB.
+# - Booking của hôm nay được nạp sẵn vào cache trong bộ nhớ (một truy vấn theo ngày);
+#   mã cũ (chuỗi tự do do frontend tạo trước đây) được tra qua cột qr_hash có index.
+# - Check-in là một câu UPDATE có điều kiện (còn Confirmed, chưa check-in) nên một mã
+#   không dùng được hai lần, kể cả khi nhiều máy quét / nhiều worker quét cùng lúc.
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from datetime import date, datetime
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+import models
+
+# Khóa ký mã QR. Bắt buộc đặt QR_SECRET; khóa mặc định (công khai trong mã nguồn) chỉ được
+# dùng khi bật rõ chế độ phát triển MAJEX_DEV=1. Thiếu khóa: server không khởi động và
+# không cấp / xác thực token nào (ai cũng có thể tự ký mã với một khóa công khai).
+MAJEX_DEV = os.getenv("MAJEX_DEV", "0") == "1"
+DEV_QR_SECRET = "majex-dev-qr-secret"
+QR_SECRET = (os.getenv("QR_SECRET") or (DEV_QR_SECRET if MAJEX_DEV else "")).encode()
+# Nạp lại booking hôm nay sau N giây (bắt kịp thay đổi từ worker khác)
+CHECKIN_CACHE_TTL = float(os.getenv("CHECKIN_CACHE_TTL", "300"))
+
+TOKEN_PREFIX = "MJ1"
+SIGNATURE_BYTES = 12
+
+_FIELDS = ("id", "facility_id", "facility_name", "user_id", "user_name", "date", "time_slot",
+           "qr_code_data", "qr_hash", "status", "checked_in_at")
+
+MESSAGES = {
+    "ok": "Hợp lệ",
+    "checked_in": "Check-in thành công",
+    "invalid": "Mã không hợp lệ",
+    "wrong_date": "Mã không dành cho hôm nay",
+    "wrong_facility": "Mã dành cho tiện ích khác",
+    "not_active": "Booking đã bị hủy hoặc đã kết thúc",
+    "already_checked_in": "Mã đã được sử dụng",
+}
+
+
+# --- TOKEN ---
+
+def require_secret():
+    """Gọi lúc khởi động: lỗi ngay nếu chưa cấu hình khóa ký."""
+    if not QR_SECRET:
+        raise RuntimeError("QR_SECRET is not set (set MAJEX_DEV=1 to use the development key)")
+
+
+def _sign(booking_id: str, day: str) -> str:
+    require_secret()
+    digest = hmac.new(QR_SECRET, f"{booking_id}.{day}".encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:SIGNATURE_BYTES]).decode()
+
+
+def issue_token(booking_id: str, booking_date: date) -> str:
+    day = booking_date.strftime("%Y%m%d")
+    return f"{TOKEN_PREFIX}.{booking_id}.{day}.{_sign(booking_id, day)}"
+
+
+def parse_token(code: str):
+    """(booking_id, date) nếu là token hợp lệ; None nếu là mã kiểu cũ; ValueError nếu chữ ký sai."""
+    if not code.startswith(TOKEN_PREFIX + "."):
+        return None
+    try:
+        booking_id, day, signature = code[len(TOKEN_PREFIX) + 1:].rsplit(".", 2)
+        booking_date = datetime.strptime(day, "%Y%m%d").date()
+    except ValueError:
+        raise ValueError("malformed token")
+    if not booking_id or not hmac.compare_digest(signature, _sign(booking_id, day)):
+        raise ValueError("bad signature")
+    return booking_id, booking_date
+
+
+def code_hash(code: str) -> str:
+    return hashlib.sha256(code.encode()).hexdigest()
+
+
+def assign_code(booking: models.Booking):
+    """Cấp token ký cho booking mới (thay cho chuỗi tự sinh ở client)."""
+    booking.qr_code_data = issue_token(booking.id, booking.date)
+    booking.qr_hash = code_hash(booking.qr_code_data)
+
+
+# --- CACHE BOOKING HÔM NAY ---
+
+class TodayCache:
+    def __init__(self, ttl: float = CHECKIN_CACHE_TTL):
+        self.ttl = ttl
+        self.day = None
+        self.loaded_at = 0.0
+        self.by_id = {}
+        self.by_hash = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _stale(self, today: date) -> bool:
+        return self.day != today or time.monotonic() - self.loaded_at > self.ttl
+
+    def load(self, db: Session, today: date = None):
+        """Nạp toàn bộ booking của hôm nay (index (date, id)); gọi lại khi sang ngày hoặc hết TTL."""
+        today = today or date.today()
+        columns = [getattr(models.Booking, name) for name in _FIELDS]
+        rows = db.query(*columns).filter(models.Booking.date == today).all()
+        by_id = {row.id: dict(row._mapping) for row in rows}
+        with self.lock:
+            self.day = today
+            self.loaded_at = time.monotonic()
+            self.by_id = by_id
+            self.by_hash = {entry["qr_hash"]: entry for entry in by_id.values() if entry["qr_hash"]}
+
+    def lookup(self, db: Session, booking_id: str = None, hashed: str = None, today: date = None):
+        today = today or date.today()
+        if self._stale(today):
+            self.load(db, today)
+        with self.lock:
+            entry = self.by_id.get(booking_id) if booking_id else self.by_hash.get(hashed)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        # Booking tạo sau lần nạp, hoặc không phải của hôm nay: tra thẳng theo khóa chính / qr_hash
+        column = models.Booking.id if booking_id else models.Booking.qr_hash
+        row = db.query(*[getattr(models.Booking, name) for name in _FIELDS]) \
+            .filter(column == (booking_id or hashed)).first()
+        if row is None:
+            return None
+        entry = dict(row._mapping)
+        if entry["date"] == today:
+            self.put(entry)
+        return entry
+
+    def put(self, entry: dict):
+        with self.lock:
+            self.by_id[entry["id"]] = entry
+            if entry["qr_hash"]:
+                self.by_hash[entry["qr_hash"]] = entry
+
+    def forget(self, booking_id: str):
+        with self.lock:
+            entry = self.by_id.pop(booking_id, None)
+            if entry is not None and entry["qr_hash"]:
+                self.by_hash.pop(entry["qr_hash"], None)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"day": self.day.isoformat() if self.day else None, "entries": len(self.by_id),
+                    "hits": self.hits, "misses": self.misses}
+
+
+today_cache = TodayCache()
+
+
+# --- XÁC THỰC / CHECK-IN ---
+
+def _result(reason: str, entry: dict = None) -> dict:
+    return {
+        "valid": reason in ("ok", "checked_in"),
+        "reason": reason,
+        "message": MESSAGES[reason],
+        "booking": entry,
+    }
+
+
+def _reject_reason(entry: dict, today: date, facility_id: str = None):
+    if entry["date"] != today:
+        return "wrong_date"
+    if facility_id and entry["facility_id"] != facility_id:
+        return "wrong_facility"
+    if entry["status"] != "Confirmed":
+        return "not_active"
+    if entry["checked_in_at"] is not None:
+        return "already_checked_in"
+    return None
+
+
+def verify(db: Session, code: str, facility_id: str = None, check_in: bool = False) -> dict:
+    """Kiểm tra mã quét được; check_in=True thì đánh dấu đã vào cổng (chỉ thành công một lần)."""
+    code = (code or "").strip()
+    today = date.today()
+    try:
+        token = parse_token(code)
+    except ValueError:
+        return _result("invalid")
+    if token is not None:
+        booking_id, booking_date = token
+        if booking_date != today:
+            # Chữ ký đúng nhưng sai ngày: từ chối mà không cần tra DB
+            return _result("wrong_date")
+        entry = today_cache.lookup(db, booking_id=booking_id, today=today)
+        if entry is not None and entry["qr_code_data"] != code:
+            entry = None  # token cũ của booking đã được cấp mã khác
+    else:
+        entry = today_cache.lookup(db, hashed=code_hash(code), today=today) if code else None
+    if entry is None:
+        return _result("invalid")
+
+    reason = _reject_reason(entry, today, facility_id)
+    if reason or not check_in:
+        return _result(reason or "ok", entry)
+
+    now = models.utcnow()
+    # Điều kiện nằm trong câu UPDATE: hai lượt quét đồng thời chỉ có một lượt đổi được dòng
+    changed = db.execute(
+        update(models.Booking)
+        .where(models.Booking.id == entry["id"], models.Booking.status == "Confirmed",
+               models.Booking.checked_in_at.is_(None))
+        .values(checked_in_at=now, updated_at=now)
+    ).rowcount
+    db.commit()
+    if not changed:
+        # Cache đã cũ (worker khác vừa check-in / hủy): đọc lại trạng thái thật
+        today_cache.forget(entry["id"])
+        entry = today_cache.lookup(db, booking_id=entry["id"], today=today)
+        if entry is None:
+            return _result("invalid")
+        return _result(_reject_reason(entry, today, facility_id) or "already_checked_in", entry)
+    entry = dict(entry, checked_in_at=now)
+    today_cache.put(entry)
+    return _result("checked_in", entry)
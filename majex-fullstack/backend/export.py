@@ -0,0 +1,111 @@
+# backend/export.py
+# Xuất dữ liệu lớn (bills, bookings, messages, reports) dạng NDJSON hoặc CSV theo stream.
+# Đọc bằng server-side cursor theo từng chunk (stream_results + yield_per), chỉ lấy
+# các cột cần thiết (không tạo ORM object, không validate qua response_model) và ghi
+# từng chunk ra client ngay, nên bộ nhớ không phụ thuộc kích thước bảng.
+import csv
+import io
+import json
+from datetime import date, datetime, time, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import select
+
+import database
+import models
+import schemas
+
+EXPORT_CHUNK_SIZE = 2000
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+class ExportSpec:
+    def __init__(self, model, schema, date_column, status_column=None, user_column=None):
+        self.model = model
+        self.date_column = date_column
+        self.status_column = status_column
+        self.user_column = user_column
+        # Cùng tên field (camelCase) với API JSON: id trước, các field còn lại theo thứ tự của schema
+        fields = sorted(schema.model_fields.items(), key=lambda item: item[0] != "id")
+        self.headers = [field.alias or name for name, field in fields]
+        self.columns = [model.__table__.c[name] for name, _field in fields]
+
+
+EXPORTS = {
+    "bills": ExportSpec(models.Bill, schemas.BillOut, models.Bill.due_date,
+                        models.Bill.status, models.Bill.user_id),
+    "bookings": ExportSpec(models.Booking, schemas.BookingOut, models.Booking.date,
+                           models.Booking.status, models.Booking.user_id),
+    "messages": ExportSpec(models.Message, schemas.MessageOut, models.Message.timestamp,
+                           None, models.Message.sender_id),
+    "reports": ExportSpec(models.Report, schemas.ReportOut, models.Report.timestamp,
+                          models.Report.status, models.Report.user_id),
+}
+
+
+def _value(value):
+    # Cùng định dạng với API: ngày dạng ISO, thời điểm dạng timestamp JS (ms)
+    if isinstance(value, datetime):
+        return models.to_ms(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def build_query(spec: ExportSpec, date_from: date = None, date_to: date = None,
+                status: str = None, user_id: str = None):
+    query = select(*spec.columns)
+    is_timestamp = spec.date_column.type.python_type is datetime
+    if date_from:
+        start = datetime.combine(date_from, time.min) if is_timestamp else date_from
+        query = query.where(spec.date_column >= start)
+    if date_to:
+        # dateTo tính cả ngày cuối
+        if is_timestamp:
+            query = query.where(spec.date_column < datetime.combine(date_to + timedelta(days=1), time.min))
+        else:
+            query = query.where(spec.date_column <= date_to)
+    if status:
+        if spec.status_column is None:
+            raise HTTPException(status_code=400, detail="This export has no status filter")
+        query = query.where(spec.status_column == status)
+    if user_id:
+        query = query.where(spec.user_column == user_id)
+    # Theo index (cột ngày, id) để DB trả dòng theo thứ tự mà không cần sort cả bảng
+    return query.order_by(spec.date_column, spec.model.id)
+
+
+def _render_ndjson(rows, headers) -> str:
+    return "".join(
+        json.dumps(dict(zip(headers, map(_value, row))), separators=(",", ":"), ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+
+def _render_csv(rows, _headers) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([_value(v) for v in row] for row in rows)
+    return buffer.getvalue()
+
+
+def stream_rows(entity: str, fmt: str, **filters):
+    """Trả về generator các chunk bytes; được kiểm tra tham số trước khi bắt đầu stream."""
+    spec = EXPORTS.get(entity)
+    if spec is None:
+        raise HTTPException(status_code=404, detail=f"Unknown export '{entity}'")
+    if fmt not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+    query = build_query(spec, **filters)
+    render = _render_csv if fmt == "csv" else _render_ndjson
+
+    def generate():
+        if fmt == "csv":
+            # Header gửi ngay, trước khi truy vấn chạy xong
+            yield _render_csv([spec.headers], None).encode()
+        with database.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=EXPORT_CHUNK_SIZE).execute(query)
+            for rows in result.partitions():
+                yield render(rows, spec.headers).encode()
+
+    return generate()
@@ -1,13 +1,88 @@
-from fastapi import FastAPI, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Depends, HTTPException, WebSocket, WebSocketDisconnect, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session
-import models, schemas, database
-from typing import List
+from contextlib import asynccontextmanager
+import asyncio
+import models, schemas, database, pagination, realtime, message_writer, backplane, availability, cache, sync, migrations, billing, metrics, export, aggregates, search, serialization, checkin, chat_history, notifications, scheduler, warmup
+from typing import List, Optional, Union
+import datetime
 import json
+import time
 
-models.Base.metadata.create_all(bind=database.engine)
+# Ghi tin nhắn chat theo lô (write-behind), xem message_writer.py
+chat_writer = message_writer.MessageWriter()
+# Job nền định kỳ (hóa đơn quá hạn, booking đã qua giờ), xem scheduler.py
+job_scheduler = scheduler.Scheduler()
+# Trạng thái khởi động cho /readyz, xem warmup.py
+startup = warmup.Warmup()
 
-app = FastAPI()
+def warmup_phases():
+    pool = [("pool", lambda: warmup.warm_pool(database.engine), True)]
+    if database.async_engine is not None:
+        pool.append(("async_pool", lambda: warmup.warm_async_pool(database.async_engine), True))
+    return [
+        # Schema được quản lý bằng migrations.py (không còn create_all lúc import)
+        [("schema", warmup.check_schema, True)],
+        pool + [
+            ("backplane", manager.start, True),
+            ("facilities", lambda: cache.warm("facilities", "", FacilityList,
+                                              lambda: database.run_in_session(_load_facilities)), False),
+            # Cùng key với request của frontend (GET /announcements?paginate=false)
+            ("announcements", lambda: cache.warm(
+                "announcements", "paginate=false", AnnouncementList,
+                lambda: database.run_in_session(_load_announcements, None, None,
+                                                ListParams(paginate=False, limit=pagination.DEFAULT_PAGE_SIZE))), False),
+            ("chat_history", manager.history.prime, False),
+            ("checkin_today", lambda: database.run_in_session(checkin.today_cache.load), False),
+        ],
+        [("scheduler", job_scheduler.start, False)] if scheduler.SCHEDULER_ENABLED else [],
+    ]
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Không chạm DB trước khi yield: worker nhận kết nối ngay, phần khởi động cần DB
+    # chạy nền (song song) và /readyz chỉ trả 200 khi đã xong
+    # Thiếu QR_SECRET: từ chối khởi động thay vì ký mã QR bằng khóa công khai
+    checkin.require_secret()
+    chat_writer.start()
+    # Thông báo commit xong (ở bất kỳ thread nào) được phát qua backplane tới đúng nhóm nhận
+    notifications.attach(asyncio.get_running_loop(), manager.broadcast)
+    # Xóa cache đọc (facilities, users, announcements) trên mọi worker khi có ghi
+    cache.attach(asyncio.get_running_loop(), manager.broadcast)
+    startup.start(warmup_phases())
+    yield
+    await startup.stop()
+    await job_scheduler.stop()
+    await manager.stop()
+    # Xả hết tin nhắn còn trong hàng đợi trước khi tắt server
+    await chat_writer.stop()
+
+app = FastAPI(lifespan=lifespan)
+
+# Đo thời gian SQL / pool kết nối cho cả engine sync và async, xem metrics.py
+metrics.instrument_engine(database.engine, "sync")
+if database.async_engine is not None:
+    metrics.instrument_engine(database.async_engine.sync_engine, "async")
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    stats = metrics.RequestStats()
+    token = metrics.current_request.set(stats)
+    metrics.http_in_flight.inc(amount=1)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.current_request.reset(token)
+        metrics.http_in_flight.inc(amount=-1)
+        # Dùng path mẫu của route (vd: /bills/{user_id}) để số series không tăng theo id
+        route = request.scope.get("route")
+        metrics.finish_request(stats, request.method, getattr(route, "path", "unmatched"),
+                               status, time.perf_counter() - started)
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,82 +92,136 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# --- WEBSOCKET MANAGER (ĐÃ FIX LỖI) ---
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-
-    async def broadcast(self, message: dict):
-        # Lặp qua bản sao của danh sách để tránh lỗi khi list thay đổi
-        # và thêm try/except để bắt lỗi kết nối hỏng
-        for connection in self.active_connections[:]: 
-            try:
-                await connection.send_json(message)
-            except Exception:
-                # Nếu gửi lỗi (do client đã đóng), ta xóa kết nối đó đi
-                # hoặc chỉ cần bỏ qua để không làm crash server
-                pass
-    
-    def get_online_count(self):
-        return len(self.active_connections)
-
-manager = ConnectionManager()
+# --- WEBSOCKET MANAGER ---
+# Fan-out có hàng đợi riêng cho từng kết nối, xem realtime.py.
+# Backplane (BACKPLANE=memory|database) chia sẻ broadcast/presence giữa các worker.
+# Lịch sử gần đây (ring buffer) gửi cho client ngay khi kết nối, xem chat_history.py
+manager = realtime.ConnectionManager(bus=backplane.create_backplane(), history=chat_history.ChatHistory())
 
 @app.websocket("/ws/chat")
-async def websocket_endpoint(websocket: WebSocket, db: Session = Depends(database.get_db)):
+async def websocket_endpoint(websocket: WebSocket):
+    if not startup.ready:
+        # Backplane chưa khởi động: từ chối để client kết nối lại (worker khác / lát nữa)
+        await websocket.close(code=realtime.SLOW_CONSUMER_CLOSE_CODE)
+        return
     await manager.connect(websocket)
     try:
+        # N tin nhắn mới nhất từ bộ nhớ, client không cần gọi GET /messages
+        manager.send(websocket, await manager.history.on_connect())
         # Gửi cập nhật số lượng online
-        await manager.broadcast({"type": "online_count", "count": manager.get_online_count()})
+        await manager.update_presence()
         
         while True:
-            data = await websocket.receive_json()
+            # JSON (text) hoặc MessagePack (binary, client "majex.v2")
+            data = await manager.receive(websocket)
+            metrics.count_ws_frame(data.get("type", "message"))
+            if data.get("type") == "backfill":
+                # Tin nhắn cũ hơn cursor (timestamp, id): từ buffer, hoặc một trang từ DB
+                try:
+                    manager.send(websocket, await manager.history.backfill(data.get("cursor"), data.get("limit")))
+                except HTTPException as e:
+                    manager.send(websocket, {"type": "error", "detail": e.detail})
+                continue
+            if data.get("type") == "identify":
+                # Nhận thông báo realtime theo tòa / căn hộ / user của người này
+                manager.subscribe(websocket, await database.run_in_session(
+                    notifications.subscriptions_for, data.get("userId")))
+                continue
+            # Bỏ qua các frame điều khiển khác, chỉ xử lý tin nhắn chat
+            if data.get("type", "message") != "message":
+                continue
             
-            # Lưu tin nhắn vào DB
+            # Gán id/timestamp ngay, broadcast liền; việc ghi DB do chat_writer gom lô
             try:
-                new_msg = models.Message(
-                    sender_id=data['senderId'],
-                    sender_name=data['senderName'],
-                    text=data['text']
-                )
-                db.add(new_msg)
-                db.commit()
-                db.refresh(new_msg)
+                row = await chat_writer.submit(data.get('senderId'), data.get('senderName'), data.get('text'))
                 
-                response_msg = {
-                    "type": "message",
-                    "id": new_msg.id,
-                    "senderId": new_msg.sender_id,
-                    "senderName": new_msg.sender_name,
-                    "text": new_msg.text,
-                    "timestamp": new_msg.timestamp
-                }
-                await manager.broadcast(response_msg)
+                await manager.broadcast(chat_history.to_frame(row))
+            except HTTPException as e:
+                # Tin nhắn không hợp lệ (không ghi được): chỉ báo cho người gửi, không broadcast
+                manager.send(websocket, {"type": "error", "detail": e.detail})
             except Exception as e:
                 print(f"Error saving message: {e}")
             
     except WebSocketDisconnect:
         manager.disconnect(websocket)
         # Cập nhật lại số lượng online khi có người thoát
-        await manager.broadcast({"type": "online_count", "count": manager.get_online_count()})
+        await manager.update_presence()
     except Exception as e:
         # Bắt các lỗi khác để không sập server
         print(f"WebSocket Error: {e}")
         manager.disconnect(websocket)
 
+# Liveness: process còn sống và event loop còn phản hồi (không chạm DB)
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok"}
+
+# Readiness: đã chạy migration, mở sẵn pool và nạp cache; 503 khi đang khởi động / đang tắt
+@app.get("/readyz")
+def readyz():
+    return JSONResponse(startup.status(), status_code=200 if startup.ready else 503)
+
+@app.get("/metrics")
+def get_metrics():
+    # Định dạng text cho Prometheus scrape
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/ws/stats")
+def get_ws_stats():
+    # Độ sâu hàng đợi / độ trễ của từng kết nối để theo dõi slow consumer
+    return {**manager.stats(), "history": manager.history.stats()}
+
 # --- API ENDPOINTS ---
 
-@app.get("/users", response_model=List[schemas.UserOut])
-def get_users(db: Session = Depends(database.get_db)):
-    return db.query(models.User).all()
+# Tham số phân trang dùng chung cho các endpoint danh sách.
+# paginate=false trả về nguyên mảng như phiên bản cũ (cho client chưa cập nhật).
+class ListParams:
+    def __init__(
+        self,
+        paginate: bool = True,
+        cursor: Optional[str] = None,
+        limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    ):
+        self.paginate = paginate
+        self.cursor = cursor
+        self.limit = limit
+
+# Đường serialize nhanh cho các danh sách lớn (FAST_SERIALIZATION=1), xem serialization.py
+FAST_LISTS = {
+    "bookings": serialization.ListSerializer(models.Booking, schemas.BookingOut),
+    "bills": serialization.ListSerializer(models.Bill, schemas.BillOut),
+    "reports": serialization.ListSerializer(models.Report, schemas.ReportOut),
+    "messages": serialization.ListSerializer(models.Message, schemas.MessageOut),
+}
+
+def list_response(query, keys, params: ListParams, descending=False, legacy_order=None, fast=None):
+    if fast is not None and serialization.FAST_SERIALIZATION:
+        return FAST_LISTS[fast].response(query, keys, params.cursor, params.limit, descending,
+                                         params.paginate, legacy_order)
+    if not params.paginate:
+        if legacy_order is not None:
+            query = query.order_by(*legacy_order)
+        return query.all()
+    items, next_cursor = pagination.paginate(query, keys, params.cursor, params.limit, descending)
+    return {"items": items, "nextCursor": next_cursor}
+
+UserList = Union[schemas.Page[schemas.UserOut], List[schemas.UserOut]]
+
+@app.get("/users", response_model=UserList)
+async def get_users(
+    request: Request,
+    role: Optional[str] = None,
+    status: Optional[str] = None,
+    apartment_id: Optional[str] = Query(None, alias="apartmentId"),
+    params: ListParams = Depends(),
+):
+    def load(db: Session):
+        query = db.query(models.User)
+        if role: query = query.filter(models.User.role == role)
+        if status: query = query.filter(models.User.status == status)
+        if apartment_id: query = query.filter(models.User.apartment_id == apartment_id)
+        return list_response(query, [models.User.id], params)
+    return await cache.cached_response(request, "users", UserList, lambda: database.run_in_session(load))
 
 @app.post("/users", response_model=schemas.UserOut)
 def create_user(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
@@ -110,68 +239,153 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(database.get_db)
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    cache.invalidate("users")
     return db_user
 
-@app.get("/facilities", response_model=List[schemas.FacilityOut])
-def get_facilities(db: Session = Depends(database.get_db)):
+FacilityList = List[schemas.FacilityOut]
+
+def _load_facilities(db: Session):
     return db.query(models.Facility).all()
 
+@app.get("/facilities", response_model=FacilityList)
+async def get_facilities(request: Request):
+    return await cache.cached_response(
+        request, "facilities", FacilityList, lambda: database.run_in_session(_load_facilities))
+
 @app.post("/facilities", response_model=schemas.FacilityOut)
 def create_facility(facility: schemas.FacilityCreate, db: Session = Depends(database.get_db)):
     db_facility = models.Facility(**facility.dict(by_alias=False))
     db.add(db_facility)
     db.commit()
     db.refresh(db_facility)
+    cache.invalidate("facilities")
     return db_facility
 
+@app.get("/facilities/{facility_id}/availability", response_model=schemas.AvailabilityOut)
+async def get_facility_availability(facility_id: str, date: str):
+    return await database.run_in_session(availability.get_availability, facility_id, date)
+
 # --- BOOKINGS ---
-@app.get("/bookings", response_model=List[schemas.BookingOut])
-def get_bookings(db: Session = Depends(database.get_db)):
-    return db.query(models.Booking).all()
+@app.get("/bookings", response_model=Union[schemas.Page[schemas.BookingOut], List[schemas.BookingOut]])
+async def get_bookings(
+    status: Optional[str] = None,
+    user_id: Optional[str] = Query(None, alias="userId"),
+    facility_id: Optional[str] = Query(None, alias="facilityId"),
+    date_from: Optional[datetime.date] = Query(None, alias="dateFrom"),
+    date_to: Optional[datetime.date] = Query(None, alias="dateTo"),
+    params: ListParams = Depends(),
+):
+    def load(db: Session):
+        query = db.query(models.Booking)
+        if status: query = query.filter(models.Booking.status == status)
+        if user_id: query = query.filter(models.Booking.user_id == user_id)
+        if facility_id: query = query.filter(models.Booking.facility_id == facility_id)
+        if date_from: query = query.filter(models.Booking.date >= date_from)
+        if date_to: query = query.filter(models.Booking.date <= date_to)
+        return list_response(query, [models.Booking.date, models.Booking.id], params, fast="bookings")
+    return await database.run_in_session(load)
 
 @app.post("/bookings", response_model=schemas.BookingOut)
 def create_booking(booking: schemas.BookingCreate, db: Session = Depends(database.get_db)):
-    db_booking = models.Booking(**booking.dict(by_alias=False))
-    db.add(db_booking)
-    db.commit()
-    db.refresh(db_booking)
-    return db_booking
+    # Kiểm tra trùng lịch / hết chỗ ngay trên server (409 nếu khung giờ đã đầy)
+    return availability.reserve(db, booking.dict(by_alias=False))
 
 @app.put("/bookings/{booking_id}/cancel")
 def cancel_booking(booking_id: str, db: Session = Depends(database.get_db)):
     booking = db.query(models.Booking).filter(models.Booking.id == booking_id).first()
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
+    old_status = booking.status
     booking.status = "Cancelled"
+    aggregates.booking_status_changed(db, booking, old_status)
     db.commit()
+    checkin.today_cache.forget(booking_id)
     return {"message": "Booking cancelled"}
 
+# --- CHECK-IN (AdminScanner) ---
+# Chỉ kiểm tra mã, không đổi trạng thái (xem trước khi cho vào)
+@app.post("/checkin/verify", response_model=schemas.CheckInResult)
+def verify_checkin(scan: schemas.CheckInScan, db: Session = Depends(database.get_db)):
+    return checkin.verify(db, scan.code, scan.facility_id)
+
+# Kiểm tra và check-in: mỗi mã chỉ check-in thành công một lần
+@app.post("/checkin", response_model=schemas.CheckInResult)
+def check_in(scan: schemas.CheckInScan, db: Session = Depends(database.get_db)):
+    return checkin.verify(db, scan.code, scan.facility_id, check_in=True)
+
 # --- BILLS ---
-@app.get("/bills/{user_id}", response_model=List[schemas.BillOut])
-def get_my_bills(user_id: str, db: Session = Depends(database.get_db)):
-    if user_id == "all":
-        return db.query(models.Bill).all()
-    return db.query(models.Bill).filter(models.Bill.user_id == user_id).all()
+@app.get("/bills/{user_id}", response_model=Union[schemas.Page[schemas.BillOut], List[schemas.BillOut]])
+def get_my_bills(
+    user_id: str,
+    status: Optional[str] = None,
+    type: Optional[str] = None,
+    month: Optional[str] = None,
+    due_from: Optional[datetime.date] = Query(None, alias="dueFrom"),
+    due_to: Optional[datetime.date] = Query(None, alias="dueTo"),
+    params: ListParams = Depends(),
+    db: Session = Depends(database.get_db),
+):
+    query = db.query(models.Bill)
+    if user_id != "all": query = query.filter(models.Bill.user_id == user_id)
+    if status: query = query.filter(models.Bill.status == status)
+    if type: query = query.filter(models.Bill.type == type)
+    if month: query = query.filter(models.Bill.month == month)
+    if due_from: query = query.filter(models.Bill.due_date >= due_from)
+    if due_to: query = query.filter(models.Bill.due_date <= due_to)
+    return list_response(query, [models.Bill.due_date, models.Bill.id], params, fast="bills")
+
+# Import hóa đơn dạng stream (CSV có header hoặc NDJSON), ghi theo chunk, bỏ qua dòng đã có
+@app.post("/bills/import", response_model=schemas.BillingReportOut)
+async def import_bills(request: Request, format: Optional[str] = None):
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be 'csv' or 'ndjson'")
+    return await billing.import_stream(request.stream(), fmt)
+
+# Phát hành hóa đơn tháng cho mọi resident theo mẫu; chạy lại cùng tháng không tạo trùng
+@app.post("/bills/run", response_model=schemas.BillingReportOut)
+async def run_billing(run: schemas.BillingRun):
+    return await billing.run_template(run.month, run.due_date, [item.model_dump() for item in run.items])
 
 @app.put("/bills/{bill_id}/pay")
 def pay_bill(bill_id: str, db: Session = Depends(database.get_db)):
     bill = db.query(models.Bill).filter(models.Bill.id == bill_id).first()
     if not bill: raise HTTPException(status_code=404, detail="Bill not found")
+    old_status = bill.status
     bill.status = "Paid"
-    import datetime
-    bill.paid_date = datetime.date.today().isoformat()
+    bill.paid_date = datetime.date.today()
+    aggregates.bill_status_changed(db, bill, old_status)
     db.commit()
     return {"message": "Paid successfully"}
 
 # --- REPORTS ---
-@app.get("/reports", response_model=List[schemas.ReportOut])
-def get_reports(db: Session = Depends(database.get_db)):
-    return db.query(models.Report).order_by(models.Report.timestamp.desc()).all()
+@app.get("/reports", response_model=Union[schemas.Page[schemas.ReportOut], List[schemas.ReportOut]])
+def get_reports(
+    status: Optional[str] = None,
+    category: Optional[str] = None,
+    user_id: Optional[str] = Query(None, alias="userId"),
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    params: ListParams = Depends(),
+    db: Session = Depends(database.get_db),
+):
+    query = db.query(models.Report)
+    if status: query = query.filter(models.Report.status == status)
+    if category: query = query.filter(models.Report.category == category)
+    if user_id: query = query.filter(models.Report.user_id == user_id)
+    if since is not None: query = query.filter(models.Report.timestamp >= models.from_ms(since))
+    if until is not None: query = query.filter(models.Report.timestamp < models.from_ms(until))
+    return list_response(
+        query, [models.Report.timestamp, models.Report.id], params,
+        descending=True, legacy_order=[models.Report.timestamp.desc()], fast="reports",
+    )
 
 @app.post("/reports", response_model=schemas.ReportOut)
 def create_report(report: schemas.ReportCreate, db: Session = Depends(database.get_db)):
     db_report = models.Report(**report.dict(by_alias=False))
     db.add(db_report)
+    db.flush()
+    search.index_document(db, "report", db_report)
     db.commit()
     db.refresh(db_report)
     return db_report
@@ -180,28 +394,158 @@ def create_report(report: schemas.ReportCreate, db: Session = Depends(database.g
 def resolve_report(report_id: str, db: Session = Depends(database.get_db)):
     report = db.query(models.Report).filter(models.Report.id == report_id).first()
     if not report: raise HTTPException(status_code=404, detail="Report not found")
+    if report.status != "Resolved":
+        # Báo riêng cho người gửi báo cáo
+        notifications.notify(db, "user", report.user_id, "report", "Báo cáo đã được xử lý", report.title, report.id)
     report.status = "Resolved"
     db.commit()
     return {"message": "Report resolved"}
 
 # --- MESSAGES ---
-@app.get("/messages", response_model=List[schemas.MessageOut])
-def get_messages(db: Session = Depends(database.get_db)):
-    return db.query(models.Message).order_by(models.Message.timestamp.asc()).all()
+@app.get("/messages", response_model=Union[schemas.Page[schemas.MessageOut], List[schemas.MessageOut]])
+async def get_messages(
+    sender_id: Optional[str] = Query(None, alias="senderId"),
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    params: ListParams = Depends(),
+):
+    def load(db: Session):
+        query = db.query(models.Message)
+        if sender_id: query = query.filter(models.Message.sender_id == sender_id)
+        if since is not None: query = query.filter(models.Message.timestamp >= models.from_ms(since))
+        if until is not None: query = query.filter(models.Message.timestamp < models.from_ms(until))
+        return list_response(
+            query, [models.Message.timestamp, models.Message.id], params,
+            legacy_order=[models.Message.timestamp.asc()], fast="messages",
+        )
+    return await database.run_in_session(load)
 
 # --- ANNOUNCEMENTS ---
-@app.get("/announcements", response_model=List[schemas.AnnouncementOut])
-def get_announcements(db: Session = Depends(database.get_db)):
-    return db.query(models.Announcement).order_by(models.Announcement.timestamp.desc()).all()
+AnnouncementList = Union[schemas.Page[schemas.AnnouncementOut], List[schemas.AnnouncementOut]]
+
+def _load_announcements(db: Session, since: Optional[float], until: Optional[float], params: ListParams):
+    query = db.query(models.Announcement)
+    if since is not None: query = query.filter(models.Announcement.timestamp >= models.from_ms(since))
+    if until is not None: query = query.filter(models.Announcement.timestamp < models.from_ms(until))
+    return list_response(
+        query, [models.Announcement.timestamp, models.Announcement.id], params,
+        descending=True, legacy_order=[models.Announcement.timestamp.desc()],
+    )
+
+@app.get("/announcements", response_model=AnnouncementList)
+async def get_announcements(
+    request: Request,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    params: ListParams = Depends(),
+):
+    return await cache.cached_response(
+        request, "announcements", AnnouncementList,
+        lambda: database.run_in_session(_load_announcements, since, until, params))
 
 @app.post("/announcements", response_model=schemas.AnnouncementOut)
 def create_announcement(announcement: schemas.AnnouncementCreate, db: Session = Depends(database.get_db)):
     db_ann = models.Announcement(**announcement.dict())
     db.add(db_ann)
+    db.flush()
+    search.index_document(db, "announcement", db_ann)
+    # Một dòng thông báo cho toàn bộ cư dân (fan-out lúc đọc), đẩy realtime sau commit
+    notifications.notify(db, "all", "", "announcement", db_ann.title, db_ann.content, db_ann.id)
     db.commit()
     db.refresh(db_ann)
+    cache.invalidate("announcements")
     return db_ann
 
+# --- NOTIFICATIONS ---
+# Hộp thư thông báo của từng user (ghép từ thông báo chung / theo tòa / căn hộ / cá nhân), xem notifications.py
+@app.get("/notifications/{user_id}", response_model=schemas.Page[schemas.NotificationOut])
+async def get_notifications(
+    user_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+):
+    return await database.run_in_session(notifications.inbox, user_id, cursor, limit)
+
+@app.get("/notifications/{user_id}/unread-count", response_model=schemas.UnreadCount)
+async def get_unread_count(user_id: str):
+    return await database.run_in_session(notifications.unread_count, user_id)
+
+@app.post("/notifications/{user_id}/read", response_model=schemas.UnreadCount)
+async def mark_notifications_read(user_id: str, body: Optional[schemas.MarkRead] = None):
+    return await database.run_in_session(notifications.mark_read, user_id, body.until if body else None)
+
+@app.post("/notifications", response_model=schemas.NotificationOut)
+def create_notification(notice: schemas.NotificationCreate, db: Session = Depends(database.get_db)):
+    # Thông báo của ban quản lý cho cả khu / một tòa / một căn hộ / một cư dân
+    row = notifications.notify(db, notice.audience, notice.target, "notice", notice.title, notice.body)
+    db.commit()
+    return row
+
+# --- SEARCH ---
+# Tìm kiếm toàn văn (xếp hạng, phân trang) trên messages, reports, announcements
+@app.get("/search", response_model=schemas.Page[schemas.SearchHit])
+async def search_documents(
+    q: str = Query(..., min_length=1),
+    type: Optional[str] = None,  # vd: "message,report"
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    sender_id: Optional[str] = Query(None, alias="senderId"),
+    cursor: Optional[str] = None,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+):
+    types = [t.strip() for t in type.split(",") if t.strip()] if type else None
+    return await database.run_in_session(
+        lambda db: search.search(db, q, types, category, status, sender_id, cursor, limit))
+
+# --- EXPORT ---
+# Xuất toàn bộ lịch sử (bills, bookings, messages, reports) dạng NDJSON/CSV theo stream
+@app.get("/export/{entity}")
+def export_rows(
+    entity: str,
+    format: str = "ndjson",
+    status: Optional[str] = None,
+    user_id: Optional[str] = Query(None, alias="userId"),
+    date_from: Optional[datetime.date] = Query(None, alias="dateFrom"),
+    date_to: Optional[datetime.date] = Query(None, alias="dateTo"),
+):
+    chunks = export.stream_rows(entity, format, date_from=date_from, date_to=date_to, status=status, user_id=user_id)
+    return StreamingResponse(
+        chunks, media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{entity}.{format}"'},
+    )
+
+# --- ADMIN ---
+# Tổng hợp cho dashboard admin, đọc từ bảng tổng hợp (không quét bills/bookings)
+@app.get("/admin/summary", response_model=schemas.AdminSummary)
+async def get_admin_summary():
+    return await database.run_in_session(aggregates.get_summary)
+
+# Job nền: lần chạy kế tiếp, worker đang giữ khóa, lịch sử các lần chạy gần nhất
+@app.get("/admin/jobs", response_model=List[schemas.JobStatus])
+async def get_jobs():
+    return await database.run_in_session(scheduler.job_status)
+
+@app.post("/admin/jobs/{name}/run", response_model=schemas.JobRunOut)
+async def run_job_now(name: str):
+    if name not in scheduler.JOBS:
+        raise HTTPException(status_code=404, detail="Job not found")
+    run = await job_scheduler.run(name, force=True)
+    if run is None:
+        raise HTTPException(status_code=409, detail="Job is running on another worker")
+    return run
+
+# --- SYNC ---
+# Chỉ trả về những gì thay đổi kể từ cursor lần trước (lần đầu: không truyền cursor)
+@app.get("/sync", response_model=schemas.SyncOut)
+async def get_changes(user_id: str = Query(..., alias="userId"), cursor: Optional[str] = None):
+    return await database.run_in_session(sync.collect_changes, user_id, cursor)
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    # Số hit/miss để kiểm tra lượng truy vấn DB thực sự giảm
+    return cache.response_cache.stats()
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Ghi rõ permessage-deflate cho /ws/chat (uvicorn mặc định bật; trình duyệt đều hỗ trợ)
+    uvicorn.run(app, host="0.0.0.0", port=8000, ws="websockets", ws_per_message_deflate=True)
\ No newline at end of file
@@ -0,0 +1,161 @@
+# backend/message_writer.py
+# Ghi tin nhắn chat theo kiểu write-behind: id/timestamp được gán ngay trong app,
+# tin nhắn được broadcast lập tức, còn việc INSERT vào bảng messages được gom
+# thành từng lô (theo kích thước hoặc khoảng thời gian) và ghi một lần.
+# Tin nhắn được kiểm tra (người gửi tồn tại, độ dài các cột) TRƯỚC khi broadcast, để client
+# không thấy tin nhắn không ghi được. Lỗi tạm thời (mất kết nối, failover, deadlock) được thử
+# lại với backoff trong một khoảng dài; chỉ lỗi do dữ liệu (IntegrityError, DataError) mới khiến
+# lô bị chia đôi dần để bỏ đúng dòng hỏng.
+import asyncio
+import logging
+import os
+import time
+
+from fastapi import HTTPException
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DataError, IntegrityError
+
+import database
+import models
+import search
+
+MESSAGE_BATCH_SIZE = int(os.getenv("MESSAGE_BATCH_SIZE", "500"))
+# Thời gian tối đa (giây) một tin nhắn nằm chờ trước khi được ghi
+MESSAGE_FLUSH_INTERVAL = float(os.getenv("MESSAGE_FLUSH_INTERVAL", "0.05"))
+MESSAGE_QUEUE_SIZE = int(os.getenv("MESSAGE_QUEUE_SIZE", "10000"))
+# Lỗi tạm thời: thử lại cả lô, chờ từ MESSAGE_RETRY_DELAY tăng gấp đôi tới MESSAGE_RETRY_MAX_DELAY giây,
+# tổng thời gian chờ tối đa MESSAGE_RETRY_SECONDS giây (trong lúc đó hàng đợi đầy dần và submit() chờ theo)
+MESSAGE_RETRY_SECONDS = float(os.getenv("MESSAGE_RETRY_SECONDS", "300"))
+MESSAGE_RETRY_DELAY = 0.1
+MESSAGE_RETRY_MAX_DELAY = 5.0
+# Độ dài tối đa của nội dung tin nhắn (cột text không giới hạn)
+MESSAGE_MAX_LENGTH = int(os.getenv("MESSAGE_MAX_LENGTH", "4000"))
+# Số id người gửi đã xác nhận được nhớ lại (tránh một truy vấn users cho mỗi tin nhắn)
+KNOWN_SENDERS_CACHE = 10000
+
+_STOP = object()
+
+logger = logging.getLogger(__name__)
+
+
+def _insert_batch(db, rows):
+    # executemany -> SQLAlchemy gộp thành INSERT nhiều dòng (insertmanyvalues)
+    db.execute(insert(models.Message.__table__), rows)
+    # Chỉ mục tìm kiếm được ghi cùng transaction với lô tin nhắn
+    search.index_rows(db, "message", [(row["id"], row["text"]) for row in rows])
+    db.commit()
+
+
+def _sender_exists(db, sender_id: str) -> bool:
+    return db.execute(select(models.User.id).where(models.User.id == sender_id)).first() is not None
+
+
+def _check_length(name: str, value, limit: int):
+    if not isinstance(value, str) or not value.strip():
+        raise HTTPException(status_code=400, detail=f"{name} is required")
+    if len(value) > limit:
+        raise HTTPException(status_code=400, detail=f"{name} is longer than {limit} characters")
+
+
+class MessageWriter:
+    def __init__(self, batch_size=MESSAGE_BATCH_SIZE, flush_interval=MESSAGE_FLUSH_INTERVAL,
+                 max_queue=MESSAGE_QUEUE_SIZE):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.task = None
+        self.written = 0
+        self.failed = 0
+        self.known_senders = set()
+
+    async def validate(self, sender_id: str, sender_name: str, text: str):
+        """Các lỗi mà INSERT sẽ gặp (khóa ngoại, độ dài cột): báo ngay cho client thay vì mất tin khi ghi."""
+        columns = models.Message.__table__.c
+        _check_length("senderId", sender_id, columns.sender_id.type.length)
+        _check_length("senderName", sender_name, columns.sender_name.type.length)
+        _check_length("text", text, MESSAGE_MAX_LENGTH)
+        if sender_id in self.known_senders:
+            return
+        if not await database.run_in_session(_sender_exists, sender_id):
+            raise HTTPException(status_code=404, detail="Sender not found")
+        if len(self.known_senders) >= KNOWN_SENDERS_CACHE:
+            self.known_senders.clear()
+        self.known_senders.add(sender_id)
+
+    async def submit(self, sender_id: str, sender_name: str, text: str) -> dict:
+        """Kiểm tra, tạo bản ghi tin nhắn (chưa ghi DB) và xếp hàng chờ ghi."""
+        await self.validate(sender_id, sender_name, text)
+        row = {
+            "id": models.generate_uuid(),
+            "sender_id": sender_id,
+            "sender_name": sender_name,
+            "text": text,
+            "timestamp": models.utcnow(),
+        }
+        # Hàng đợi đầy -> chờ (backpressure) thay vì làm mất tin nhắn
+        await self.queue.put(row)
+        return row
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Ngừng writer sau khi đã ghi hết những gì còn trong hàng đợi."""
+        if self.task is None:
+            return
+        # Sentinel nằm sau mọi tin nhắn đang chờ nên hàng đợi được xả hết trước khi dừng
+        await self.queue.put(_STOP)
+        await self.task
+        self.task = None
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            first = await self.queue.get()
+            if first is _STOP:
+                break
+            rows = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(rows) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is _STOP:
+                    stopping = True
+                    break
+                rows.append(row)
+            await self._flush(rows)
+
+    async def _flush(self, rows):
+        waited = 0.0
+        delay = MESSAGE_RETRY_DELAY
+        while True:
+            try:
+                await database.run_in_session(_insert_batch, rows)
+                self.written += len(rows)
+                return
+            except (IntegrityError, DataError) as e:
+                # Lỗi do dữ liệu: thử lại vô ích, chia đôi để các tin nhắn còn lại vẫn được ghi
+                if len(rows) == 1:
+                    self.failed += 1
+                    logger.error("Dropped message %s from %r: %s", rows[0]["id"], rows[0]["sender_id"], e)
+                    return
+                middle = len(rows) // 2
+                await self._flush(rows[:middle])
+                await self._flush(rows[middle:])
+                return
+            except Exception as e:
+                if waited + delay > MESSAGE_RETRY_SECONDS:
+                    self.failed += len(rows)
+                    logger.error("Dropped %d messages after retrying for %gs: %s",
+                                 len(rows), MESSAGE_RETRY_SECONDS, e)
+                    return
+                logger.warning("Error writing %d messages, retrying in %.1fs: %s", len(rows), delay, e)
+                await asyncio.sleep(delay)
+                waited += delay
+                delay = min(delay * 2, MESSAGE_RETRY_MAX_DELAY)
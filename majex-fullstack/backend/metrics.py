@@ -0,0 +1,269 @@
+# backend/metrics.py
+# Số liệu vận hành xuất ra /metrics theo định dạng text của Prometheus:
+# - thời gian từng câu SQL và số câu SQL trên mỗi request (phát hiện N+1),
+# - trạng thái pool kết nối (đang dùng, overflow, thời gian chờ checkout),
+# - histogram độ trễ theo route, số kết nối / frame WebSocket.
+# Tự cài đặt (không cần prometheus_client): chỉ có counter, gauge và histogram.
+import contextvars
+import functools
+import os
+import threading
+import time
+
+from sqlalchemy import event
+
+# Ghi log câu SQL chạy lâu hơn N ms (0 = tắt)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))
+# Cảnh báo khi một request chạy quá N câu SQL (dấu hiệu N+1; 0 = tắt)
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "50"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            items = list(self.values.items())
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.label_names, labels)} {value}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels=(), collect=None):
+        super().__init__(name, help, labels)
+        # collect() -> {labels tuple: value}, đọc lúc scrape (vd: trạng thái pool)
+        self.collect = collect
+
+    def set(self, *labels, value: float):
+        with self.lock:
+            self.values[labels] = value
+
+    def samples(self):
+        if self.collect is not None:
+            with self.lock:
+                self.values = dict(self.collect())
+        yield from super().samples()
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self.series = {}  # labels -> [counts theo bucket..., sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self.lock:
+            items = [(labels, list(series)) for labels, series in self.series.items()]
+        names = self.label_names + ("le",)
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(names, labels + (bound,))} {cumulative}"
+            yield f"{self.name}_bucket{_labels(names, labels + ('+Inf',))} {series[-1]}"
+            yield f"{self.name}_sum{_labels(self.label_names, labels)} {round(series[-2], 6)}"
+            yield f"{self.name}_count{_labels(self.label_names, labels)} {series[-1]}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# --- DATABASE ---
+db_statement_seconds = registry.register(Histogram(
+    "majex_db_statement_seconds", "SQL statement execution time", ("engine", "operation")))
+db_slow_statements = registry.register(Counter(
+    "majex_db_slow_statements_total", "SQL statements slower than SLOW_QUERY_MS", ("engine",)))
+db_statements_per_request = registry.register(Histogram(
+    "majex_db_statements_per_request", "SQL statements executed per HTTP request", ("route",), COUNT_BUCKETS))
+db_pool_checkout_seconds = registry.register(Histogram(
+    "majex_db_pool_checkout_seconds", "Time spent waiting for a pooled connection", ("engine",)))
+db_pool_checkout_errors = registry.register(Counter(
+    "majex_db_pool_checkout_errors_total", "Failed connection checkouts (pool timeout, connect error)", ("engine",)))
+_pools = {}
+
+
+def _pool_status(attribute: str):
+    def collect():
+        for name, pool in list(_pools.items()):
+            method = getattr(pool, attribute, None)
+            if method is not None:
+                yield (name,), method()
+    return collect
+
+
+db_pool_in_use = registry.register(Gauge(
+    "majex_db_pool_in_use", "Connections currently checked out", ("engine",), _pool_status("checkedout")))
+db_pool_idle = registry.register(Gauge(
+    "majex_db_pool_idle", "Idle connections in the pool", ("engine",), _pool_status("checkedin")))
+db_pool_size = registry.register(Gauge(
+    "majex_db_pool_size", "Configured pool size", ("engine",), _pool_status("size")))
+db_pool_overflow = registry.register(Gauge(
+    "majex_db_pool_overflow", "Connections opened beyond pool_size (negative = unused slots)",
+    ("engine",), _pool_status("overflow")))
+
+# --- HTTP ---
+http_request_seconds = registry.register(Histogram(
+    "majex_http_request_seconds", "HTTP request latency by route", ("method", "route", "status")))
+http_in_flight = registry.register(Gauge(
+    "majex_http_requests_in_flight", "HTTP requests currently being served"))
+
+# --- WEBSOCKET ---
+ws_connections = registry.register(Counter(
+    "majex_ws_connections_total", "WebSocket connections accepted"))
+ws_active = registry.register(Gauge(
+    "majex_ws_connections_active", "Open WebSocket connections on this worker"))
+ws_messages_received = registry.register(Counter(
+    "majex_ws_messages_received_total", "Frames received from WebSocket clients", ("type",)))
+ws_frames_sent = registry.register(Counter(
+    "majex_ws_frames_sent_total", "Frames written to WebSocket clients"))
+ws_bytes_sent = registry.register(Counter(
+    "majex_ws_bytes_sent_total", "Frame payload bytes written to WebSocket clients (before permessage-deflate)",
+    ("protocol",)))
+ws_evictions = registry.register(Counter(
+    "majex_ws_evictions_total", "Slow WebSocket consumers disconnected"))
+# Loại frame client gửi lên; loại lạ gộp vào "other" để số series không phụ thuộc client
+WS_FRAME_TYPES = {"message", "identify", "backfill"}
+
+
+def count_ws_frame(frame_type):
+    ws_messages_received.inc(frame_type if frame_type in WS_FRAME_TYPES else "other")
+
+
+# --- SCHEDULER ---
+job_runs = registry.register(Counter(
+    "majex_job_runs_total", "Background job runs on this worker", ("job", "status")))
+job_rows = registry.register(Counter(
+    "majex_job_rows_total", "Rows updated by background jobs", ("job",)))
+job_seconds = registry.register(Histogram(
+    "majex_job_seconds", "Background job duration", ("job",)))
+
+
+# --- PER-REQUEST STATEMENT COUNT ---
+# Mỗi request giữ một RequestStats trong contextvar; hook SQL cộng dồn vào đó.
+class RequestStats:
+    __slots__ = ("statements", "db_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+
+
+current_request = contextvars.ContextVar("majex_request_stats", default=None)
+
+
+def _operation(statement: str) -> str:
+    word = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    return word if word in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH") else "OTHER"
+
+
+def instrument_engine(engine, name: str):
+    """Gắn hook đo thời gian SQL và thời gian checkout pool cho một engine sync (hoặc async_engine.sync_engine)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("majex_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["majex_query_start"].pop()
+        db_statement_seconds.observe(elapsed, name, _operation(statement))
+        stats = current_request.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_seconds += elapsed
+        if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+            db_slow_statements.inc(name)
+            print(f"[slow-query] {elapsed * 1000:.1f}ms ({name}): {' '.join(statement.split())[:500]}")
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        # Câu lệnh lỗi không đi qua after_cursor_execute: bỏ mốc thời gian đã đẩy vào
+        starts = context.connection.info.get("majex_query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    pool = engine.pool
+    _pools[name] = pool
+    checkout = pool.connect
+
+    @functools.wraps(checkout)
+    def timed_checkout(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return checkout(*args, **kwargs)
+        except Exception:
+            db_pool_checkout_errors.inc(name)
+            raise
+        finally:
+            db_pool_checkout_seconds.observe(time.perf_counter() - started, name)
+
+    pool.connect = timed_checkout
+
+
+def finish_request(stats: RequestStats, method: str, route: str, status: int, elapsed: float):
+    http_request_seconds.observe(elapsed, method, route, status)
+    db_statements_per_request.observe(stats.statements, route)
+    if N_PLUS_ONE_THRESHOLD and stats.statements >= N_PLUS_ONE_THRESHOLD:
+        print(f"[n+1] {method} {route} ran {stats.statements} SQL statements "
+              f"({stats.db_seconds * 1000:.1f}ms in DB)")
+
+
+def render() -> str:
+    return registry.render()
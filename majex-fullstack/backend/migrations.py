@@ -0,0 +1,573 @@
+# backend/migrations.py
+# Migration có đánh số phiên bản, thay cho create_all lúc import và reset.py xóa bảng.
+# Phiên bản đã chạy được lưu trong bảng schema_migrations. Mỗi migration viết theo kiểu
+# idempotent (kiểm tra trước khi sửa) nên chạy được trên cả DB mới lẫn DB cũ do create_all
+# tạo ra, và chạy lại được nếu bị dừng giữa chừng: các bước backfill commit sau từng lô
+# (không giữ khóa cả bảng tới hết migration), lần chạy sau tiếp tục từ những dòng còn thiếu.
+#
+#   python migrations.py            # chạy các migration còn thiếu
+#   python migrations.py status     # xem phiên bản hiện tại / còn thiếu
+#
+# Dữ liệu cũ được chuyển đổi tại chỗ: thêm cột mới, backfill theo lô nhỏ (không khóa
+# cả bảng lâu), rồi đổi tên. Các bước thêm cột/index đều không phá vỡ code đang chạy.
+#
+# Mỗi migration tự khai báo DDL của nó (bảng, cột, index ở đúng phiên bản đó), KHÔNG dùng
+# models.Base.metadata: models luôn là schema mới nhất, nên dựng DDL từ đó ở một bước cũ
+# sẽ tham chiếu tới cột chỉ được thêm ở bước sau (vd: index trên bookings.qr_hash).
+import os
+import sys
+from collections import Counter
+
+from sqlalchemy import (Column, DateTime, Float, ForeignKey, Integer, MetaData, String, Table, Text,
+                        bindparam, column, delete, func, inspect, insert, select, table, text)
+from sqlalchemy.dialects import mssql
+from sqlalchemy.sql import sqltypes
+
+import database
+import models
+
+# Tự chạy migration khi khởi động app: mặc định chỉ với SQLite (dev / benchmark). Với SQL
+# Server, chạy `python migrations.py upgrade` riêng; app chỉ kiểm tra và báo not-ready nếu còn thiếu.
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "1" if database.is_sqlite(database.SQLALCHEMY_DATABASE_URL) else "0") == "1"
+BACKFILL_BATCH = 5000
+
+_meta = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _meta,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("name", String(200)),
+    Column("applied_at", DateTime),
+)
+
+# Cố định tại đây (không lấy models.Timestamp) để migration cũ không đổi theo models
+Timestamp = DateTime().with_variant(mssql.DATETIME2(precision=6), "mssql")
+
+
+# --- HELPERS ---
+
+def _columns(conn, table: str) -> dict:
+    return {c["name"]: c["type"] for c in inspect(conn).get_columns(table)}
+
+
+def _add_column(conn, table: str, name: str, type_):
+    ddl_type = type_.compile(dialect=conn.dialect)
+    keyword = "ADD" if conn.dialect.name == "mssql" else "ADD COLUMN"
+    conn.execute(text(f"ALTER TABLE {table} {keyword} {name} {ddl_type} NULL"))
+
+
+def _backfill(conn, table: str, assignment: str, where: str, params=None):
+    """UPDATE theo lô BACKFILL_BATCH dòng, commit sau mỗi lô để không giữ khóa cả bảng.
+
+    `where` phải loại các dòng đã xử lý (vd: cột mới IS NULL) để chạy lại được sau khi bị dừng.
+    """
+    if conn.dialect.name == "mssql":
+        sql = f"UPDATE TOP ({BACKFILL_BATCH}) {table} SET {assignment} WHERE {where}"
+    elif conn.dialect.name == "sqlite":
+        sql = (f"UPDATE {table} SET {assignment} WHERE rowid IN "
+               f"(SELECT rowid FROM {table} WHERE {where} LIMIT {BACKFILL_BATCH})")
+    else:
+        sql = f"UPDATE {table} SET {assignment} WHERE {where}"
+    while True:
+        result = conn.execute(text(sql), params or {})
+        conn.commit()
+        if result.rowcount < BACKFILL_BATCH or conn.dialect.name not in ("mssql", "sqlite"):
+            break
+
+
+def _add_column_if_missing(conn, table: str, name: str, type_, fill=None):
+    if name in _columns(conn, table):
+        return
+    _add_column(conn, table, name, type_)
+    if fill is not None:
+        _backfill(conn, table, f"{name} = :fill", f"{name} IS NULL", {"fill": fill})
+
+
+def _create_tables(conn, *tables):
+    """Tạo các bảng (khai báo trong migration) nếu chưa có, kèm index của chúng."""
+    meta = MetaData()
+    for build in tables:
+        build(meta)
+    meta.create_all(conn, checkfirst=True)
+
+
+def _create_index_if_missing(conn, name: str, table_name: str, *columns, unique: bool = False):
+    if name in {ix["name"] for ix in inspect(conn).get_indexes(table_name)}:
+        return
+    conn.execute(text(f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {table_name} ({', '.join(columns)})"))
+
+
+# Biểu thức chuyển giá trị cũ sang kiểu mới, theo dialect
+def _date_from_string(conn, column: str) -> str:
+    if conn.dialect.name == "mssql":
+        return f"TRY_CONVERT(date, {column}, 23)"
+    return f"date({column})"
+
+
+def _datetime_from_ms(conn, column: str) -> str:
+    if conn.dialect.name == "mssql":
+        # Tách phút + mili giây để không tràn int của DATEADD
+        return (f"DATEADD(millisecond, CAST({column} - FLOOR({column} / 60000) * 60000 AS int), "
+                f"DATEADD(minute, CAST(FLOOR({column} / 60000) AS int), CAST('1970-01-01' AS datetime2(6))))")
+    return (f"strftime('%Y-%m-%d %H:%M:%S', {column} / 1000.0, 'unixepoch') || '.' || "
+            f"printf('%06d', CAST(({column} - CAST({column} / 1000 AS INTEGER) * 1000) * 1000 AS INTEGER))")
+
+
+def _convert_column(conn, table: str, column: str, kind: str):
+    """Chuyển cột String(ngày) -> Date hoặc Float(ms) -> DateTime, giữ nguyên dữ liệu."""
+    current = _columns(conn, table).get(column)
+    if current is None:
+        return
+    target = sqltypes.Date() if kind == "date" else Timestamp
+    convert = _date_from_string if kind == "date" else _datetime_from_ms
+    if kind == "date" and isinstance(current, sqltypes.Date) and not isinstance(current, sqltypes.DateTime):
+        return
+    if kind == "ms" and isinstance(current, sqltypes.DateTime):
+        return
+
+    if conn.dialect.name == "sqlite":
+        # SQLite không ép kiểu cột: chỉ cần đổi định dạng giá trị tại chỗ
+        expression = convert(conn, column)
+        guard = "typeof({c}) = 'text'" if kind == "date" else "typeof({c}) IN ('real', 'integer')"
+        _backfill(conn, table, f"{column} = {expression}",
+                  f"{guard.format(c=column)} AND {expression} IS NOT NULL AND {column} <> {expression}")
+        return
+
+    if conn.dialect.name != "mssql":
+        raise RuntimeError(f"Migration for {table}.{column} is not implemented for {conn.dialect.name}")
+    if not conn.info.get("majex_allow_destructive"):
+        # DROP COLUMN + sp_rename không an toàn khi app đang chạy: không bao giờ tự chạy lúc khởi động
+        raise RuntimeError(f"Converting {table}.{column} drops and renames a column; "
+                           "run `python migrations.py upgrade` during a maintenance window")
+
+    staging = f"{column}__new"
+    if staging not in _columns(conn, table):
+        _add_column(conn, table, staging, target)
+    expression = convert(conn, column)
+    _backfill(conn, table, f"{staging} = {expression}",
+              f"{staging} IS NULL AND {column} IS NOT NULL AND {expression} IS NOT NULL")
+    conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+    conn.execute(text(f"EXEC sp_rename '{table}.{staging}', '{column}', 'COLUMN'"))
+
+
+# --- MIGRATIONS ---
+
+# Schema trước khi có migration: các bảng gốc (ngày dạng chuỗi, timestamp dạng ms) và
+# bảng backplane, đúng như create_all của các phiên bản đó tạo ra.
+def _v1_tables(meta):
+    Table("users", meta,
+          Column("id", String(50), primary_key=True),
+          Column("name", String(100)),
+          Column("role", String(20)),
+          Column("avatar", String(255)),
+          Column("apartment_id", String(20)),
+          Column("email", String(100)),
+          Column("phone", String(20)),
+          Column("username", String(50)),
+          Column("password", String(100)),
+          Column("status", String(20)))
+    Table("facilities", meta,
+          Column("id", String(50), primary_key=True),
+          Column("name", String(100)),
+          Column("type", String(50)),
+          Column("image", String(255)),
+          Column("open_time", String(10)),
+          Column("close_time", String(10)),
+          Column("price", Float))
+    Table("bills", meta,
+          Column("id", String(50), primary_key=True),
+          Column("user_id", String(50), ForeignKey("users.id")),
+          Column("type", String(50)),
+          Column("amount", Float),
+          Column("due_date", String(20)),
+          Column("status", String(20)),
+          Column("month", String(50)),
+          Column("paid_date", String(20)))
+    Table("bookings", meta,
+          Column("id", String(50), primary_key=True),
+          Column("facility_id", String(50), ForeignKey("facilities.id")),
+          Column("user_id", String(50), ForeignKey("users.id")),
+          Column("facility_name", String(100)),
+          Column("user_name", String(100)),
+          Column("date", String(20)),
+          Column("time_slot", String(20)),
+          Column("qr_code_data", Text),
+          Column("status", String(20)))
+    Table("messages", meta,
+          Column("id", String(50), primary_key=True),
+          Column("sender_id", String(50), ForeignKey("users.id")),
+          Column("sender_name", String(100)),
+          Column("text", Text),
+          Column("timestamp", Float))
+    Table("reports", meta,
+          Column("id", String(50), primary_key=True),
+          Column("user_id", String(50), ForeignKey("users.id")),
+          Column("user_name", String(100)),
+          Column("apartment", String(50)),
+          Column("title", String(100)),
+          Column("description", Text),
+          Column("category", String(50)),
+          Column("status", String(20)),
+          Column("timestamp", Float))
+    Table("announcements", meta,
+          Column("id", String(50), primary_key=True),
+          Column("title", String(200)),
+          Column("content", Text),
+          Column("tone", String(50)),
+          Column("sender_name", String(100)),
+          Column("timestamp", Float))
+    Table("backplane_events", meta,
+          Column("id", Integer, primary_key=True, autoincrement=True),
+          Column("origin", String(50)),
+          Column("payload", Text),
+          Column("created_at", Float, index=True))
+    Table("backplane_presence", meta,
+          Column("worker_id", String(50), primary_key=True),
+          Column("count", Integer),
+          Column("heartbeat", Float))
+
+
+def m0001_baseline(conn):
+    # DB mới: tạo các bảng gốc, các bước sau nâng cấp như với DB cũ. DB cũ: chỉ tạo bảng còn thiếu.
+    _create_tables(conn, _v1_tables)
+
+
+ENTITY_TABLES = ("users", "facilities", "bills", "bookings", "messages", "reports", "announcements")
+
+
+def m0002_add_columns(conn):
+    _add_column_if_missing(conn, "facilities", "booking_mode", String(20), "slot")
+    _add_column_if_missing(conn, "facilities", "capacity", Integer(), 1)
+    _add_column_if_missing(conn, "facilities", "slot_minutes", Integer(), 120)
+    now = models.utcnow()
+    for table_name in ENTITY_TABLES:
+        _add_column_if_missing(conn, table_name, "updated_at", Timestamp, now)
+
+
+def m0003_temporal_types(conn):
+    _convert_column(conn, "bookings", "date", "date")
+    _convert_column(conn, "bills", "due_date", "date")
+    _convert_column(conn, "bills", "paid_date", "date")
+    for table_name in ("messages", "reports", "announcements"):
+        _convert_column(conn, table_name, "timestamp", "ms")
+
+
+def m0004_indexes(conn):
+    for table_name in ENTITY_TABLES:
+        _create_index_if_missing(conn, f"ix_{table_name}_updated_at", table_name, "updated_at")
+    _create_index_if_missing(conn, "ix_users_role_status", "users", "role", "status")
+    _create_index_if_missing(conn, "ix_users_apartment", "users", "apartment_id")
+    _create_index_if_missing(conn, "ix_bills_user_status", "bills", "user_id", "status")
+    _create_index_if_missing(conn, "ix_bills_status_due", "bills", "status", "due_date")
+    _create_index_if_missing(conn, "ix_bills_due_id", "bills", "due_date", "id")
+    _create_index_if_missing(conn, "ix_bookings_facility_date_slot", "bookings", "facility_id", "date", "time_slot")
+    _create_index_if_missing(conn, "ix_bookings_user_status", "bookings", "user_id", "status")
+    _create_index_if_missing(conn, "ix_bookings_status_date", "bookings", "status", "date")
+    _create_index_if_missing(conn, "ix_bookings_date_id", "bookings", "date", "id")
+    _create_index_if_missing(conn, "ix_messages_timestamp_id", "messages", "timestamp", "id")
+    _create_index_if_missing(conn, "ix_messages_sender_timestamp", "messages", "sender_id", "timestamp")
+    _create_index_if_missing(conn, "ix_reports_timestamp_id", "reports", "timestamp", "id")
+    _create_index_if_missing(conn, "ix_reports_user_status", "reports", "user_id", "status")
+    _create_index_if_missing(conn, "ix_reports_status_timestamp", "reports", "status", "timestamp")
+    _create_index_if_missing(conn, "ix_announcements_timestamp_id", "announcements", "timestamp", "id")
+
+
+def m0005_unique_bills(conn):
+    # Không tự xóa dữ liệu trùng: báo lỗi rõ ràng để người vận hành xử lý trước
+    duplicate = conn.execute(text(
+        "SELECT user_id, type, month FROM bills GROUP BY user_id, type, month HAVING COUNT(*) > 1"
+    )).first()
+    if duplicate:
+        raise RuntimeError(f"Duplicate bills for (user_id, type, month) = {tuple(duplicate)}; "
+                           "merge them before running this migration")
+    _create_index_if_missing(conn, "uq_bills_user_type_month", "bills", "user_id", "type", "month", unique=True)
+
+
+def _v6_tables(meta):
+    Table("bill_summary", meta,
+          Column("month", String(50), primary_key=True),
+          Column("type", String(50), primary_key=True),
+          Column("status", String(20), primary_key=True),
+          Column("count", Integer),
+          Column("amount", Float))
+    Table("booking_summary", meta,
+          Column("facility_id", String(50), primary_key=True),
+          Column("month", String(7), primary_key=True),
+          Column("status", String(20), primary_key=True),
+          Column("count", Integer))
+
+
+def m0006_aggregates(conn):
+    _create_tables(conn, _v6_tables)
+    # Tính giá trị ban đầu từ dữ liệu hiện có (sau đó aggregates.py cập nhật tăng dần).
+    # Viết thẳng trên schema của phiên bản này, không gọi aggregates.rebuild (theo models hiện tại).
+    bills = table("bills", column("month"), column("type"), column("status"), column("amount"))
+    bill_summary = table("bill_summary", *(column(name) for name in ("month", "type", "status", "count", "amount")))
+    bookings = table("bookings", column("facility_id"), column("date"), column("status"))
+    booking_summary = table("booking_summary", *(column(name) for name in ("facility_id", "month", "status", "count")))
+    keys = [func.coalesce(bills.c.month, ""), func.coalesce(bills.c.type, ""), func.coalesce(bills.c.status, "")]
+    conn.execute(delete(bill_summary))
+    conn.execute(delete(booking_summary))
+    conn.execute(insert(bill_summary).from_select(
+        ["month", "type", "status", "count", "amount"],
+        select(*keys, func.count(), func.coalesce(func.sum(bills.c.amount), 0)).group_by(*keys)))
+    # Gom theo tháng 'YYYY-MM' trong Python: hàm định dạng ngày khác nhau giữa SQL Server và SQLite
+    months = Counter()
+    for facility_id, day, status, count in conn.execute(
+            select(bookings.c.facility_id, bookings.c.date, bookings.c.status, func.count())
+            .group_by(bookings.c.facility_id, bookings.c.date, bookings.c.status)):
+        months[(facility_id or "", str(day)[:7] if day else "", status or "")] += count
+    rows = [{"facility_id": f, "month": m, "status": st, "count": n} for (f, m, st), n in months.items() if n]
+    for start in range(0, len(rows), BACKFILL_BATCH):
+        conn.execute(insert(booking_summary), rows[start:start + BACKFILL_BATCH])
+
+
+def _v7_tables(meta):
+    Table("search_terms", meta,
+          Column("term", String(64), primary_key=True),
+          Column("doc_count", Integer))
+    Table("search_postings", meta,
+          Column("term", String(64), primary_key=True),
+          Column("doc_type", String(20), primary_key=True),
+          Column("doc_id", String(50), primary_key=True),
+          Column("tf", Integer))
+
+
+# (loại tài liệu, bảng, các cột cần đọc, văn bản) như search.SOURCES ở phiên bản này;
+# tiêu đề lặp hai lần để được xếp cao hơn nội dung
+_V7_SEARCH_SOURCES = (
+    ("message", "messages", ("text",), lambda m: m.text),
+    ("report", "reports", ("title", "description"), lambda r: f"{r.title} {r.title} {r.description}"),
+    ("announcement", "announcements", ("title", "content"), lambda a: f"{a.title} {a.title} {a.content}"),
+)
+
+
+def m0007_search_index(conn):
+    # Chỉ dùng search.tokenize: chỉ mục phải tách từ giống hệt lúc truy vấn
+    from search import tokenize
+    _create_tables(conn, _v7_tables)
+    # Đánh chỉ mục dữ liệu hiện có (về sau chỉ mục được cập nhật khi ghi), trên schema của phiên bản
+    # này. Chạy lại từ đầu nếu bị dừng: xóa phần đã ghi của lần trước.
+    postings = table("search_postings", column("term"), column("doc_type"), column("doc_id"), column("tf"))
+    terms = table("search_terms", column("term"), column("doc_count"))
+    conn.execute(delete(postings))
+    conn.execute(delete(terms))
+    conn.commit()
+    doc_freq = Counter()
+    for doc_type, table_name, fields, text_of in _V7_SEARCH_SOURCES:
+        source = table(table_name, column("id"), *(column(name) for name in fields))
+        after = None
+        while True:
+            query = select(*source.c)
+            if after is not None:
+                query = query.where(source.c.id > after)
+            batch = conn.execute(query.order_by(source.c.id).limit(BACKFILL_BATCH)).all()
+            if not batch:
+                break
+            after = batch[-1].id
+            rows = []
+            for row in batch:
+                counts = Counter(tokenize(text_of(row)))
+                rows.extend({"term": t, "doc_type": doc_type, "doc_id": row.id, "tf": n} for t, n in counts.items())
+                doc_freq.update(counts.keys())
+            if rows:
+                conn.execute(insert(postings), rows)
+            conn.commit()
+    rows = [{"term": t, "doc_count": n} for t, n in doc_freq.items()]
+    for start in range(0, len(rows), BACKFILL_BATCH):
+        conn.execute(insert(terms), rows[start:start + BACKFILL_BATCH])
+
+
+def m0008_checkin(conn):
+    import checkin
+    _add_column_if_missing(conn, "bookings", "qr_hash", String(64))
+    _add_column_if_missing(conn, "bookings", "checked_in_at", Timestamp)
+    # sha256 tính trong Python (không có hàm chung giữa SQL Server và SQLite), theo lô
+    bookings = table("bookings", column("id"), column("qr_code_data"), column("qr_hash"))
+    while True:
+        rows = conn.execute(
+            select(bookings.c.id, bookings.c.qr_code_data)
+            .where(bookings.c.qr_hash.is_(None), bookings.c.qr_code_data.is_not(None))
+            .limit(BACKFILL_BATCH)
+        ).all()
+        if not rows:
+            break
+        conn.execute(bookings.update().where(bookings.c.id == bindparam("b_id")).values(qr_hash=bindparam("b_hash")),
+                     [{"b_id": row.id, "b_hash": checkin.code_hash(row.qr_code_data)} for row in rows])
+        conn.commit()
+    _create_index_if_missing(conn, "ix_bookings_qr_hash", "bookings", "qr_hash")
+
+
+def _v9_tables(meta):
+    Table("notifications", meta,
+          Column("id", String(50), primary_key=True),
+          Column("audience", String(20)),
+          Column("target", String(50)),
+          Column("kind", String(30)),
+          Column("title", String(200)),
+          Column("body", Text),
+          Column("ref_id", String(50)),
+          Column("created_at", Timestamp))
+    Table("notification_cursors", meta,
+          Column("user_id", String(50), primary_key=True),
+          Column("read_at", Timestamp),
+          Column("read_id", String(50)))
+
+
+def m0009_notifications(conn):
+    _create_tables(conn, _v9_tables)
+    _create_index_if_missing(conn, "ix_notifications_audience_created", "notifications",
+                             "audience", "target", "created_at", "id")
+    # Thông báo chung cho các announcement đã có, để hộp thư không bắt đầu từ trống
+    announcements = table("announcements", column("id"), column("title"), column("content"), column("timestamp"))
+    notifications = table("notifications", *(column(name) for name in (
+        "id", "audience", "target", "kind", "title", "body", "ref_id", "created_at")))
+    # Bỏ qua announcement đã có thông báo (lần chạy trước bị dừng giữa chừng)
+    done = select(notifications.c.id).where(notifications.c.kind == "announcement",
+                                            notifications.c.ref_id == announcements.c.id).exists()
+    after = None
+    while True:
+        query = select(announcements.c.id, announcements.c.title, announcements.c.content, announcements.c.timestamp) \
+            .where(~done)
+        if after is not None:
+            query = query.where(announcements.c.id > after)
+        rows = conn.execute(query.order_by(announcements.c.id).limit(BACKFILL_BATCH)).all()
+        if not rows:
+            break
+        after = rows[-1].id
+        conn.execute(notifications.insert(), [
+            {"id": models.generate_uuid(), "audience": "all", "target": "", "kind": "announcement",
+             "title": row.title, "body": row.content, "ref_id": row.id, "created_at": row.timestamp}
+            for row in rows
+        ])
+        conn.commit()
+
+
+def _v10_tables(meta):
+    Table("scheduled_jobs", meta,
+          Column("name", String(50), primary_key=True),
+          Column("locked_by", String(50)),
+          Column("locked_until", Timestamp),
+          Column("next_run_at", Timestamp))
+    Table("job_runs", meta,
+          Column("id", Integer, primary_key=True, autoincrement=True),
+          Column("job", String(50)),
+          Column("worker", String(50)),
+          Column("started_at", Timestamp),
+          Column("finished_at", Timestamp),
+          Column("status", String(20)),
+          Column("rows", Integer),
+          Column("error", Text))
+
+
+def m0010_scheduler(conn):
+    _create_tables(conn, _v10_tables)
+    _create_index_if_missing(conn, "ix_job_runs_job_started", "job_runs", "job", "started_at")
+
+
+def m0011_search_corpus_size(conn):
+    # Tổng số tài liệu giờ đếm từ bảng nguồn (search.CorpusSize): bỏ dòng term rỗng cũ
+    conn.execute(text("DELETE FROM search_terms WHERE term = ''"))
+
+
+def _v12_tables(meta):
+    Table("search_term_shards", meta,
+          Column("term", String(64), primary_key=True),
+          Column("shard", Integer, primary_key=True),
+          Column("doc_count", Integer))
+
+
+def m0012_search_term_shards(conn):
+    # doc_count của term phổ biến là hot row: chia mỗi term thành nhiều dòng (xem search._bump_terms).
+    # Số cũ chuyển vào shard 0. Bảng search_terms được giữ lại cho worker bản cũ còn chạy lúc deploy.
+    _create_tables(conn, _v12_tables)
+    conn.execute(text("DELETE FROM search_term_shards"))
+    conn.execute(text("INSERT INTO search_term_shards (term, shard, doc_count) "
+                      "SELECT term, 0, doc_count FROM search_terms WHERE term <> ''"))
+
+
+def m0013_search_candidates(conn):
+    _create_index_if_missing(conn, "ix_search_postings_term_type_tf", "search_postings", "term", "doc_type", "tf")
+
+
+MIGRATIONS = [
+    (1, "baseline", m0001_baseline),
+    (2, "facility booking columns and updated_at", m0002_add_columns),
+    (3, "native date/datetime columns", m0003_temporal_types),
+    (4, "composite indexes", m0004_indexes),
+    (5, "unique bill per (user, type, month)", m0005_unique_bills),
+    (6, "admin dashboard aggregates", m0006_aggregates),
+    (7, "full-text search index", m0007_search_index),
+    (8, "QR check-in columns", m0008_checkin),
+    (9, "notifications and read cursors", m0009_notifications),
+    (10, "background job locks and run history", m0010_scheduler),
+    (11, "search corpus size from source tables", m0011_search_corpus_size),
+    (12, "sharded search term counts", m0012_search_term_shards),
+    (13, "top-k search candidates per term", m0013_search_candidates),
+]
+
+
+# --- RUNNER ---
+
+def _lock(conn):
+    # Nhiều worker khởi động cùng lúc: chỉ một worker được chạy migration.
+    # Khóa theo session (không theo transaction) vì migration commit nhiều lần.
+    if conn.dialect.name == "mssql":
+        conn.execute(text("EXEC sp_getapplock @Resource = 'majex_schema', @LockMode = 'Exclusive', "
+                          "@LockOwner = 'Session', @LockTimeout = 600000"))
+
+
+def _unlock(conn):
+    if conn.dialect.name == "mssql":
+        conn.execute(text("EXEC sp_releaseapplock @Resource = 'majex_schema', @LockOwner = 'Session'"))
+
+
+def applied_versions(engine=None) -> set:
+    engine = engine or database.engine
+    with engine.connect() as conn:
+        if not inspect(conn).has_table(schema_migrations.name):
+            return set()
+        return {row.version for row in conn.execute(select(schema_migrations.c.version))}
+
+
+def pending(engine=None) -> list:
+    done = applied_versions(engine)
+    return [(version, name) for version, name, _fn in MIGRATIONS if version not in done]
+
+
+def upgrade(engine=None, allow_destructive: bool = False):
+    """Chạy các migration còn thiếu. allow_destructive: cho phép bước viết lại cột (DROP COLUMN)
+    trên SQL Server, chỉ bật khi người vận hành chạy migrate một cách chủ động."""
+    engine = engine or database.engine
+    with engine.begin() as conn:
+        _meta.create_all(conn)
+    for version, name, migrate in MIGRATIONS:
+        with engine.connect() as conn:
+            conn.info["majex_allow_destructive"] = allow_destructive
+            _lock(conn)
+            try:
+                already = conn.execute(
+                    select(schema_migrations.c.version).where(schema_migrations.c.version == version)
+                ).first()
+                if already:
+                    continue
+                # Backfill bên trong tự commit theo lô; phần còn lại commit cùng dòng schema_migrations
+                migrate(conn)
+                conn.execute(insert(schema_migrations).values(version=version, name=name,
+                                                              applied_at=models.utcnow()))
+                conn.commit()
+                print(f"Applied migration {version:04d}: {name}")
+            finally:
+                conn.rollback()
+                _unlock(conn)
+                conn.commit()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "status":
+        missing = pending()
+        print(f"Latest: {MIGRATIONS[-1][0]:04d}, pending: {[f'{v:04d} {n}' for v, n in missing] or 'none'}")
+    elif len(sys.argv) == 1 or sys.argv[1] == "upgrade":
+        upgrade(allow_destructive=True)
+        print("✅ Database schema is up to date!")
+    else:
+        print("Usage: python migrations.py [upgrade | status]")
@@ -1,12 +1,31 @@
-from sqlalchemy import Column, String, Float, Text, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, String, Float, Text, ForeignKey, DateTime, Date, Boolean, Integer, Index
+from sqlalchemy.dialects import mssql
 from sqlalchemy.orm import relationship
 from database import Base
-from datetime import datetime
+from datetime import datetime, timezone
 import uuid
 
+# DateTime lưu UTC (naive). Trên SQL Server dùng DATETIME2(6) thay cho DATETIME
+# (chỉ chính xác tới ~3ms) để khóa phân trang (timestamp, id) không bị trùng.
+Timestamp = DateTime().with_variant(mssql.DATETIME2(precision=6), "mssql")
+
 def generate_uuid():
     return str(uuid.uuid4())
 
+def now_ms():
+    # Timestamp theo định dạng JS (milliseconds)
+    return datetime.now().timestamp() * 1000
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def to_ms(value: datetime) -> float:
+    # DateTime (UTC) -> timestamp JS, định dạng mà frontend vẫn dùng
+    return value.replace(tzinfo=timezone.utc).timestamp() * 1000
+
+def from_ms(value: float) -> datetime:
+    return datetime.fromtimestamp(value / 1000, tz=timezone.utc).replace(tzinfo=None)
+
 class User(Base):
     __tablename__ = "users"
     # Dùng String ID để khớp với frontend (vd: "user_1")
@@ -20,6 +39,12 @@ class User(Base):
     username = Column(String(50), nullable=True)
     password = Column(String(100), nullable=True)
     status = Column(String(20), default='Active')
+    updated_at = Column(Timestamp, default=utcnow, onupdate=utcnow, index=True) # mốc thay đổi cho /sync
+
+    __table_args__ = (
+        Index("ix_users_role_status", "role", "status"),
+        Index("ix_users_apartment", "apartment_id"),
+    )
 
 class Facility(Base):
     __tablename__ = "facilities"
@@ -30,6 +55,12 @@ class Facility(Base):
     open_time = Column(String(10))
     close_time = Column(String(10))
     price = Column(Float, default=0.0)
+    # 'slot': mỗi khung giờ chỉ 1 lượt (sân bóng, sân cầu lông)
+    # 'capacity': mỗi khung giờ nhận tối đa `capacity` lượt (bể bơi, gym)
+    booking_mode = Column(String(20), default='slot')
+    capacity = Column(Integer, default=1)
+    slot_minutes = Column(Integer, default=120)
+    updated_at = Column(Timestamp, default=utcnow, onupdate=utcnow, index=True)
 
 class Bill(Base):
     __tablename__ = "bills"
@@ -37,10 +68,20 @@ class Bill(Base):
     user_id = Column(String(50), ForeignKey("users.id"))
     type = Column(String(50)) 
     amount = Column(Float)
-    due_date = Column(String(20)) 
+    due_date = Column(Date) 
     status = Column(String(20)) 
     month = Column(String(50))
-    paid_date = Column(String(20), nullable=True)
+    paid_date = Column(Date, nullable=True)
+    updated_at = Column(Timestamp, default=utcnow, onupdate=utcnow, index=True)
+
+    __table_args__ = (
+        # Hóa đơn của một resident theo trạng thái; quét hóa đơn quá hạn theo due_date
+        Index("ix_bills_user_status", "user_id", "status"),
+        Index("ix_bills_status_due", "status", "due_date"),
+        Index("ix_bills_due_id", "due_date", "id"),
+        # Mỗi resident chỉ có một hóa đơn cho mỗi (loại, tháng): giữ cho import/phát hành hàng loạt idempotent
+        Index("uq_bills_user_type_month", "user_id", "type", "month", unique=True),
+    )
 
 class Booking(Base):
     __tablename__ = "bookings"
@@ -49,10 +90,22 @@ class Booking(Base):
     user_id = Column(String(50), ForeignKey("users.id"))
     facility_name = Column(String(100))
     user_name = Column(String(100))
-    date = Column(String(20))
+    date = Column(Date)
     time_slot = Column(String(20))
     qr_code_data = Column(Text)
+    qr_hash = Column(String(64)) # sha256 của qr_code_data (Text không index được), xem checkin.py
     status = Column(String(20))
+    checked_in_at = Column(Timestamp) # Thời điểm quét mã ở cổng; chỉ được gán một lần
+    updated_at = Column(Timestamp, default=utcnow, onupdate=utcnow, index=True)
+
+    __table_args__ = (
+        # Tra cứu lịch trống theo (facility, ngày) và kiểm tra trùng khung giờ
+        Index("ix_bookings_facility_date_slot", "facility_id", "date", "time_slot"),
+        Index("ix_bookings_user_status", "user_id", "status"),
+        Index("ix_bookings_status_date", "status", "date"),
+        Index("ix_bookings_date_id", "date", "id"),
+        Index("ix_bookings_qr_hash", "qr_hash"),
+    )
 
 class Message(Base):
     __tablename__ = "messages"
@@ -60,7 +113,14 @@ class Message(Base):
     sender_id = Column(String(50), ForeignKey("users.id"))
     sender_name = Column(String(100))
     text = Column(Text)
-    timestamp = Column(Float, default=lambda: datetime.now().timestamp() * 1000) # JS timestamp format
+    timestamp = Column(Timestamp, default=utcnow)
+    updated_at = Column(Timestamp, default=utcnow, onupdate=utcnow, index=True)
+
+    __table_args__ = (
+        # Khóa phân trang (timestamp, id)
+        Index("ix_messages_timestamp_id", "timestamp", "id"),
+        Index("ix_messages_sender_timestamp", "sender_id", "timestamp"),
+    )
 
 class Report(Base):
     __tablename__ = "reports"
@@ -72,8 +132,15 @@ class Report(Base):
     description = Column(Text)
     category = Column(String(50))
     status = Column(String(20))
-    timestamp = Column(Float, default=lambda: datetime.now().timestamp() * 1000)
-    
+    timestamp = Column(Timestamp, default=utcnow)
+    updated_at = Column(Timestamp, default=utcnow, onupdate=utcnow, index=True)
+
+    __table_args__ = (
+        Index("ix_reports_timestamp_id", "timestamp", "id"),
+        Index("ix_reports_user_status", "user_id", "status"),
+        Index("ix_reports_status_timestamp", "status", "timestamp"),
+    )
+
 class Announcement(Base):
     __tablename__ = "announcements"
     id = Column(String(50), primary_key=True, default=generate_uuid)
@@ -81,4 +148,111 @@ class Announcement(Base):
     content = Column(Text)
     tone = Column(String(50))
     sender_name = Column(String(100), default="Admin")
-    timestamp = Column(Float, default=lambda: datetime.now().timestamp() * 1000)
\ No newline at end of file
+    timestamp = Column(Timestamp, default=utcnow)
+    updated_at = Column(Timestamp, default=utcnow, onupdate=utcnow, index=True)
+
+    __table_args__ = (
+        Index("ix_announcements_timestamp_id", "timestamp", "id"),
+    )
+
+# --- NOTIFICATIONS (fan-out-on-read, xem notifications.py) ---
+# Một dòng cho mỗi thông báo, kể cả khi gửi cho cả toà nhà; hộp thư của từng user
+# được ghép lúc đọc theo (audience, target).
+class Notification(Base):
+    __tablename__ = "notifications"
+    id = Column(String(50), primary_key=True, default=generate_uuid)
+    audience = Column(String(20)) # 'all' | 'building' | 'apartment' | 'user'
+    target = Column(String(50), default="") # tòa nhà / căn hộ / user id ('' khi audience='all')
+    kind = Column(String(30)) # 'announcement' | 'bill' | 'report' | 'notice'
+    title = Column(String(200))
+    body = Column(Text)
+    ref_id = Column(String(50), nullable=True) # id của announcement / bill / report liên quan
+    created_at = Column(Timestamp, default=utcnow)
+
+    __table_args__ = (
+        Index("ix_notifications_audience_created", "audience", "target", "created_at", "id"),
+    )
+
+# Mốc đã đọc của từng user: mọi thông báo có (created_at, id) <= mốc là đã đọc
+class NotificationCursor(Base):
+    __tablename__ = "notification_cursors"
+    user_id = Column(String(50), primary_key=True)
+    read_at = Column(Timestamp)
+    read_id = Column(String(50))
+
+# --- BACKPLANE (pub/sub giữa nhiều worker, xem backplane.py) ---
+class BackplaneEvent(Base):
+    __tablename__ = "backplane_events"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    origin = Column(String(50)) # worker đã phát sự kiện
+    payload = Column(Text)
+    created_at = Column(Float, default=now_ms, index=True)
+
+class BackplanePresence(Base):
+    __tablename__ = "backplane_presence"
+    worker_id = Column(String(50), primary_key=True)
+    count = Column(Integer, default=0)
+    heartbeat = Column(Float, default=now_ms)
+
+# --- AGGREGATES (bảng tổng hợp cho dashboard admin, xem aggregates.py) ---
+class BillSummary(Base):
+    __tablename__ = "bill_summary"
+    month = Column(String(50), primary_key=True)
+    type = Column(String(50), primary_key=True)
+    status = Column(String(20), primary_key=True)
+    count = Column(Integer, default=0)
+    amount = Column(Float, default=0)
+
+class BookingSummary(Base):
+    __tablename__ = "booking_summary"
+    facility_id = Column(String(50), primary_key=True)
+    month = Column(String(7), primary_key=True) # 'YYYY-MM' theo ngày booking
+    status = Column(String(20), primary_key=True)
+    count = Column(Integer, default=0)
+
+# --- SCHEDULER (job nền chạy định kỳ, xem scheduler.py) ---
+# Một dòng cho mỗi job: khóa có hạn (lease) để chỉ một worker chạy job tại một thời điểm,
+# và lần chạy kế tiếp dùng chung cho mọi worker.
+class ScheduledJob(Base):
+    __tablename__ = "scheduled_jobs"
+    name = Column(String(50), primary_key=True)
+    locked_by = Column(String(50), nullable=True) # worker đang giữ khóa
+    locked_until = Column(Timestamp, nullable=True) # khóa tự hết hạn nếu worker chết giữa chừng
+    next_run_at = Column(Timestamp, nullable=True)
+
+class JobRun(Base):
+    __tablename__ = "job_runs"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job = Column(String(50))
+    worker = Column(String(50))
+    started_at = Column(Timestamp)
+    finished_at = Column(Timestamp)
+    status = Column(String(20)) # 'ok' | 'error'
+    rows = Column(Integer, default=0) # số dòng được cập nhật
+    error = Column(Text, nullable=True)
+
+    __table_args__ = (
+        Index("ix_job_runs_job_started", "job", "started_at"),
+    )
+
+# --- SEARCH (chỉ mục đảo cho tìm kiếm toàn văn, xem search.py) ---
+# Số tài liệu chứa term (để tính idf), chia thành nhiều dòng (shard) cho mỗi term: các lô ghi
+# đồng thời cộng vào những dòng khác nhau thay vì cùng khóa một dòng của term phổ biến.
+# df = SUM(doc_count) theo term. (Bảng search_terms cũ không còn được dùng.)
+class SearchTermShard(Base):
+    __tablename__ = "search_term_shards"
+    term = Column(String(64), primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    doc_count = Column(Integer, default=0)
+
+class SearchPosting(Base):
+    __tablename__ = "search_postings"
+    term = Column(String(64), primary_key=True)
+    doc_type = Column(String(20), primary_key=True) # 'message' | 'report' | 'announcement'
+    doc_id = Column(String(50), primary_key=True)
+    tf = Column(Integer, default=1)
+
+    __table_args__ = (
+        # Top-k tài liệu theo tf của một term, xem search._top_postings
+        Index("ix_search_postings_term_type_tf", "term", "doc_type", "tf"),
+    )
@@ -0,0 +1,214 @@
+# backend/notifications.py
+# Thông báo cho cư dân theo kiểu fan-out-on-read: mỗi thông báo là MỘT dòng gắn với
+# một nhóm nhận (audience, target) = ('all', ''), ('building', 'A'), ('apartment', 'A-402')
+# hoặc ('user', user_id). Hộp thư của một user được ghép lúc đọc từ các nhóm user đó thuộc
+# về, nên thông báo gửi cho 10k cư dân vẫn chỉ ghi một dòng. Trạng thái đã đọc là một mốc
+# (created_at, id) cho mỗi user thay vì một dòng cho mỗi cặp (user, thông báo).
+#
+# Thông báo được đẩy realtime qua /ws/chat tới đúng nhóm sau khi transaction commit
+# (frame "notification" có audience/target, ConnectionManager lọc theo nhóm đã identify).
+import asyncio
+import os
+
+from fastapi import HTTPException
+from sqlalchemy import and_, event, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import models
+import pagination
+
+AUDIENCES = ("all", "building", "apartment", "user")
+# Đếm chưa đọc tối đa tới N (giao diện hiển thị "99+"), để truy vấn không phụ thuộc lịch sử
+UNREAD_COUNT_CAP = int(os.getenv("UNREAD_COUNT_CAP", "100"))
+
+_PENDING = "majex_pending_notifications"
+_publisher = None  # (event loop, coroutine function nhận một frame)
+
+
+def building_of(apartment_id: str):
+    # Căn hộ dạng "A-402" -> tòa "A"
+    if apartment_id and "-" in apartment_id:
+        return apartment_id.split("-", 1)[0]
+    return None
+
+
+def audiences_for(user: models.User) -> list:
+    """Các nhóm (audience, target) mà user nhận thông báo."""
+    groups = [("all", ""), ("user", user.id)]
+    if user.apartment_id:
+        groups.append(("apartment", user.apartment_id))
+        if building_of(user.apartment_id):
+            groups.append(("building", building_of(user.apartment_id)))
+    return groups
+
+
+def subscriptions_for(db: Session, user_id: str) -> set:
+    """Nhóm để lọc frame realtime cho một kết nối WebSocket (rỗng nếu không biết user)."""
+    user = db.query(models.User).filter(models.User.id == user_id).first() if user_id else None
+    return set(audiences_for(user)) if user else set()
+
+
+def to_frame(row) -> dict:
+    return {
+        "type": "notification",
+        "id": row["id"],
+        "audience": row["audience"],
+        "target": row["target"],
+        "kind": row["kind"],
+        "title": row["title"],
+        "body": row["body"],
+        "refId": row["ref_id"],
+        "timestamp": models.to_ms(row["created_at"]),
+    }
+
+
+# --- GHI ---
+
+def notify_many(db: Session, notices):
+    """notices: các dict (audience, target, kind, title, body, ref_id). Ghi bằng executemany,
+    đẩy realtime sau khi caller commit."""
+    rows = []
+    for notice in notices:
+        audience = notice["audience"]
+        if audience not in AUDIENCES:
+            raise HTTPException(status_code=400, detail=f"audience must be one of {list(AUDIENCES)}")
+        target = "" if audience == "all" else (notice.get("target") or "")
+        if audience != "all" and not target:
+            raise HTTPException(status_code=400, detail=f"audience '{audience}' requires a target")
+        rows.append({
+            "id": models.generate_uuid(), "audience": audience, "target": target,
+            "kind": notice["kind"], "title": notice["title"], "body": notice.get("body") or "",
+            "ref_id": notice.get("ref_id"), "created_at": models.utcnow(),
+        })
+    if not rows:
+        return []
+    db.execute(insert(models.Notification.__table__), rows)
+    db.info.setdefault(_PENDING, []).extend(to_frame(row) for row in rows)
+    return rows
+
+
+def notify(db: Session, audience: str, target: str, kind: str, title: str, body: str = "", ref_id: str = None) -> dict:
+    return notify_many(db, [{"audience": audience, "target": target, "kind": kind,
+                             "title": title, "body": body, "ref_id": ref_id}])[0]
+
+
+def bills_issued(db: Session, bills):
+    """Một thông báo cho mỗi user có hóa đơn mới trong lô (không phải mỗi hóa đơn)."""
+    by_user = {}
+    for bill in bills:
+        by_user.setdefault(bill["user_id"], []).append(bill)
+    notify_many(db, ({
+        "audience": "user", "target": user_id, "kind": "bill",
+        "title": "Có hóa đơn mới",
+        "body": ", ".join(f"{b['type']} {b['month']}: {b['amount']:,.0f}" for b in user_bills),
+        "ref_id": user_bills[0]["id"] if len(user_bills) == 1 else None,
+    } for user_id, user_bills in by_user.items()))
+
+
+# --- ĐẨY REALTIME SAU COMMIT ---
+
+def attach(loop, publish):
+    """Gọi lúc khởi động: publish(frame) là coroutine phát frame qua backplane."""
+    global _publisher
+    _publisher = (loop, publish)
+
+
+def _schedule(publish, frame):
+    asyncio.ensure_future(publish(frame))
+
+
+@event.listens_for(Session, "after_commit")
+def _push_after_commit(session):
+    frames = session.info.pop(_PENDING, None)
+    if not frames or _publisher is None:
+        return
+    loop, publish = _publisher
+    # Commit có thể chạy trên thread pool (endpoint sync) hoặc ngay trên event loop (session async)
+    for frame in frames:
+        loop.call_soon_threadsafe(_schedule, publish, frame)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_after_rollback(session):
+    session.info.pop(_PENDING, None)
+
+
+# --- ĐỌC ---
+
+def _get_user(db: Session, user_id: str) -> models.User:
+    user = db.query(models.User).filter(models.User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+
+def _visible(user: models.User):
+    n = models.Notification
+    return or_(*(and_(n.audience == audience, n.target == target) for audience, target in audiences_for(user)))
+
+
+def _read_key(db: Session, user_id: str):
+    cursor = db.query(models.NotificationCursor).filter(models.NotificationCursor.user_id == user_id).first()
+    return (cursor.read_at, cursor.read_id) if cursor else None
+
+
+def _after(key):
+    n = models.Notification
+    return or_(n.created_at > key[0], and_(n.created_at == key[0], n.id > key[1]))
+
+
+def inbox(db: Session, user_id: str, cursor: str = None, limit: int = pagination.DEFAULT_PAGE_SIZE) -> dict:
+    user = _get_user(db, user_id)
+    read_key = _read_key(db, user_id)
+    n = models.Notification
+    rows, next_cursor = pagination.paginate(db.query(n).filter(_visible(user)), [n.created_at, n.id],
+                                            cursor, limit, descending=True)
+    items = [{
+        "id": row.id, "audience": row.audience, "target": row.target, "kind": row.kind,
+        "title": row.title, "body": row.body, "ref_id": row.ref_id, "created_at": row.created_at,
+        "read": read_key is not None and (row.created_at, row.id) <= read_key,
+    } for row in rows]
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def _unread(db: Session, user: models.User) -> dict:
+    read_key = _read_key(db, user.id)
+    query = select(models.Notification.id).where(_visible(user))
+    if read_key is not None:
+        query = query.where(_after(read_key))
+    count = db.execute(select(func.count()).select_from(query.limit(UNREAD_COUNT_CAP).subquery())).scalar()
+    return {"unread": count, "capped": count >= UNREAD_COUNT_CAP}
+
+
+def unread_count(db: Session, user_id: str) -> dict:
+    return _unread(db, _get_user(db, user_id))
+
+
+def mark_read(db: Session, user_id: str, until: str = None) -> dict:
+    """Dời mốc đã đọc tới thông báo `until` (mặc định: thông báo mới nhất). Mốc chỉ tiến, không lùi."""
+    user = _get_user(db, user_id)
+    n = models.Notification
+    query = db.query(n.created_at, n.id).filter(_visible(user))
+    if until:
+        last = query.filter(n.id == until).first()
+        if last is None:
+            raise HTTPException(status_code=404, detail="Notification not found")
+    else:
+        last = query.order_by(n.created_at.desc(), n.id.desc()).first()
+    if last is not None:
+        table = models.NotificationCursor.__table__
+        moved = db.execute(
+            update(table).where(table.c.user_id == user_id,
+                                or_(table.c.read_at < last.created_at,
+                                    and_(table.c.read_at == last.created_at, table.c.read_id < last.id)))
+            .values(read_at=last.created_at, read_id=last.id)
+        ).rowcount
+        if not moved and _read_key(db, user_id) is None:
+            try:
+                with db.begin_nested():
+                    db.execute(insert(table).values(user_id=user_id, read_at=last.created_at, read_id=last.id))
+            except IntegrityError:
+                pass  # request khác vừa tạo mốc; giữ mốc đó (cùng lắm chỉ chậm hơn một thông báo)
+        db.commit()
+    return _unread(db, user)
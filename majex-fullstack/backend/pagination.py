@@ -0,0 +1,108 @@
+# backend/pagination.py
+# Keyset (cursor) pagination dùng chung cho các endpoint dạng danh sách.
+# Thay vì OFFSET (phải quét lại toàn bộ các trang trước), mỗi trang lọc theo
+# giá trị khóa sắp xếp của dòng cuối trang trước: WHERE (ts, id) > (:ts, :id).
+# Khóa có thể NULL (vd: Booking.date của dữ liệu cũ): NULL được coi là nhỏ nhất, đúng thứ tự
+# ORDER BY của SQL Server và SQLite (NULL đứng đầu khi tăng dần, cuối khi giảm dần).
+import base64
+import json
+from datetime import date, datetime
+
+from fastapi import HTTPException
+from sqlalchemy import and_, false, or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def _dump_value(value):
+    # Giữ nguyên kiểu date/datetime khi đi qua JSON
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    return value
+
+
+def _load_value(value):
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        raise ValueError("Unknown cursor value")
+    return value
+
+
+def encode_cursor(values) -> str:
+    raw = json.dumps([_dump_value(v) for v in values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str, size: int) -> list:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError("Unexpected cursor size")
+        return [_load_value(v) for v in values]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _nullable(key) -> bool:
+    return getattr(key, "nullable", True)
+
+
+def decode_keys(token: str, keys) -> list:
+    """decode_cursor cho các cột `keys`, kiểm tra kiểu từng giá trị (cursor bị sửa -> 400, không phải 500)."""
+    values = decode_cursor(token, len(keys))
+    for key, value in zip(keys, values):
+        if value is None:
+            if _nullable(key):
+                continue
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        try:
+            expected = key.type.python_type
+        except NotImplementedError:
+            continue  # biểu thức không rõ kiểu (vd: điểm xếp hạng)
+        if expected is float:
+            expected = (int, float)
+        if not isinstance(value, expected) or isinstance(value, bool):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def _step(key, value, descending: bool):
+    # key đứng sau value theo thứ tự sắp xếp, với NULL nhỏ hơn mọi giá trị
+    if value is None:
+        return false() if descending else key.is_not(None)
+    if descending:
+        return or_(key < value, key.is_(None)) if _nullable(key) else key < value
+    return key > value
+
+
+def after(keys, values, descending: bool = False):
+    # Khai triển (a, b) > (x, y) thành a > x OR (a = x AND b > y)
+    # vì SQL Server không hỗ trợ so sánh tuple. (key == None được render thành IS NULL.)
+    clauses = []
+    for i, key in enumerate(keys):
+        equal = [keys[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equal, _step(key, values[i], descending)))
+    return or_(*clauses)
+
+
+def paginate(query, keys, cursor=None, limit=DEFAULT_PAGE_SIZE, descending=False):
+    """Trả về (items, next_cursor). `keys` là các cột sắp xếp, cột cuối phải là khóa duy nhất (id)."""
+    if cursor:
+        query = query.filter(after(keys, decode_keys(cursor, keys), descending))
+    order = [k.desc() if descending else k.asc() for k in keys]
+    # Lấy dư 1 dòng để biết còn trang sau hay không
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, k.key) for k in keys)
+    return rows, next_cursor
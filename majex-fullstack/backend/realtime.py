@@ -0,0 +1,298 @@
+# backend/realtime.py
+# Quản lý kết nối WebSocket và phát tin (fan-out) cho chat realtime.
+# Mỗi kết nối có một hàng đợi gửi có giới hạn và một writer task riêng:
+# broadcast chỉ encode tin nhắn một lần rồi đẩy vào hàng đợi của từng socket,
+# nên một client chậm/treo không làm chậm những client còn lại.
+#
+# Hai phiên bản giao thức, chọn bằng subprotocol lúc bắt tay:
+#   - mặc định (client hiện tại): mỗi sự kiện là một text frame JSON.
+#   - "majex.v2" (client tự xin, cần cài msgpack): binary frame MessagePack chứa MẢNG các
+#     sự kiện, gom trong cửa sổ WS_BATCH_WINDOW_MS; số online là trạng thái chứ không phải
+#     sự kiện: chỉ gửi giá trị mới nhất và chỉ khi nó đổi. Client gửi lên một map MessagePack.
+# permessage-deflate do server ASGI (uvicorn) thương lượng, áp dụng cho cả hai phiên bản.
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Dict
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+import backplane
+import cache
+import metrics
+
+# Số frame tối đa được xếp hàng cho mỗi kết nối
+WS_MAX_QUEUE = int(os.getenv("WS_MAX_QUEUE", "256"))
+# Nếu frame cũ nhất chưa gửi được quá số giây này thì ngắt kết nối (slow consumer)
+WS_MAX_LAG_SECONDS = float(os.getenv("WS_MAX_LAG_SECONDS", "5"))
+
+# Cửa sổ gom sự kiện thành một frame cho client v2 (0 = gửi ngay những gì đang chờ)
+WS_BATCH_WINDOW = float(os.getenv("WS_BATCH_WINDOW_MS", "20")) / 1000
+WS_BATCH_MAX = 64
+
+try:
+    import msgpack
+except ImportError:
+    # Chưa cài msgpack -> mọi client dùng JSON (client xin v2 vẫn kết nối được, không có subprotocol)
+    msgpack = None
+
+PROTOCOL_V2 = "majex.v2"
+
+# Mã đóng 1013 = "Try Again Later"
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+def encode_frame(message: dict) -> str:
+    # Giống với WebSocket.send_json của Starlette
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+def encode_binary(message: dict) -> bytes:
+    return msgpack.packb(message)
+
+
+def pack_batch(items: list) -> bytes:
+    # Mảng MessagePack = header + các phần tử đã encode nối tiếp: không encode lại từng sự kiện
+    return msgpack.Packer().pack_array_header(len(items)) + b"".join(items)
+
+
+def negotiate(websocket: WebSocket):
+    """Subprotocol trả lời client, hoặc None (JSON như trước)."""
+    if msgpack is not None and PROTOCOL_V2 in websocket.scope.get("subprotocols", ()):
+        return PROTOCOL_V2
+    return None
+
+
+class ClientConnection:
+    def __init__(self, websocket: WebSocket, max_queue: int, binary: bool = False,
+                 batch_window: float = WS_BATCH_WINDOW):
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.binary = binary
+        self.batch_window = batch_window
+        # v2: số online mới nhất và số đã gửi; chỉ gửi khi khác nhau
+        self.presence = None
+        self.presence_sent = None
+        self.pending = deque()  # (thời điểm xếp hàng, frame)
+        self.wakeup = asyncio.Event()
+        self.in_flight_since = None
+        self.sent = 0
+        self.closed = False
+        self.task = None
+        # Các nhóm (audience, target) nhận thông báo, gán khi client gửi frame 'identify'
+        self.subscriptions = set()
+
+    def queue_depth(self) -> int:
+        return len(self.pending)
+
+    def lag(self, now: float) -> float:
+        if self.in_flight_since is not None:
+            oldest = self.in_flight_since
+        elif self.pending:
+            oldest = self.pending[0][0]
+        else:
+            return 0.0
+        return now - oldest
+
+    def encode(self, message: dict):
+        return encode_binary(message) if self.binary else encode_frame(message)
+
+    def set_presence(self, count: int):
+        self.presence = count
+        self.wakeup.set()
+
+    def enqueue(self, frame, now: float) -> bool:
+        if self.closed or len(self.pending) >= self.max_queue:
+            return False
+        self.pending.append((now, frame))
+        self.wakeup.set()
+        return True
+
+    async def run_writer(self):
+        while not self.closed:
+            if not self.pending and self.presence == self.presence_sent:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+            if self.binary:
+                await self._write_batch()
+                continue
+            since, frame = self.pending.popleft()
+            self.in_flight_since = since
+            await self.websocket.send_text(frame)
+            self.in_flight_since = None
+            self.sent += 1
+            metrics.ws_frames_sent.inc()
+            metrics.ws_bytes_sent.inc("json", amount=len(frame))
+
+    async def _write_batch(self):
+        if self.batch_window and len(self.pending) < WS_BATCH_MAX:
+            # Chờ thêm một chút để các sự kiện đến sát nhau đi chung một frame
+            await asyncio.sleep(self.batch_window)
+            if self.closed:
+                return
+        batch = [self.pending.popleft() for _ in range(min(len(self.pending), WS_BATCH_MAX))]
+        items = [frame for _since, frame in batch]
+        if self.presence != self.presence_sent:
+            items.append(encode_binary({"type": "online_count", "count": self.presence}))
+            self.presence_sent = self.presence
+        frame = pack_batch(items)
+        self.in_flight_since = batch[0][0] if batch else time.monotonic()
+        await self.websocket.send_bytes(frame)
+        self.in_flight_since = None
+        self.sent += 1
+        metrics.ws_frames_sent.inc()
+        metrics.ws_bytes_sent.inc("msgpack", amount=len(frame))
+
+
+class ConnectionManager:
+    def __init__(self, max_queue: int = WS_MAX_QUEUE, max_lag: float = WS_MAX_LAG_SECONDS,
+                 bus: backplane.Backplane = None, history=None):
+        self.max_queue = max_queue
+        self.max_lag = max_lag
+        self.connections: Dict[WebSocket, ClientConnection] = {}
+        self.evicted = 0
+        self.online_count = 0
+        # Broadcast đi qua backplane để các worker khác cũng nhận được
+        self.bus = bus or backplane.InProcessBackplane()
+        # Ring buffer tin nhắn gần đây (chat_history.ChatHistory), được đổ từ đường broadcast
+        self.history = history
+
+    async def start(self):
+        await self.bus.start(self.deliver_local)
+
+    async def stop(self):
+        await self.bus.stop()
+
+    @property
+    def active_connections(self):
+        return list(self.connections)
+
+    async def connect(self, websocket: WebSocket):
+        subprotocol = negotiate(websocket)
+        await websocket.accept(subprotocol=subprotocol)
+        conn = ClientConnection(websocket, self.max_queue, binary=subprotocol == PROTOCOL_V2)
+        conn.task = asyncio.create_task(conn.run_writer())
+        # Writer lỗi (socket hỏng) thì gỡ kết nối luôn thay vì bỏ qua lỗi
+        conn.task.add_done_callback(lambda task: self._writer_done(websocket, task))
+        self.connections[websocket] = conn
+        metrics.ws_connections.inc()
+        metrics.ws_active.set(value=len(self.connections))
+
+    def disconnect(self, websocket: WebSocket):
+        conn = self.connections.pop(websocket, None)
+        if conn is None:
+            return
+        conn.closed = True
+        conn.pending.clear()
+        metrics.ws_active.set(value=len(self.connections))
+        if conn.task and not conn.task.done():
+            conn.task.cancel()
+
+    def _writer_done(self, websocket: WebSocket, task: asyncio.Task):
+        if not task.cancelled():
+            task.exception()  # lỗi gửi = client đã mất: gỡ kết nối, không log "exception never retrieved"
+        self.disconnect(websocket)
+
+    def _evict(self, conn: ClientConnection):
+        self.disconnect(conn.websocket)
+        self.evicted += 1
+        metrics.ws_evictions.inc()
+        asyncio.create_task(self._close_quietly(conn.websocket))
+
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket):
+        try:
+            await websocket.close(code=SLOW_CONSUMER_CLOSE_CODE)
+        except Exception:
+            pass
+
+    def send(self, websocket: WebSocket, message: dict) -> bool:
+        """Gửi một frame cho riêng một kết nối, qua cùng hàng đợi với broadcast (giữ thứ tự)."""
+        conn = self.connections.get(websocket)
+        if conn is None:
+            return False
+        now = time.monotonic()
+        if conn.lag(now) > self.max_lag or not conn.enqueue(conn.encode(message), now):
+            self._evict(conn)
+            return False
+        return True
+
+    async def receive(self, websocket: WebSocket) -> dict:
+        """Frame tiếp theo từ client: text JSON hoặc binary MessagePack (v2)."""
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        if message.get("bytes") is not None:
+            if msgpack is None:
+                raise ValueError("binary frames require msgpack")
+            return msgpack.unpackb(message["bytes"])
+        return json.loads(message["text"])
+
+    def subscribe(self, websocket: WebSocket, subscriptions: set):
+        conn = self.connections.get(websocket)
+        if conn is not None:
+            conn.subscriptions = subscriptions
+
+    async def broadcast(self, message: dict):
+        await self.bus.publish(message)
+
+    async def update_presence(self):
+        # Báo số kết nối local lên backplane; worker khác tự cập nhật tổng và báo cho client của họ
+        self.online_count = await self.bus.update_presence(len(self.connections))
+        await self.deliver_local({"type": "online_count", "count": self.online_count})
+
+    async def deliver_local(self, message: dict):
+        if message.get("type") == cache.INVALIDATE:
+            # Sự kiện giữa các worker, không gửi cho client
+            cache.on_invalidate(message)
+            return
+        presence = None
+        if message.get("type") == "online_count":
+            self.online_count = presence = message["count"]
+        elif message.get("type") == "message" and self.history is not None:
+            self.history.add(message)
+        conns = list(self.connections.values())
+        audience = message.get("audience")
+        if audience is not None and audience != "all":
+            # Thông báo cho một tòa / căn hộ / user: chỉ gửi cho kết nối đã identify thuộc nhóm đó
+            group = (audience, message.get("target"))
+            conns = [conn for conn in conns if group in conn.subscriptions]
+        # Encode một lần cho mỗi giao thức; việc gửi do writer task của từng socket đảm nhận
+        frames = {}
+        now = time.monotonic()
+        for conn in conns:
+            if conn.lag(now) > self.max_lag:
+                self._evict(conn)
+                continue
+            if presence is not None and conn.binary:
+                conn.set_presence(presence)
+                continue
+            frame = frames.get(conn.binary)
+            if frame is None:
+                frame = frames[conn.binary] = conn.encode(message)
+            if not conn.enqueue(frame, now):
+                self._evict(conn)
+
+    def get_online_count(self):
+        return self.online_count
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "online": self.online_count,
+            "local": len(self.connections),
+            "evicted": self.evicted,
+            "connections": [
+                {
+                    "client": f"{conn.websocket.client.host}:{conn.websocket.client.port}" if conn.websocket.client else None,
+                    "protocol": PROTOCOL_V2 if conn.binary else "json",
+                    "queueDepth": conn.queue_depth(),
+                    "lagSeconds": round(conn.lag(now), 3),
+                    "sent": conn.sent,
+                }
+                for conn in self.connections.values()
+            ],
+        }
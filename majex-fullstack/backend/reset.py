@@ -1,26 +1,27 @@
 from database import engine
-from sqlalchemy import text
+import models
+import migrations
+import sys
 
-def reset_database():
-    with engine.connect() as connection:
-        # Tắt ràng buộc khóa ngoại để xóa bảng dễ dàng
-        connection.execute(text("EXEC sp_msforeachtable 'ALTER TABLE ? NOCHECK CONSTRAINT all'"))
-        
-        # Danh sách bảng cần xóa (bao gồm cả tên bảng cũ và mới để chắc chắn)
-        tables = ["bookings", "bills", "reports", "facilities", "users", 
-                  "Bookings", "Bills", "Reports", "Facilities", "Users", "Messages"]
-        
-        for table in tables:
-            try:
-                connection.execute(text(f"DROP TABLE IF EXISTS [{table}]"))
-                print(f"Deleted table: {table}")
-            except Exception as e:
-                print(f"Error deleting {table}: {e}")
-                
-        # Bật lại ràng buộc khóa ngoại
-        connection.execute(text("EXEC sp_msforeachtable 'ALTER TABLE ? WITH CHECK CHECK CONSTRAINT all'"))
-        connection.commit()
-        print("✅ Database reset complete!")
+def reset_database(drop: bool = False):
+    # Mặc định chỉ xóa dữ liệu, giữ nguyên schema (đổi schema bằng migrations.py)
+    with engine.begin() as connection:
+        for table in reversed(models.Base.metadata.sorted_tables):
+            if drop:
+                table.drop(connection, checkfirst=True)
+                print(f"Dropped table: {table.name}")
+            else:
+                connection.execute(table.delete())
+                print(f"Cleared table: {table.name}")
+        if drop:
+            migrations.schema_migrations.drop(connection, checkfirst=True)
+
+    if drop:
+        # Tạo lại schema mới nhất
+        migrations.upgrade(allow_destructive=True)
+    print("✅ Database reset complete!")
 
 if __name__ == "__main__":
-    reset_database()
\ No newline at end of file
+    # python reset.py         -> xóa dữ liệu
+    # python reset.py --drop  -> xóa bảng và tạo lại bằng migrations
+    reset_database(drop="--drop" in sys.argv)
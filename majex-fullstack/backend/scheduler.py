@@ -0,0 +1,261 @@
+# backend/scheduler.py
+# Job nền chạy định kỳ trong process (khởi động cùng app trong lifespan), dùng cho các
+# chuyển trạng thái theo thời gian mà trước đây không ai thực hiện:
+#   - hóa đơn Unpaid quá due_date -> Overdue
+#   - booking Confirmed đã qua khung giờ -> Completed
+# Mỗi job là một câu UPDATE theo tập (index (status, date)), chạy theo lô có giới hạn để
+# không giữ khóa ghi lâu; RETURNING trả về đúng các dòng đã đổi để cập nhật bảng tổng hợp.
+# Khi chạy nhiều worker, bảng scheduled_jobs giữ khóa có hạn + lần chạy kế tiếp nên mỗi
+# lượt chỉ một worker chạy; thời gian chờ có jitter để các worker không thức dậy cùng lúc.
+# Lịch sử chạy lưu ở bảng job_runs.
+#
+#   python scheduler.py list            # trạng thái và các lần chạy gần nhất
+#   python scheduler.py run <job>       # chạy ngay một job (bỏ qua lịch, vẫn lấy khóa)
+import asyncio
+import os
+import random
+import socket
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import aggregates
+import checkin
+import database
+import metrics
+import models
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") == "1"
+# Chu kỳ (giây) của từng job; jitter là tỉ lệ ngẫu nhiên cộng/trừ vào chu kỳ
+OVERDUE_BILLS_INTERVAL = float(os.getenv("OVERDUE_BILLS_INTERVAL", "3600"))
+COMPLETED_BOOKINGS_INTERVAL = float(os.getenv("COMPLETED_BOOKINGS_INTERVAL", "300"))
+SCHEDULER_JITTER = float(os.getenv("SCHEDULER_JITTER", "0.1"))
+# Khóa tự hết hạn sau N giây (worker chết giữa chừng không chặn job mãi mãi)
+SCHEDULER_LOCK_TTL = float(os.getenv("SCHEDULER_LOCK_TTL", "600"))
+# Giữ lịch sử chạy N ngày
+JOB_HISTORY_DAYS = int(os.getenv("JOB_HISTORY_DAYS", "14"))
+# Cả lô nhận cùng updated_at: /sync phân trang theo (updated_at, id) nên client vẫn đọc hết được
+JOB_BATCH_SIZE = 5000
+
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"[:50]
+
+
+# --- JOBS ---
+
+def mark_overdue_bills(db: Session, now: datetime = None) -> int:
+    """Unpaid có due_date trước hôm nay -> Overdue."""
+    today = (now or datetime.now()).date()
+    bills = models.Bill.__table__
+    changed = 0
+    while True:
+        batch = select(bills.c.id).where(bills.c.status == "Unpaid", bills.c.due_date < today).limit(JOB_BATCH_SIZE)
+        rows = db.execute(
+            update(bills).where(bills.c.id.in_(batch), bills.c.status == "Unpaid")
+            .values(status="Overdue", updated_at=models.utcnow())
+            .returning(bills.c.month, bills.c.type, bills.c.amount)
+        ).all()
+        if not rows:
+            break
+        aggregates.bills_changed(db, (change for row in rows for change in (
+            (row.month, row.type, "Unpaid", -1, -(row.amount or 0)),
+            (row.month, row.type, "Overdue", 1, row.amount or 0),
+        )))
+        db.commit()
+        changed += len(rows)
+        if len(rows) < JOB_BATCH_SIZE:
+            break
+    return changed
+
+
+def _slot_cutoffs(db: Session, now: datetime) -> list:
+    """(facility_id, giờ bắt đầu muộn nhất 'HH:MM' của khung đã kết thúc hôm nay) cho từng tiện ích."""
+    cutoffs = []
+    for facility_id, slot_minutes in db.query(models.Facility.id, models.Facility.slot_minutes):
+        last_start = now - timedelta(minutes=slot_minutes or 120)
+        if last_start.date() == now.date():
+            cutoffs.append((facility_id, last_start.strftime("%H:%M")))
+    return cutoffs
+
+
+def complete_past_bookings(db: Session, now: datetime = None) -> int:
+    """Confirmed đã qua khung giờ (ngày trước, hoặc khung đã kết thúc hôm nay) -> Completed."""
+    now = now or datetime.now()
+    today = now.date()
+    bookings = models.Booking.__table__
+    ended_today = [and_(bookings.c.facility_id == facility_id, bookings.c.time_slot <= cutoff)
+                   for facility_id, cutoff in _slot_cutoffs(db, now)]
+    # date <= today là khoảng quét trên index (status, date); điều kiện giờ chỉ lọc thêm trong ngày hôm nay
+    past = or_(bookings.c.date < today, and_(bookings.c.date == today, or_(*ended_today))) \
+        if ended_today else bookings.c.date < today
+    changed = 0
+    while True:
+        batch = select(bookings.c.id) \
+            .where(bookings.c.status == "Confirmed", bookings.c.date <= today, past).limit(JOB_BATCH_SIZE)
+        rows = db.execute(
+            update(bookings).where(bookings.c.id.in_(batch), bookings.c.status == "Confirmed")
+            .values(status="Completed", updated_at=models.utcnow())
+            .returning(bookings.c.id, bookings.c.facility_id, bookings.c.date)
+        ).all()
+        if not rows:
+            break
+        aggregates.bookings_changed(db, (change for row in rows for change in (
+            (row.facility_id, row.date, "Confirmed", -1),
+            (row.facility_id, row.date, "Completed", 1),
+        )))
+        db.commit()
+        for row in rows:
+            if row.date == today:
+                checkin.today_cache.forget(row.id)
+        changed += len(rows)
+        if len(rows) < JOB_BATCH_SIZE:
+            break
+    return changed
+
+
+class Job:
+    def __init__(self, name: str, interval: float, func):
+        self.name = name
+        self.interval = interval
+        self.func = func
+
+    def next_delay(self) -> float:
+        return self.interval * (1 + random.uniform(-SCHEDULER_JITTER, SCHEDULER_JITTER))
+
+
+JOBS = {job.name: job for job in (
+    Job("overdue_bills", OVERDUE_BILLS_INTERVAL, mark_overdue_bills),
+    Job("completed_bookings", COMPLETED_BOOKINGS_INTERVAL, complete_past_bookings),
+)}
+
+
+# --- KHÓA + LỊCH SỬ ---
+
+def _claim(db: Session, job: Job, worker: str, now: datetime, force: bool) -> bool:
+    """Lấy khóa của job nếu chưa ai giữ (hoặc khóa đã hết hạn) và đã tới lượt chạy."""
+    table = models.ScheduledJob.__table__
+    free = or_(table.c.locked_until.is_(None), table.c.locked_until < now)
+    due = or_(table.c.next_run_at.is_(None), table.c.next_run_at <= now)
+    claimed = db.execute(
+        update(table).where(table.c.name == job.name, free, *(() if force else (due,)))
+        .values(locked_by=worker, locked_until=now + timedelta(seconds=SCHEDULER_LOCK_TTL))
+    ).rowcount
+    if not claimed and db.get(models.ScheduledJob, job.name) is None:
+        try:
+            with db.begin_nested():
+                db.execute(insert(table).values(name=job.name, locked_by=worker,
+                                                locked_until=now + timedelta(seconds=SCHEDULER_LOCK_TTL)))
+            claimed = 1
+        except IntegrityError:
+            claimed = 0  # worker khác vừa tạo dòng và giữ khóa
+    db.commit()
+    return bool(claimed)
+
+
+def _release(db: Session, job: Job, worker: str, run: dict):
+    table = models.ScheduledJob.__table__
+    db.execute(
+        update(table).where(table.c.name == job.name, table.c.locked_by == worker)
+        .values(locked_by=None, locked_until=None,
+                next_run_at=run["finished_at"] + timedelta(seconds=job.interval))
+    )
+    db.execute(insert(models.JobRun.__table__).values(**run))
+    db.execute(delete(models.JobRun).where(
+        models.JobRun.job == job.name,
+        models.JobRun.started_at < run["started_at"] - timedelta(days=JOB_HISTORY_DAYS)))
+    db.commit()
+
+
+def run_job(db: Session, name: str, worker: str = WORKER_ID, force: bool = False):
+    """Chạy job nếu lấy được khóa; trả về bản ghi lần chạy, hoặc None nếu bỏ qua."""
+    job = JOBS[name]
+    if not _claim(db, job, worker, models.utcnow(), force):
+        return None
+    run = {"job": job.name, "worker": worker, "started_at": models.utcnow(), "rows": 0, "error": None}
+    started = time.perf_counter()
+    try:
+        run["rows"] = job.func(db)
+        run["status"] = "ok"
+    except Exception as e:
+        db.rollback()
+        run["status"] = "error"
+        run["error"] = str(e)[:1000]
+        print(f"Job {job.name} failed: {e}")
+    run["finished_at"] = models.utcnow()
+    metrics.job_runs.inc(job.name, run["status"])
+    metrics.job_rows.inc(job.name, amount=run["rows"] or 0)
+    metrics.job_seconds.observe(time.perf_counter() - started, job.name)
+    _release(db, job, worker, run)
+    return run
+
+
+def job_status(db: Session, limit: int = 10) -> list:
+    state = {row.name: row for row in db.query(models.ScheduledJob)}
+    result = []
+    for name, job in JOBS.items():
+        runs = db.query(models.JobRun).filter(models.JobRun.job == name) \
+            .order_by(models.JobRun.started_at.desc()).limit(limit).all()
+        row = state.get(name)
+        result.append({
+            "name": name,
+            "interval": job.interval,
+            "locked_by": row.locked_by if row else None,
+            "locked_until": row.locked_until if row else None,
+            "next_run_at": row.next_run_at if row else None,
+            "runs": runs,
+        })
+    return result
+
+
+# --- VÒNG LẶP NỀN ---
+
+class Scheduler:
+    def __init__(self, jobs=None, worker: str = WORKER_ID):
+        self.jobs = list(jobs or JOBS.values())
+        self.worker = worker
+        self.tasks = []
+
+    async def start(self):
+        self.tasks = [asyncio.create_task(self._loop(job)) for job in self.jobs]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def run(self, name: str, force: bool = False):
+        return await database.run_in_session(run_job, name, self.worker, force)
+
+    async def _loop(self, job: Job):
+        # Lần đầu chờ ngẫu nhiên trong một phần chu kỳ: các worker khởi động cùng lúc không tranh nhau
+        await asyncio.sleep(random.uniform(0, min(job.interval * SCHEDULER_JITTER, 30)))
+        while True:
+            try:
+                await self.run(job.name)
+            except Exception as e:
+                # Lỗi lấy khóa / ghi lịch sử (vd: DB tạm thời không kết nối được): thử lại ở lượt sau
+                print(f"Scheduler error ({job.name}): {e}")
+            await asyncio.sleep(job.next_delay())
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    session = database.SessionLocal()
+    try:
+        if command == "run" and len(sys.argv) > 2 and sys.argv[2] in JOBS:
+            run = run_job(session, sys.argv[2], force=True)
+            print(run if run else "Job is locked by another worker, skipped.")
+        elif command == "list":
+            for job in job_status(session, limit=5):
+                print(f"{job['name']}: every {job['interval']:.0f}s, next {job['next_run_at']}, locked by {job['locked_by']}")
+                for r in job["runs"]:
+                    print(f"  {r.started_at} {r.status} rows={r.rows} {r.error or ''}")
+        else:
+            print(f"Usage: python scheduler.py list | run <{'|'.join(JOBS)}>")
+    finally:
+        session.close()
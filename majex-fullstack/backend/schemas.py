@@ -1,11 +1,31 @@
 # backend/schemas.py
-from pydantic import BaseModel, ConfigDict, Field
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict, Field, BeforeValidator, PlainSerializer
+from typing import Optional, List, Generic, TypeVar, Annotated
+import datetime as dt
+from models import to_ms, from_ms
+
+T = TypeVar("T")
+
+# DB lưu DateTime, nhưng API vẫn trả/nhận timestamp JS (ms) như trước
+JsTimestamp = Annotated[
+    dt.datetime,
+    BeforeValidator(lambda v: from_ms(v) if isinstance(v, (int, float)) else v),
+    PlainSerializer(to_ms, return_type=float),
+]
+
+# Giờ mở / đóng cửa dạng 'HH:MM' 24 giờ (availability.slot_times tính khung giờ từ đây)
+ClockTime = Annotated[str, Field(pattern=r"^([01][0-9]|2[0-3]):[0-5][0-9]$")]
 
 # Cho phép map alias (camelCase) vào field (snake_case)
 class BaseConfigModel(BaseModel):
     model_config = ConfigDict(from_attributes=True, populate_by_name=True)
 
+# --- PAGINATION ---
+# Một trang kết quả: nextCursor = None nghĩa là đã hết dữ liệu
+class Page(BaseConfigModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = Field(None, alias="nextCursor")
+
 # --- ANNOUNCEMENT SCHEMAS (Mới) ---
 class AnnouncementBase(BaseModel):
     title: str
@@ -17,7 +37,7 @@ class AnnouncementCreate(AnnouncementBase):
 
 class AnnouncementOut(AnnouncementBase, BaseConfigModel):
     id: str
-    timestamp: float
+    timestamp: JsTimestamp
     sender_name: str = Field(..., alias="senderName")
 
 # --- USER SCHEMAS ---
@@ -50,7 +70,7 @@ class MessageCreate(MessageBase):
 
 class MessageOut(MessageBase, BaseConfigModel):
     id: str
-    timestamp: float
+    timestamp: JsTimestamp
 
 # --- REPORT SCHEMAS ---
 class ReportBase(BaseModel):
@@ -67,16 +87,16 @@ class ReportCreate(ReportBase):
 class ReportOut(ReportBase, BaseConfigModel):
     id: str
     status: str
-    timestamp: float
+    timestamp: JsTimestamp
 
 # --- BILL SCHEMAS ---
 class BillBase(BaseModel):
     type: str
     amount: float
-    due_date: str = Field(..., alias="dueDate")
+    due_date: dt.date = Field(..., alias="dueDate")
     status: str
     month: str
-    paid_date: Optional[str] = Field(None, alias="paidDate")
+    paid_date: Optional[dt.date] = Field(None, alias="paidDate")
 
 class BillCreate(BillBase):
     id: str
@@ -86,6 +106,29 @@ class BillOut(BillBase, BaseConfigModel):
     id: str
     user_id: str = Field(..., alias="userId")
 
+# Phát hành hóa đơn hàng loạt theo mẫu cho mọi resident đang Active
+class BillingRunItem(BaseModel):
+    type: str
+    amount: float = Field(..., ge=0)
+
+class BillingRun(BaseModel):
+    month: str
+    due_date: dt.date = Field(..., alias="dueDate")
+    items: List[BillingRunItem] = Field(..., min_length=1)
+
+class BillingError(BaseModel):
+    line: int
+    error: str
+
+class BillingReportOut(BaseModel):
+    received: int
+    inserted: int
+    skipped: int
+    failed: int
+    chunks: int
+    elapsed_ms: float = Field(..., alias="elapsedMs")
+    errors: List[BillingError]
+
 # --- FACILITY SCHEMAS ---
 class FacilityBase(BaseModel):
     name: str
@@ -94,9 +137,16 @@ class FacilityBase(BaseModel):
     open_time: str = Field(..., alias="openTime")
     close_time: str = Field(..., alias="closeTime")
     price: float
+    booking_mode: Optional[str] = Field("slot", alias="bookingMode") # 'slot' | 'capacity'
+    capacity: Optional[int] = 1
+    slot_minutes: Optional[int] = Field(120, alias="slotMinutes")
 
 class FacilityCreate(FacilityBase):
     id: str
+    # Chỉ kiểm tra dữ liệu gửi lên: FacilityOut vẫn trả được các dòng cũ
+    open_time: ClockTime = Field(..., alias="openTime")
+    close_time: ClockTime = Field(..., alias="closeTime")
+    slot_minutes: Optional[int] = Field(120, alias="slotMinutes", gt=0)
 
 class FacilityOut(FacilityBase, BaseConfigModel):
     id: str
@@ -107,7 +157,7 @@ class BookingBase(BaseModel):
     facility_name: str = Field(..., alias="facilityName")
     user_id: str = Field(..., alias="userId")
     user_name: str = Field(..., alias="userName")
-    date: str
+    date: dt.date
     time_slot: str = Field(..., alias="timeSlot")
     qr_code_data: str = Field(..., alias="qrCodeData")
     status: str
@@ -116,4 +166,127 @@ class BookingCreate(BookingBase):
     id: str
 
 class BookingOut(BookingBase, BaseConfigModel):
-    id: str
\ No newline at end of file
+    id: str
+    checked_in_at: Optional[JsTimestamp] = Field(None, alias="checkedInAt")
+
+# --- CHECK-IN (quét mã QR ở cổng) ---
+class CheckInScan(BaseModel):
+    code: str
+    # Nếu có: từ chối mã của tiện ích khác (máy quét đặt tại một cổng cụ thể)
+    facility_id: Optional[str] = Field(None, alias="facilityId")
+
+class CheckInResult(BaseModel):
+    valid: bool
+    reason: str # 'ok' | 'checked_in' | 'invalid' | 'wrong_date' | 'wrong_facility' | 'not_active' | 'already_checked_in'
+    message: str
+    booking: Optional[BookingOut] = None
+
+# --- NOTIFICATION SCHEMAS ---
+class NotificationCreate(BaseModel):
+    audience: str # 'all' | 'building' | 'apartment' | 'user'
+    target: Optional[str] = None # tòa nhà ('A') / căn hộ ('A-402') / user id; bỏ trống khi audience='all'
+    title: str
+    body: str = ""
+
+class NotificationOut(BaseConfigModel):
+    id: str
+    audience: str
+    target: str
+    kind: str
+    title: str
+    body: str
+    ref_id: Optional[str] = Field(None, alias="refId")
+    created_at: JsTimestamp = Field(..., alias="timestamp")
+    read: bool = False
+
+class MarkRead(BaseModel):
+    # Đánh dấu đã đọc tới thông báo này (bao gồm); bỏ trống = tất cả
+    until: Optional[str] = None
+
+class UnreadCount(BaseModel):
+    unread: int
+    capped: bool # True: còn nhiều hơn `unread` (hiển thị "99+")
+
+# --- SEARCH SCHEMAS ---
+class SearchHit(BaseConfigModel):
+    type: str # 'message' | 'report' | 'announcement'
+    id: str
+    score: float
+    title: Optional[str] = None
+    snippet: str
+    timestamp: JsTimestamp
+    sender_id: Optional[str] = Field(None, alias="senderId")
+    sender_name: Optional[str] = Field(None, alias="senderName")
+    category: Optional[str] = None
+    status: Optional[str] = None
+
+# --- ADMIN SUMMARY SCHEMAS ---
+class BillSummaryRow(BaseConfigModel):
+    month: str
+    type: str
+    status: str
+    count: int
+    amount: float
+
+class BookingSummaryRow(BaseConfigModel):
+    facility_id: str = Field(..., alias="facilityId")
+    facility_name: Optional[str] = Field(None, alias="facilityName")
+    month: str
+    status: str
+    count: int
+    revenue: float
+
+class AdminSummary(BaseConfigModel):
+    collected: float
+    outstanding: float
+    paid_bills: int = Field(..., alias="paidBills")
+    outstanding_bills: int = Field(..., alias="outstandingBills")
+    active_bookings: int = Field(..., alias="activeBookings")
+    bills: List[BillSummaryRow]
+    bookings: List[BookingSummaryRow]
+
+# --- BACKGROUND JOB SCHEMAS ---
+class JobRunOut(BaseConfigModel):
+    worker: str
+    started_at: JsTimestamp = Field(..., alias="startedAt")
+    finished_at: Optional[JsTimestamp] = Field(None, alias="finishedAt")
+    status: str # 'ok' | 'error'
+    rows: int
+    error: Optional[str] = None
+
+class JobStatus(BaseConfigModel):
+    name: str
+    interval: float # giây
+    locked_by: Optional[str] = Field(None, alias="lockedBy")
+    locked_until: Optional[JsTimestamp] = Field(None, alias="lockedUntil")
+    next_run_at: Optional[JsTimestamp] = Field(None, alias="nextRunAt")
+    runs: List[JobRunOut]
+
+# --- AVAILABILITY SCHEMAS ---
+class SlotAvailability(BaseConfigModel):
+    time_slot: str = Field(..., alias="timeSlot")
+    booked: int
+    remaining: int
+    available: bool
+
+class AvailabilityOut(BaseConfigModel):
+    facility_id: str = Field(..., alias="facilityId")
+    date: dt.date
+    booking_mode: str = Field(..., alias="bookingMode")
+    capacity: int
+    slots: List[SlotAvailability]
+
+# --- SYNC SCHEMAS ---
+class SyncChanges(BaseConfigModel):
+    facilities: List[FacilityOut] = []
+    announcements: List[AnnouncementOut] = []
+    messages: List[MessageOut] = []
+    users: List[UserOut] = []
+    bookings: List[BookingOut] = []
+    bills: List[BillOut] = []
+    reports: List[ReportOut] = []
+
+class SyncOut(BaseConfigModel):
+    cursor: str
+    has_more: bool = Field(..., alias="hasMore")
+    changes: SyncChanges
@@ -0,0 +1,314 @@
+# backend/search.py
+# Tìm kiếm toàn văn trên tin nhắn, report và thông báo bằng chỉ mục đảo (inverted index):
+# search_postings lưu (term, loại tài liệu, id, tần suất) với khóa chính bắt đầu bằng term,
+# nên mỗi từ trong câu truy vấn chỉ là một lần quét theo khoảng trên index, không cần
+# LIKE '%...%' quét cả bảng. Chỉ mục được cập nhật ngay khi ghi tài liệu mới.
+#
+#   python search.py rebuild    # dựng lại toàn bộ chỉ mục từ dữ liệu hiện có
+import math
+import os
+import random
+import re
+import sys
+import time
+import unicodedata
+from collections import Counter
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam, case, delete, func, insert, select, union_all, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import database
+import models
+import pagination
+
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 64
+# Số term tối đa khi mở rộng tiền tố của từ cuối (gõ tới đâu tìm tới đó)
+MAX_PREFIX_EXPANSIONS = 10
+# Term xuất hiện trong quá nửa số tài liệu gần như không giúp xếp hạng: bỏ qua
+COMMON_TERM_RATIO = 0.5
+# Mỗi term (trong mỗi loại tài liệu) chỉ góp chừng này ứng viên có tf cao nhất (index term, doc_type, tf):
+# số dòng phải cộng điểm BM25 bị chặn theo số từ trong câu truy vấn, không theo độ dài posting list
+MAX_TERM_CANDIDATES = int(os.getenv("SEARCH_MAX_TERM_CANDIDATES", "1000"))
+# Term chỉ khớp nhờ mở rộng tiền tố được tính nhẹ hơn term gõ đầy đủ
+PREFIX_WEIGHT = 0.5
+REBUILD_BATCH = 2000
+# Tham số BM25 cho độ bão hòa tần suất
+BM25_K1 = 1.2
+# Tổng số tài liệu (cho idf) được đếm lại sau chừng này giây, xem CorpusSize
+SEARCH_TOTAL_TTL = float(os.getenv("SEARCH_TOTAL_TTL", "60"))
+TERM_CHUNK = 1000  # SQL Server giới hạn 2100 tham số mỗi câu lệnh
+# Số dòng đếm cho mỗi term (xem models.SearchTermShard): mỗi lô ghi cộng vào một shard ngẫu nhiên
+SEARCH_TERM_SHARDS = int(os.getenv("SEARCH_TERM_SHARDS", "16"))
+
+STOPWORDS = {"the", "and", "or", "of", "to", "in", "is", "it", "on", "at", "for", "an", "be", "are", "was"}
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list:
+    """Chữ thường, bỏ dấu (tiếng Việt: 'Hồ bơi' -> 'ho', 'boi'), tách theo ký tự chữ/số."""
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKD", text.lower().replace("đ", "d"))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return [t for t in _WORD.findall(text)
+            if MIN_TERM_LENGTH <= len(t) <= MAX_TERM_LENGTH and t not in STOPWORDS]
+
+
+class SearchSource:
+    def __init__(self, model, fields, text, title, snippet, sender=None, sender_name=None, category=None, status=None):
+        self.model = model
+        self.fields = fields      # các cột mà text() đọc (rebuild chỉ SELECT những cột này)
+        self.text = text          # obj -> văn bản được đánh chỉ mục
+        self.title = title
+        self.snippet = snippet
+        self.sender = sender      # cột lọc theo người gửi
+        self.sender_name = sender_name
+        self.category = category
+        self.status = status
+
+
+SOURCES = {
+    "message": SearchSource(
+        models.Message, ("text",), lambda m: m.text, title=None, snippet="text",
+        sender=models.Message.sender_id, sender_name="sender_name"),
+    # Tiêu đề lặp lại hai lần để khớp tiêu đề được xếp cao hơn khớp nội dung
+    "report": SearchSource(
+        models.Report, ("title", "description"), lambda r: f"{r.title} {r.title} {r.description}", title="title", snippet="description",
+        sender=models.Report.user_id, sender_name="user_name",
+        category=models.Report.category, status=models.Report.status),
+    "announcement": SearchSource(
+        models.Announcement, ("title", "content"), lambda a: f"{a.title} {a.title} {a.content}", title="title", snippet="content",
+        sender_name="sender_name"),
+}
+
+
+# --- GHI CHỈ MỤC ---
+
+def _bump_terms(db: Session, deltas: Counter):
+    """Cộng doc_count cho nhiều term: một UPDATE executemany + một INSERT executemany mỗi chunk.
+
+    Cả lô ghi vào cùng một shard chọn ngẫu nhiên, nên hai lô đồng thời chứa cùng một từ phổ
+    biến ('ho', 'boi') thường khóa hai dòng khác nhau thay vì chờ nhau.
+    """
+    table = models.SearchTermShard.__table__
+    shard = random.randrange(SEARCH_TERM_SHARDS)
+    terms = list(deltas)
+    for start in range(0, len(terms), TERM_CHUNK):
+        chunk = terms[start:start + TERM_CHUNK]
+        existing = set(db.execute(select(table.c.term).where(table.c.term.in_(chunk), table.c.shard == shard))
+                       .scalars())
+        updates = [{"t": t, "d": deltas[t]} for t in chunk if t in existing]
+        inserts = [{"term": t, "shard": shard, "doc_count": deltas[t]} for t in chunk if t not in existing]
+        if updates:
+            db.execute(update(table).where(table.c.term == bindparam("t"), table.c.shard == shard)
+                       .values(doc_count=table.c.doc_count + bindparam("d")), updates)
+        if not inserts:
+            continue
+        try:
+            with db.begin_nested():
+                db.execute(insert(table), inserts)
+        except IntegrityError:
+            # Một tiến trình khác vừa thêm cùng term: cập nhật lại từng term
+            for row in inserts:
+                where = (table.c.term == row["term"]) & (table.c.shard == shard)
+                if not db.execute(update(table).where(where)
+                                  .values(doc_count=table.c.doc_count + row["doc_count"])).rowcount:
+                    db.execute(insert(table).values(**row))
+
+
+def index_rows(db: Session, doc_type: str, docs):
+    """Đánh chỉ mục các tài liệu mới: docs là các cặp (id, văn bản). Gọi trong transaction ghi dữ liệu."""
+    postings = []
+    doc_freq = Counter()
+    for doc_id, text in docs:
+        counts = Counter(tokenize(text))
+        postings.extend({"term": t, "doc_type": doc_type, "doc_id": doc_id, "tf": n} for t, n in counts.items())
+        doc_freq.update(counts.keys())
+    if not postings:
+        return
+    db.execute(insert(models.SearchPosting.__table__), postings)
+    _bump_terms(db, doc_freq)
+
+
+def index_document(db: Session, doc_type: str, obj):
+    index_rows(db, doc_type, [(obj.id, SOURCES[doc_type].text(obj))])
+
+
+class CorpusSize:
+    """Tổng số tài liệu có thể tìm = COUNT(*) trên các bảng nguồn, nhớ trong `ttl` giây.
+
+    Không lưu thành một dòng trong search_terms: mọi lần ghi chỉ mục (mỗi lô tin nhắn,
+    mỗi report) đều phải cập nhật dòng đó, biến nó thành hot row khóa tuần tự mọi
+    transaction ghi. idf chỉ cần giá trị xấp xỉ nên đếm lại định kỳ là đủ.
+    """
+
+    def __init__(self, ttl: float = SEARCH_TOTAL_TTL):
+        self.ttl = ttl
+        self.total = None
+        self.expires_at = 0.0
+
+    def get(self, db: Session) -> int:
+        now = time.monotonic()
+        if self.total is None or self.expires_at <= now:
+            counts = union_all(*(select(func.count()).select_from(source.model) for source in SOURCES.values()))
+            self.total = sum(db.execute(counts).scalars())
+            self.expires_at = now + self.ttl
+        return self.total
+
+    def forget(self):
+        self.total = None
+
+
+corpus_size = CorpusSize()
+
+
+def rebuild(db: Session):
+    """Xóa và dựng lại chỉ mục từ messages, reports, announcements (đọc theo lô)."""
+    db.execute(delete(models.SearchPosting))
+    db.execute(delete(models.SearchTermShard))
+    for doc_type, source in SOURCES.items():
+        model = source.model
+        after = None
+        while True:
+            # Chỉ đọc các cột mà text() cần
+            query = db.query(model.id, *(getattr(model, name) for name in source.fields)).order_by(model.id)
+            if after is not None:
+                query = query.filter(model.id > after)
+            batch = query.limit(REBUILD_BATCH).all()
+            if not batch:
+                break
+            after = batch[-1].id
+            index_rows(db, doc_type, [(row.id, source.text(row)) for row in batch])
+    corpus_size.forget()
+
+
+# --- TRUY VẤN ---
+
+def _query_terms(db: Session, q: str) -> dict:
+    """term -> trọng số idf cho câu truy vấn.
+
+    Từ cuối được mở rộng theo tiền tố để tìm được khi người dùng đang gõ dở.
+    """
+    tokens = tokenize(q)
+    if not tokens:
+        raise HTTPException(status_code=400, detail="Query has no searchable words")
+    table = models.SearchTermShard.__table__
+    doc_count = func.sum(table.c.doc_count)
+    exact = set(tokens)
+    wanted = set(exact)
+    last = tokens[-1]
+    # Khoảng [last, last+1) trên khóa chính thay cho LIKE 'last%'
+    upper = last[:-1] + chr(ord(last[-1]) + 1)
+    expansions = db.execute(
+        select(table.c.term).where(table.c.term >= last, table.c.term < upper)
+        .group_by(table.c.term).order_by(doc_count.desc()).limit(MAX_PREFIX_EXPANSIONS)
+    ).scalars()
+    wanted.update(expansions)
+
+    counts = dict(db.execute(select(table.c.term, doc_count).where(table.c.term.in_(wanted))
+                             .group_by(table.c.term)).all())
+    total = max(corpus_size.get(db), 1)
+    found = {t: df for t, df in counts.items() if df > 0}
+    # Nếu từ nào cũng phổ biến thì vẫn tìm theo tất cả (vd: chỉ gõ "hồ bơi")
+    useful = {t: df for t, df in found.items() if df / total <= COMMON_TERM_RATIO}
+    weights = {}
+    for term, df in (useful or found).items():
+        idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+        weights[term] = idf if term in exact else idf * PREFIX_WEIGHT
+    return weights
+
+
+def _top_postings(source: SearchSource, doc_type: str, term: str, filters: list):
+    """Tối đa MAX_TERM_CANDIDATES doc_id chứa `term` có tf cao nhất (qua bộ lọc của loại tài liệu)."""
+    posting = models.SearchPosting
+    query = select(posting.doc_id).where(posting.term == term, posting.doc_type == doc_type)
+    if filters:
+        query = query.join(source.model, source.model.id == posting.doc_id).where(*filters)
+    top = query.order_by(posting.tf.desc()).limit(MAX_TERM_CANDIDATES).subquery()
+    return select(top.c.doc_id)
+
+
+def search(db: Session, q: str, types=None, category: str = None, status: str = None,
+           sender_id: str = None, cursor: str = None, limit: int = pagination.DEFAULT_PAGE_SIZE) -> dict:
+    types = types or list(SOURCES)
+    unknown = set(types) - set(SOURCES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown search type {sorted(unknown)}")
+    idf = _query_terms(db, q)
+    if not idf:
+        return {"items": [], "next_cursor": None}
+
+    posting = models.SearchPosting
+    weight = case(idf, value=posting.term)
+    parts = []
+    for doc_type in types:
+        source = SOURCES[doc_type]
+        filters = []
+        for value, column in ((category, source.category), (status, source.status), (sender_id, source.sender)):
+            if value is None:
+                continue
+            if column is None:
+                break  # loại tài liệu này không có trường để lọc -> bỏ qua cả loại
+            filters.append(column == value)
+        else:
+            candidates = union_all(*(_top_postings(source, doc_type, term, filters) for term in idf))
+            part = select(
+                posting.doc_type, posting.doc_id,
+                func.count().label("matched"),
+                func.sum(weight * posting.tf * (BM25_K1 + 1) / (posting.tf + BM25_K1)).label("score"),
+            ).where(posting.term.in_(idf), posting.doc_type == doc_type, posting.doc_id.in_(candidates))
+            parts.append(part.group_by(posting.doc_type, posting.doc_id))
+    if not parts:
+        return {"items": [], "next_cursor": None}
+
+    ranked = union_all(*parts).subquery()
+    # Xếp theo số từ khớp trước (ưu tiên tài liệu chứa đủ các từ), rồi tới điểm BM25
+    keys = [ranked.c.matched, ranked.c.score, ranked.c.doc_type, ranked.c.doc_id]
+    rows, next_cursor = pagination.paginate(db.query(ranked), keys, cursor, limit, descending=True)
+    return {"items": _hydrate(db, rows), "next_cursor": next_cursor}
+
+
+def _hydrate(db: Session, rows) -> list:
+    ids = {}
+    for row in rows:
+        ids.setdefault(row.doc_type, []).append(row.doc_id)
+    objects = {}
+    for doc_type, doc_ids in ids.items():
+        model = SOURCES[doc_type].model
+        objects.update({(doc_type, obj.id): obj for obj in db.query(model).filter(model.id.in_(doc_ids))})
+
+    hits = []
+    for row in rows:
+        obj = objects.get((row.doc_type, row.doc_id))
+        if obj is None:
+            continue
+        source = SOURCES[row.doc_type]
+        hits.append({
+            "type": row.doc_type,
+            "id": obj.id,
+            "score": round(row.score, 4),
+            "title": getattr(obj, source.title) if source.title else None,
+            "snippet": (getattr(obj, source.snippet) or "")[:200],
+            "timestamp": obj.timestamp,
+            "sender_id": getattr(obj, source.sender.key) if source.sender is not None else None,
+            "sender_name": getattr(obj, source.sender_name) if source.sender_name else None,
+            "category": getattr(obj, source.category.key) if source.category is not None else None,
+            "status": getattr(obj, source.status.key) if source.status is not None else None,
+        })
+    return hits
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "rebuild":
+        session = database.SessionLocal()
+        try:
+            rebuild(session)
+            session.commit()
+        finally:
+            session.close()
+        print("✅ Search index rebuilt!")
+    else:
+        print("Usage: python search.py rebuild")
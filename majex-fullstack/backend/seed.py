@@ -1,11 +1,20 @@
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-from database import SessionLocal, engine
+from database import SessionLocal
+from datetime import date, datetime, timedelta
+import argparse
+import random
+import time
+import aggregates
+import availability
+import checkin
 import models
+import migrations
+import search
 import uuid
 
-models.Base.metadata.create_all(bind=engine)
-
 def seed_data():
+    migrations.upgrade(allow_destructive=True)
     db: Session = SessionLocal()
     try:
         # 1. Users
@@ -20,8 +29,8 @@ def seed_data():
         # 2. Facilities (Dữ liệu thật)
         facilities = [
             {"id": str(uuid.uuid4()), "name": "Tennis Court A", "type": "Sport", "open_time": "06:00", "close_time": "22:00", "price": 15.0, "image": "https://images.unsplash.com/photo-1622163642998-1ea14b60c57e?q=80&w=400&auto=format&fit=crop"},
-            {"id": str(uuid.uuid4()), "name": "Community Pool", "type": "Pool", "open_time": "08:00", "close_time": "20:00", "price": 5.0, "image": "https://images.unsplash.com/photo-1576013551627-0cc20b96c2a7?q=80&w=400&auto=format&fit=crop"},
-            {"id": str(uuid.uuid4()), "name": "Gymnasium", "type": "Gym", "open_time": "05:00", "close_time": "23:00", "price": 0.0, "image": "https://images.unsplash.com/photo-1534438327276-14e5300c3a48?q=80&w=400&auto=format&fit=crop"},
+            {"id": str(uuid.uuid4()), "name": "Community Pool", "type": "Pool", "open_time": "08:00", "close_time": "20:00", "price": 5.0, "booking_mode": "capacity", "capacity": 20, "image": "https://images.unsplash.com/photo-1576013551627-0cc20b96c2a7?q=80&w=400&auto=format&fit=crop"},
+            {"id": str(uuid.uuid4()), "name": "Gymnasium", "type": "Gym", "open_time": "05:00", "close_time": "23:00", "price": 0.0, "booking_mode": "capacity", "capacity": 30, "image": "https://images.unsplash.com/photo-1534438327276-14e5300c3a48?q=80&w=400&auto=format&fit=crop"},
             {"id": str(uuid.uuid4()), "name": "BBQ Area", "type": "Entertainment", "open_time": "10:00", "close_time": "22:00", "price": 25.0, "image": "https://images.unsplash.com/photo-1555939594-58d7cb561ad1?q=80&w=400&auto=format&fit=crop"}
         ]
         if db.query(models.Facility).count() == 0:
@@ -30,16 +39,19 @@ def seed_data():
 
         # 3. Bills (Tiền điện, nước, net...)
         bills = [
-            {"id": str(uuid.uuid4()), "user_id": "user_resident_123", "type": "Electricity", "amount": 145.20, "due_date": "2023-11-15", "status": "Unpaid", "month": "October 2023"},
-            {"id": str(uuid.uuid4()), "user_id": "user_resident_123", "type": "Water", "amount": 35.00, "due_date": "2023-11-20", "status": "Unpaid", "month": "October 2023"},
-            {"id": str(uuid.uuid4()), "user_id": "user_resident_123", "type": "Internet", "amount": 45.00, "due_date": "2023-11-01", "status": "Overdue", "month": "October 2023"},
-            {"id": str(uuid.uuid4()), "user_id": "user_resident_123", "type": "Service Fee", "amount": 80.00, "due_date": "2023-11-05", "status": "Paid", "month": "October 2023", "paid_date": "2023-11-04"},
-            {"id": str(uuid.uuid4()), "user_id": "user_resident_123", "type": "Cleaning Fee", "amount": 25.00, "due_date": "2023-11-10", "status": "Unpaid", "month": "October 2023"},
+            {"id": str(uuid.uuid4()), "user_id": "user_resident_123", "type": "Electricity", "amount": 145.20, "due_date": date(2023, 11, 15), "status": "Unpaid", "month": "October 2023"},
+            {"id": str(uuid.uuid4()), "user_id": "user_resident_123", "type": "Water", "amount": 35.00, "due_date": date(2023, 11, 20), "status": "Unpaid", "month": "October 2023"},
+            {"id": str(uuid.uuid4()), "user_id": "user_resident_123", "type": "Internet", "amount": 45.00, "due_date": date(2023, 11, 1), "status": "Overdue", "month": "October 2023"},
+            {"id": str(uuid.uuid4()), "user_id": "user_resident_123", "type": "Service Fee", "amount": 80.00, "due_date": date(2023, 11, 5), "status": "Paid", "month": "October 2023", "paid_date": date(2023, 11, 4)},
+            {"id": str(uuid.uuid4()), "user_id": "user_resident_123", "type": "Cleaning Fee", "amount": 25.00, "due_date": date(2023, 11, 10), "status": "Unpaid", "month": "October 2023"},
         ]
         if db.query(models.Bill).count() == 0:
             for b in bills:
                 db.add(models.Bill(**b))
         
+        # Bảng tổng hợp cho dashboard admin tính lại theo dữ liệu vừa thêm
+        db.flush()
+        aggregates.rebuild(db)
         db.commit()
         print("✅ Database seeded successfully!")
     except Exception as e:
@@ -48,5 +60,141 @@ def seed_data():
     finally:
         db.close()
 
+# --- DỮ LIỆU GIẢ LẬP QUY MÔ LỚN (cho benchmark) ---
+SYNTHETIC_PREFIX = "bench_"
+SYNTHETIC_BATCH = 10000
+BILL_TYPES = [("Electricity", 60, 180), ("Water", 20, 50), ("Service Fee", 80, 80)]
+BOOKING_STATUSES = ["Confirmed"] * 6 + ["Cancelled"] * 2 + ["Completed"] * 2
+REPORT_CATEGORIES = ["Maintenance", "Noise", "Security", "Other"]
+
+
+def _insert_batches(db: Session, table, rows, label: str):
+    """Ghi một generator rows theo lô SYNTHETIC_BATCH dòng bằng executemany."""
+    started = time.monotonic()
+    total = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= SYNTHETIC_BATCH:
+            db.execute(insert(table), batch)
+            db.commit()
+            total += len(batch)
+            batch = []
+    if batch:
+        db.execute(insert(table), batch)
+        db.commit()
+        total += len(batch)
+    print(f"  {label}: {total} rows in {time.monotonic() - started:.1f}s")
+
+
+def seed_synthetic(residents=10000, messages=1000000, bookings=500000, reports=20000,
+                   announcements=500, bill_months=3, seed=42):
+    """Sinh dữ liệu ở quy mô thực tế, tất định theo `seed` để các lần benchmark so sánh được với nhau.
+
+    Dữ liệu booking chỉ để đo tải: không đảm bảo sức chứa của từng khung giờ.
+    """
+    seed_data()
+    rng = random.Random(seed)
+    db: Session = SessionLocal()
+    try:
+        if db.query(models.User).filter(models.User.id.like(f"{SYNTHETIC_PREFIX}%")).first():
+            print("Synthetic data already exists, run `python reset.py` first to regenerate it.")
+            return
+        now = models.utcnow().replace(microsecond=0)
+        today = now.date()
+        print("Seeding synthetic data...")
+
+        user_ids = [f"{SYNTHETIC_PREFIX}user_{i:06d}" for i in range(residents)]
+        names = {uid: f"Resident {i}" for i, uid in enumerate(user_ids)}
+        _insert_batches(db, models.User.__table__, (
+            {"id": uid, "name": names[uid], "role": "RESIDENT", "email": f"{uid}@bench.local",
+             "username": uid, "password": "password", "status": "Active", "updated_at": now,
+             "apartment_id": f"{'ABCDEFGH'[i % 8]}-{i // 8 % 40 + 1:02d}{i % 12 + 1:02d}",
+             "avatar": f"https://ui-avatars.com/api/?name=R{i}"}
+            for i, uid in enumerate(user_ids)
+        ), "users")
+
+        month_index = today.year * 12 + today.month - 1
+        months = [date((month_index - k) // 12, (month_index - k) % 12 + 1, 1) for k in range(bill_months)]
+        _insert_batches(db, models.Bill.__table__, (
+            {"id": str(uuid.uuid4()), "user_id": uid, "type": bill_type,
+             "amount": round(rng.uniform(low, high), 2), "month": month.strftime("%B %Y"),
+             "due_date": month + timedelta(days=40),
+             "status": "Paid" if k else rng.choice(["Unpaid", "Paid", "Overdue"]),
+             "paid_date": month + timedelta(days=35) if k else None, "updated_at": now}
+            for uid in user_ids for k, month in enumerate(months) for bill_type, low, high in BILL_TYPES
+        ), "bills")
+
+        facilities = db.query(models.Facility).all()
+        slots = {f.id: availability.slot_times(f) for f in facilities}
+        def synthetic_bookings():
+            for _ in range(bookings):
+                booking_id, uid, f = str(uuid.uuid4()), rng.choice(user_ids), rng.choice(facilities)
+                day = today + timedelta(days=rng.randint(-180, 60))
+                code = checkin.issue_token(booking_id, day)
+                yield {"id": booking_id, "facility_id": f.id, "facility_name": f.name,
+                       "user_id": uid, "user_name": names[uid], "date": day,
+                       "time_slot": rng.choice(slots[f.id]), "qr_code_data": code, "qr_hash": checkin.code_hash(code),
+                       "status": rng.choice(BOOKING_STATUSES), "updated_at": now}
+
+        _insert_batches(db, models.Booking.__table__, synthetic_bookings(), "bookings")
+
+        # Tin nhắn trải đều 90 ngày gần nhất, theo thứ tự thời gian
+        start = now - timedelta(days=90)
+        step = timedelta(days=90) / max(messages, 1)
+        _insert_batches(db, models.Message.__table__, (
+            {"id": str(uuid.uuid4()), "sender_id": uid, "sender_name": names[uid],
+             "text": f"Synthetic message {i}", "timestamp": start + step * i, "updated_at": now}
+            for i, uid in ((i, rng.choice(user_ids)) for i in range(messages))
+        ), "messages")
+
+        _insert_batches(db, models.Report.__table__, (
+            {"id": str(uuid.uuid4()), "user_id": uid, "user_name": names[uid], "apartment": "A-101",
+             "title": f"Report {i}", "description": f"Synthetic report {i}",
+             "category": rng.choice(REPORT_CATEGORIES), "status": rng.choice(["Pending", "Resolved"]),
+             "timestamp": now - timedelta(minutes=rng.randint(0, 90 * 24 * 60)), "updated_at": now}
+            for i, uid in ((i, rng.choice(user_ids)) for i in range(reports))
+        ), "reports")
+
+        announcement_rows = [
+            {"id": str(uuid.uuid4()), "title": f"Announcement {i}", "content": f"Synthetic announcement {i}",
+             "tone": rng.choice(["Formal", "Friendly", "Urgent"]), "sender_name": "Admin",
+             "timestamp": now - timedelta(hours=i), "updated_at": now}
+            for i in range(announcements)
+        ]
+        _insert_batches(db, models.Announcement.__table__, announcement_rows, "announcements")
+        # Mỗi announcement là một thông báo chung; thêm thông báo theo tòa để hộp thư có nhiều nhóm
+        _insert_batches(db, models.Notification.__table__, [
+            *({"id": str(uuid.uuid4()), "audience": "all", "target": "", "kind": "announcement",
+               "title": row["title"], "body": row["content"], "ref_id": row["id"], "created_at": row["timestamp"]}
+              for row in announcement_rows),
+            *({"id": str(uuid.uuid4()), "audience": "building", "target": building, "kind": "notice",
+               "title": f"Building {building} notice {i}", "body": f"Synthetic notice {i}",
+               "ref_id": None, "created_at": now - timedelta(minutes=rng.randint(0, 90 * 24 * 60))}
+              for building in "ABCDEFGH" for i in range(announcements // 10)),
+        ], "notifications")
+        aggregates.rebuild(db)
+        started = time.monotonic()
+        search.rebuild(db)
+        print(f"  search index: {time.monotonic() - started:.1f}s")
+        db.commit()
+        print("✅ Synthetic data seeded successfully!")
+    finally:
+        db.close()
+
+
 if __name__ == "__main__":
-    seed_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Seed MajeX database")
+    parser.add_argument("--synthetic", action="store_true", help="thêm dữ liệu giả lập quy mô lớn cho benchmark")
+    parser.add_argument("--residents", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=1000000)
+    parser.add_argument("--bookings", type=int, default=500000)
+    parser.add_argument("--reports", type=int, default=20000)
+    parser.add_argument("--bill-months", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    if args.synthetic:
+        seed_synthetic(args.residents, args.messages, args.bookings, args.reports,
+                       bill_months=args.bill_months, seed=args.seed)
+    else:
+        seed_data()
\ No newline at end of file
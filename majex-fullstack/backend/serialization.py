@@ -0,0 +1,92 @@
+# backend/serialization.py
+# Đường serialize nhanh cho các danh sách lớn (bật bằng FAST_SERIALIZATION=1).
+# Đường mặc định nạp ORM object đầy đủ (identity map), validate lại từng dòng qua
+# response_model rồi encode bằng json của stdlib. Đường nhanh chỉ SELECT đúng các cột
+# của schema (Row tuple), đổi tên sang camelCase theo bảng alias tính sẵn một lần cho
+# mỗi schema, và encode bằng orjson nếu đã cài. Body trả về giống từng byte đường cũ.
+import datetime as dt
+import json
+import os
+import typing
+
+from fastapi.responses import JSONResponse
+from pydantic import PlainSerializer
+
+import pagination
+
+try:
+    import orjson
+except ImportError:
+    # Chưa cài orjson -> vẫn dùng json của stdlib (cùng tùy chọn với JSONResponse)
+    orjson = None
+
+FAST_SERIALIZATION = os.getenv("FAST_SERIALIZATION", "0") == "1"
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def _unwrap(annotation):
+    # Optional[X] -> X
+    args = [a for a in typing.get_args(annotation) if a is not type(None)]
+    return args[0] if typing.get_origin(annotation) is typing.Union and len(args) == 1 else annotation
+
+
+def _converter(field):
+    """Hàm đổi giá trị cột sang đúng giá trị JSON mà pydantic sẽ xuất cho field này (None = giữ nguyên)."""
+    annotation = _unwrap(field.annotation)
+    # Optional[JsTimestamp]: metadata nằm trong Annotated bên trong Optional
+    metadata = list(field.metadata) + list(getattr(annotation, "__metadata__", ()))
+    for meta in metadata:
+        if isinstance(meta, PlainSerializer):
+            # vd: JsTimestamp -> to_ms
+            return meta.func
+    annotation = typing.get_args(annotation)[0] if typing.get_origin(annotation) is typing.Annotated else annotation
+    if annotation is float:
+        return float
+    if annotation in (dt.date, dt.datetime):
+        return annotation.isoformat
+    return None
+
+
+class ListSerializer:
+    """Bảng cột -> alias -> converter tính một lần cho mỗi (model, schema)."""
+
+    def __init__(self, model, schema):
+        names = list(schema.model_fields)
+        self.columns = [model.__table__.c[name] for name in names]
+        self.aliases = [schema.model_fields[name].alias or name for name in names]
+        self.converters = [(alias, conv) for alias, conv in
+                           ((field.alias or name, _converter(field)) for name, field in schema.model_fields.items())
+                           if conv is not None]
+
+    def items(self, rows) -> list:
+        aliases, converters = self.aliases, self.converters
+        items = []
+        for row in rows:
+            item = dict(zip(aliases, row))
+            for alias, conv in converters:
+                value = item[alias]
+                if value is not None:
+                    item[alias] = conv(value)
+            items.append(item)
+        return items
+
+    def response(self, query, keys, cursor=None, limit=pagination.DEFAULT_PAGE_SIZE, descending=False,
+                 paginate=True, legacy_order=None) -> FastJSONResponse:
+        """Cùng ngữ nghĩa với list_response trong main.py nhưng trả thẳng Response đã encode."""
+        query = query.with_entities(*self.columns)
+        if not paginate:
+            if legacy_order is not None:
+                query = query.order_by(*legacy_order)
+            return FastJSONResponse(self.items(query.all()))
+        rows, next_cursor = pagination.paginate(query, keys, cursor, limit, descending)
+        return FastJSONResponse({"items": self.items(rows), "nextCursor": next_cursor})
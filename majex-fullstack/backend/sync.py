@@ -0,0 +1,81 @@
+# backend/sync.py
+# Delta-sync: trả về mọi dòng được tạo/sửa sau một mốc (cursor) cho một user,
+# trên tất cả các loại dữ liệu, trong phạm vi user đó được phép xem.
+# Mốc dựa trên cột updated_at mà các handler ghi dữ liệu tự cập nhật; cursor giữ vị trí
+# (updated_at, id) riêng cho từng loại dữ liệu.
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+import models
+import pagination
+
+# Lùi cursor một khoảng để không bỏ sót các dòng có updated_at được gán trước
+# nhưng commit sau thời điểm truy vấn (vd: tin nhắn đang chờ ghi theo lô).
+# Client upsert theo id nên nhận trùng vài dòng là vô hại.
+SYNC_SAFETY_WINDOW = timedelta(seconds=5)
+SYNC_MAX_ROWS_PER_ENTITY = 1000
+
+# (tên trong response, model, cột lọc theo user với resident; None = ai cũng xem được)
+ENTITIES = [
+    ("facilities", models.Facility, None),
+    ("announcements", models.Announcement, None),
+    ("messages", models.Message, None),
+    ("users", models.User, models.User.id),
+    ("bookings", models.Booking, models.Booking.user_id),
+    ("bills", models.Bill, models.Bill.user_id),
+    ("reports", models.Report, models.Report.user_id),
+]
+
+
+def _decode(cursor: str) -> list:
+    """Vị trí (updated_at, id) của từng loại dữ liệu trong ENTITIES."""
+    if not cursor:
+        return [None] * len(ENTITIES)
+    try:
+        values = pagination.decode_cursor(cursor, 2 * len(ENTITIES))
+    except HTTPException:
+        # Cursor cũ chỉ có một mốc updated_at chung
+        since = pagination.decode_cursor(cursor, 1)[0]
+        values = [since, ""] * len(ENTITIES)
+    positions = [tuple(values[i:i + 2]) for i in range(0, len(values), 2)]
+    # Đúng độ dài nhưng sai kiểu (cursor bị sửa tay) thì so sánh với mốc an toàn sẽ lỗi 500
+    if not all(isinstance(ts, datetime) and isinstance(id, str) for ts, id in positions):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return positions
+
+
+def collect_changes(db: Session, user_id: str, cursor: str = None, limit: int = SYNC_MAX_ROWS_PER_ENTITY) -> dict:
+    user = db.query(models.User).filter(models.User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    positions = _decode(cursor)
+
+    started_at = models.utcnow()
+    # id rỗng đứng trước mọi id: lần sau lấy lại mọi dòng có updated_at sau mốc an toàn
+    safe = (started_at - SYNC_SAFETY_WINDOW, "")
+    has_more = False
+    changes = {}
+    next_positions = []
+    for (name, model, owner_column), since in zip(ENTITIES, positions):
+        query = db.query(model)
+        if owner_column is not None and user.role != "ADMIN":
+            query = query.filter(owner_column == user.id)
+        # Khóa (updated_at, id): một lần cập nhật hàng loạt gán cùng updated_at cho hàng nghìn dòng,
+        # chỉ riêng updated_at thì trang bị cắt giữa các dòng đó sẽ không bao giờ qua được
+        keys = [model.updated_at, model.id]
+        if since is not None:
+            query = query.filter(pagination.after(keys, since))
+        rows = query.order_by(*keys).limit(limit + 1).all()
+        if len(rows) > limit:
+            # Bị cắt: lần sync sau tiếp tục ngay sau dòng cuối cùng đã trả (luôn tiến lên)
+            rows = rows[:limit]
+            has_more = True
+            position = (rows[-1].updated_at, rows[-1].id)
+        else:
+            position = safe if since is None else max(safe, since)
+        next_positions.extend(position)
+        changes[name] = rows
+
+    return {"cursor": pagination.encode_cursor(next_positions), "has_more": has_more, "changes": changes}
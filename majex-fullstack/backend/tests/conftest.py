@@ -0,0 +1,22 @@
+# backend/tests/conftest.py
+# Chạy từ thư mục backend/:  python -m pytest tests
+# Các module đọc DATABASE_URL lúc import: trỏ về một file SQLite tạm trước khi import.
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="majex-tests-"), "majex.db")
+os.environ.setdefault("SCHEDULER_ENABLED", "0")
+os.environ.setdefault("QR_SECRET", "majex-test-qr-secret")
+
+import pytest
+from sqlalchemy import create_engine
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """Engine SQLite trống riêng cho từng test."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    yield engine
+    engine.dispose()
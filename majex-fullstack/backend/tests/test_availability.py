@@ -0,0 +1,92 @@
+# backend/tests/test_availability.py
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import availability
+import database
+import main
+import migrations
+import models
+
+DAY = (date.today() + timedelta(days=3)).isoformat()
+
+
+@pytest.fixture(scope="module")
+def client():
+    migrations.upgrade()
+    db = database.SessionLocal()
+    if db.get(models.User, "booking-user") is None:
+        db.add(models.User(id="booking-user", name="Resident", role="RESIDENT", status="Active"))
+        db.commit()
+    db.close()
+    # Không chạy lifespan: chỉ cần các endpoint
+    return TestClient(main.app)
+
+
+def _facility(client, id: str, **fields) -> dict:
+    body = {"id": id, "name": "Tennis", "type": "Court", "image": "", "openTime": "06:00",
+            "closeTime": "10:00", "price": 0, "slotMinutes": 60, **fields}
+    return client.post("/facilities", json=body)
+
+
+def _booking(facility_id: str, slot: str = "08:00") -> dict:
+    return {"id": models.generate_uuid(), "facilityId": facility_id, "facilityName": "Tennis",
+            "userId": "booking-user", "userName": "Resident", "date": DAY, "timeSlot": slot,
+            "qrCodeData": "", "status": "Confirmed"}
+
+
+@pytest.mark.parametrize("fields", [
+    {"openTime": "9:00am"},
+    {"openTime": ""},
+    {"closeTime": "24:00"},
+    {"closeTime": "7:5"},
+    {"slotMinutes": 0},
+])
+def test_invalid_opening_hours_are_rejected(client, fields):
+    assert _facility(client, models.generate_uuid(), **fields).status_code == 422
+
+
+def test_legacy_bad_hours_give_4xx_not_500(client):
+    db = database.SessionLocal()
+    db.add(models.Facility(id="legacy-hours", name="Old", type="Pool", image="", open_time="9:00am",
+                           close_time="", price=0))
+    db.commit()
+    db.close()
+    response = client.get("/facilities/legacy-hours/availability", params={"date": DAY})
+    assert response.status_code == 422
+
+
+def test_double_booking_same_slot_returns_409(client):
+    assert _facility(client, "court-1").status_code == 200
+    assert client.post("/bookings", json=_booking("court-1")).status_code == 200
+    second = client.post("/bookings", json=_booking("court-1"))
+    assert second.status_code == 409
+    # Khung giờ khác vẫn đặt được
+    assert client.post("/bookings", json=_booking("court-1", "09:00")).status_code == 200
+    slots = client.get("/facilities/court-1/availability", params={"date": DAY}).json()["slots"]
+    assert [s["timeSlot"] for s in slots if not s["available"]] == ["08:00", "09:00"]
+
+
+def test_concurrent_reservations_only_one_wins(client):
+    assert _facility(client, "court-2").status_code == 200
+
+    def reserve(_):
+        db = database.SessionLocal()
+        try:
+            body = _booking("court-2")
+            availability.reserve(db, {"id": body["id"], "facility_id": "court-2", "facility_name": "Tennis",
+                                      "user_id": "booking-user", "user_name": "Resident", "date": DAY,
+                                      "time_slot": "07:00", "qr_code_data": "", "status": "Confirmed"})
+            return 200
+        except HTTPException as e:
+            return e.status_code
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(reserve, range(8)))
+    assert sorted(results) == [200] + [409] * 7
@@ -0,0 +1,104 @@
+# backend/tests/test_cache.py
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import cache
+import main
+import migrations
+import realtime
+
+
+@pytest.fixture(scope="module")
+def client():
+    migrations.upgrade()
+    # Không chạy lifespan: cache chỉ của process này (chưa attach backplane)
+    return TestClient(main.app)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    cache.response_cache.clear()
+    yield
+    cache.response_cache.clear()
+
+
+def _facility(id: str) -> dict:
+    return {"id": id, "name": id, "type": "Gym", "image": "", "openTime": "06:00", "closeTime": "22:00", "price": 0}
+
+
+def test_if_none_match_returns_304(client):
+    first = client.get("/facilities")
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and first.headers["cache-control"] == "no-cache"
+
+    again = client.get("/facilities", headers={"If-None-Match": etag})
+    assert (again.status_code, again.content, again.headers["etag"]) == (304, b"", etag)
+    assert client.get("/facilities", headers={"If-None-Match": '"other", ' + etag}).status_code == 304
+    assert client.get("/facilities", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_write_invalidates_cached_list(client):
+    etag = client.get("/facilities").headers["etag"]
+    assert client.post("/facilities", json=_facility("cache-gym")).status_code == 200
+
+    # ETag cũ không còn khớp: client nhận danh sách mới ngay, không phải chờ hết TTL
+    response = client.get("/facilities", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
+    assert "cache-gym" in {f["id"] for f in response.json()}
+
+
+def test_invalidate_is_published_to_other_workers():
+    published = []
+
+    async def publish(frame):
+        published.append(frame)
+
+    async def run():
+        cache.attach(asyncio.get_running_loop(), publish)
+        try:
+            cache.response_cache.set("facilities", "", b"[]")
+            cache.invalidate("facilities")
+            await asyncio.sleep(0)
+        finally:
+            cache._publisher = None
+
+    asyncio.run(run())
+    assert cache.response_cache.get("facilities", "") is None
+    assert published == [{"type": cache.INVALIDATE, "namespace": "facilities", "origin": cache.WORKER_ID}]
+
+
+class Socket:
+    def __init__(self):
+        self.scope = {"subprotocols": []}
+        self.client = None
+        self.sent = []
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, text):
+        self.sent.append(text)
+
+
+def test_invalidation_from_another_worker_clears_cache_without_reaching_clients():
+    manager = realtime.ConnectionManager()
+    socket = Socket()
+
+    async def run():
+        await manager.connect(socket)
+        cached = []
+        for origin in (cache.WORKER_ID, "other-worker"):
+            cache.response_cache.set("users", "", b"[]")
+            await manager.deliver_local({"type": cache.INVALIDATE, "namespace": "users", "origin": origin})
+            cached.append(cache.response_cache.get("users", ""))
+        await manager.deliver_local({"type": "message", "id": "m1", "text": "hi"})
+        await asyncio.sleep(0.05)
+        manager.disconnect(socket)
+        return cached
+
+    own, other = asyncio.run(run())
+    # Sự kiện của chính worker này bị bỏ qua (cache đã xóa lúc ghi), của worker khác thì xóa
+    assert own is not None and other is None
+    assert len(socket.sent) == 1 and '"m1"' in socket.sent[0]
@@ -0,0 +1,116 @@
+# backend/tests/test_checkin.py
+import importlib
+from datetime import date, timedelta
+
+import pytest
+
+import checkin
+import database
+import migrations
+import models
+
+
+@pytest.fixture(scope="module", autouse=True)
+def schema():
+    migrations.upgrade()
+    db = database.SessionLocal()
+    if db.get(models.Facility, "checkin-pool") is None:
+        db.add(models.User(id="checkin-user", name="Resident", role="RESIDENT", status="Active"))
+        db.add(models.Facility(id="checkin-pool", name="Pool", type="Pool", open_time="06:00", close_time="22:00"))
+        db.commit()
+    db.close()
+
+
+@pytest.fixture
+def db():
+    session = database.SessionLocal()
+    checkin.today_cache.day = None  # nạp lại booking hôm nay cho từng test
+    yield session
+    session.close()
+
+
+def _booking(db, day: date = None) -> models.Booking:
+    booking = models.Booking(id=models.generate_uuid(), facility_id="checkin-pool", user_id="checkin-user",
+                             date=day or date.today(), time_slot="08:00", status="Confirmed")
+    checkin.assign_code(booking)
+    db.add(booking)
+    db.commit()
+    return booking
+
+
+def test_valid_token_checks_in_once(db):
+    booking = _booking(db)
+
+    assert checkin.verify(db, booking.qr_code_data)["reason"] == "ok"
+    assert checkin.verify(db, booking.qr_code_data, check_in=True)["reason"] == "checked_in"
+    # Quét lại cùng mã (cùng worker hoặc cache của worker khác đã cũ)
+    assert checkin.verify(db, booking.qr_code_data, check_in=True)["reason"] == "already_checked_in"
+    checkin.today_cache.day = None
+    assert checkin.verify(db, booking.qr_code_data, check_in=True)["reason"] == "already_checked_in"
+
+
+def test_stale_cache_cannot_check_in_twice(db):
+    booking = _booking(db)
+    assert checkin.verify(db, booking.qr_code_data)["valid"]  # entry nằm trong cache, chưa check-in
+
+    # Một worker khác check-in trước: cache ở đây vẫn thấy checked_in_at = None
+    other = database.SessionLocal()
+    try:
+        other.get(models.Booking, booking.id).checked_in_at = models.utcnow()
+        other.commit()
+    finally:
+        other.close()
+    result = checkin.verify(db, booking.qr_code_data, check_in=True)
+    assert (result["valid"], result["reason"]) == (False, "already_checked_in")
+
+
+@pytest.mark.parametrize("tamper", [
+    lambda code: code[:-2] + ("AA" if not code.endswith("AA") else "BB"),  # sửa chữ ký
+    lambda code: code.replace("MJ1.", "MJ1.x", 1),                          # đổi booking id
+    lambda code: code.rsplit(".", 1)[0] + ".",                              # bỏ chữ ký
+])
+def test_tampered_token_is_rejected(db, tamper):
+    booking = _booking(db)
+    result = checkin.verify(db, tamper(booking.qr_code_data), check_in=True)
+    assert (result["valid"], result["reason"], result["booking"]) == (False, "invalid", None)
+
+
+def test_token_forged_with_another_key_is_rejected(db, monkeypatch):
+    booking = _booking(db)
+    monkeypatch.setattr(checkin, "QR_SECRET", b"attacker-key")
+    forged = checkin.issue_token(booking.id, booking.date)
+    monkeypatch.undo()
+
+    assert forged != booking.qr_code_data
+    assert checkin.verify(db, forged, check_in=True)["reason"] == "invalid"
+
+
+def test_token_for_another_day_is_rejected(db):
+    tomorrow = _booking(db, date.today() + timedelta(days=1))
+    assert checkin.verify(db, tomorrow.qr_code_data, check_in=True)["reason"] == "wrong_date"
+
+    # Chữ ký đúng cho booking hôm nay nhưng ngày trong token bị đổi
+    today = _booking(db)
+    moved = checkin.issue_token(today.id, date.today() - timedelta(days=1))
+    assert checkin.verify(db, moved, check_in=True)["reason"] == "wrong_date"
+    assert db.get(models.Booking, today.id).checked_in_at is None
+
+
+def test_missing_secret_fails_closed(monkeypatch):
+    monkeypatch.delenv("QR_SECRET")
+    monkeypatch.delenv("MAJEX_DEV", raising=False)
+    try:
+        importlib.reload(checkin)
+        with pytest.raises(RuntimeError):
+            checkin.require_secret()
+        with pytest.raises(RuntimeError):
+            checkin.issue_token("b1", date.today())
+        with pytest.raises(RuntimeError):
+            checkin.parse_token("MJ1.b1.20240101.signature")
+
+        monkeypatch.setenv("MAJEX_DEV", "1")
+        importlib.reload(checkin)
+        assert checkin.QR_SECRET == checkin.DEV_QR_SECRET.encode()
+    finally:
+        monkeypatch.undo()
+        importlib.reload(checkin)
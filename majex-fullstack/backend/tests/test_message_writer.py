@@ -0,0 +1,121 @@
+# backend/tests/test_message_writer.py
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.exc import OperationalError
+
+import database
+import message_writer
+import migrations
+import models
+
+
+@pytest.fixture(scope="module", autouse=True)
+def schema():
+    migrations.upgrade()
+    db = database.SessionLocal()
+    if db.get(models.User, "writer-user") is None:
+        db.add(models.User(id="writer-user", name="Writer", role="RESIDENT", status="Active"))
+        db.commit()
+    db.close()
+
+
+def _row(text: str, id: str = None) -> dict:
+    return {"id": id or models.generate_uuid(), "sender_id": "writer-user", "sender_name": "Writer",
+            "text": text, "timestamp": models.utcnow()}
+
+
+def _stored(ids) -> set:
+    db = database.SessionLocal()
+    try:
+        return {m.id for m in db.query(models.Message).filter(models.Message.id.in_(list(ids)))}
+    finally:
+        db.close()
+
+
+def test_bad_row_only_drops_itself(monkeypatch):
+    existing = _row("already stored")
+    writer = message_writer.MessageWriter()
+    asyncio.run(writer._flush([existing]))
+
+    # Trùng khóa chính: INSERT cả lô lỗi, nhưng chỉ dòng này bị bỏ
+    rows = [_row(f"message {i}") for i in range(9)]
+    rows.insert(4, _row("duplicate", id=existing["id"]))
+    asyncio.run(writer._flush(rows))
+
+    assert writer.failed == 1
+    assert writer.written == 1 + 9
+    assert _stored(r["id"] for r in rows) == {r["id"] for r in rows}
+
+
+def _flaky_database(monkeypatch, failures: int):
+    """run_in_session lỗi kết nối `failures` lần đầu; trả về kích thước các lô đã thử ghi."""
+    original = database.run_in_session
+    attempts = []
+
+    async def run_in_session(fn, rows):
+        attempts.append(len(rows))
+        if len(attempts) <= failures:
+            raise OperationalError("INSERT", {}, Exception("connection lost"))
+        return await original(fn, rows)
+
+    async def no_sleep(delay):
+        pass
+
+    monkeypatch.setattr(database, "run_in_session", run_in_session)
+    monkeypatch.setattr(message_writer.asyncio, "sleep", no_sleep)
+    return attempts
+
+
+def test_transient_outage_retries_whole_batch(monkeypatch):
+    attempts = _flaky_database(monkeypatch, failures=6)
+    rows = [_row(f"outage {i}") for i in range(8)]
+    writer = message_writer.MessageWriter()
+    asyncio.run(writer._flush(rows))
+
+    # Không chia đôi, không bỏ tin nào: cùng một lô được thử lại tới khi DB trở lại
+    assert attempts == [8] * 7
+    assert (writer.written, writer.failed) == (8, 0)
+    assert _stored(r["id"] for r in rows) == {r["id"] for r in rows}
+
+
+def test_retry_is_bounded(monkeypatch):
+    monkeypatch.setattr(message_writer, "MESSAGE_RETRY_SECONDS", 1.0)
+    attempts = _flaky_database(monkeypatch, failures=1000)
+    writer = message_writer.MessageWriter()
+    asyncio.run(writer._flush([_row("lost") for _ in range(4)]))
+
+    # 0.1 + 0.2 + 0.4 < 1s rồi dừng; cả lô bị bỏ một lần, không bisect thành từng dòng
+    assert attempts == [4] * 4
+    assert (writer.written, writer.failed) == (0, 4)
+
+
+@pytest.mark.parametrize("sender_id, sender_name, text, status", [
+    ("nobody", "Ghost", "hello", 404),
+    ("writer-user", "x" * 101, "hello", 400),
+    ("writer-user", "Writer", "", 400),
+    ("writer-user", "Writer", "x" * (message_writer.MESSAGE_MAX_LENGTH + 1), 400),
+    (None, "Writer", "hello", 400),
+])
+def test_submit_rejects_rows_that_cannot_be_stored(sender_id, sender_name, text, status):
+    writer = message_writer.MessageWriter()
+
+    async def submit():
+        with pytest.raises(HTTPException) as error:
+            await writer.submit(sender_id, sender_name, text)
+        return error.value.status_code, writer.queue.qsize()
+
+    assert asyncio.run(submit()) == (status, 0)
+
+
+def test_submit_queues_valid_message():
+    writer = message_writer.MessageWriter()
+
+    async def submit():
+        row = await writer.submit("writer-user", "Writer", "xin chào")
+        return row, writer.queue.qsize()
+
+    row, queued = asyncio.run(submit())
+    assert queued == 1 and row["text"] == "xin chào"
+    assert "writer-user" in writer.known_senders
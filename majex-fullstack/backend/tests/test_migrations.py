@@ -0,0 +1,199 @@
+# backend/tests/test_migrations.py
+import pytest
+from sqlalchemy import event, inspect, text
+
+import migrations
+
+# Schema do create_all của bản đầu tiên (trước khi có migration) tạo ra
+BASELINE_DDL = [
+    """CREATE TABLE users (id VARCHAR(50) PRIMARY KEY, name VARCHAR(100), role VARCHAR(20), avatar VARCHAR(255),
+       apartment_id VARCHAR(20), email VARCHAR(100), phone VARCHAR(20), username VARCHAR(50),
+       password VARCHAR(100), status VARCHAR(20))""",
+    """CREATE TABLE facilities (id VARCHAR(50) PRIMARY KEY, name VARCHAR(100), type VARCHAR(50), image VARCHAR(255),
+       open_time VARCHAR(10), close_time VARCHAR(10), price FLOAT)""",
+    """CREATE TABLE bills (id VARCHAR(50) PRIMARY KEY, user_id VARCHAR(50) REFERENCES users(id), type VARCHAR(50),
+       amount FLOAT, due_date VARCHAR(20), status VARCHAR(20), month VARCHAR(50), paid_date VARCHAR(20))""",
+    """CREATE TABLE bookings (id VARCHAR(50) PRIMARY KEY, facility_id VARCHAR(50) REFERENCES facilities(id),
+       user_id VARCHAR(50) REFERENCES users(id), facility_name VARCHAR(100), user_name VARCHAR(100),
+       date VARCHAR(20), time_slot VARCHAR(20), qr_code_data TEXT, status VARCHAR(20))""",
+    """CREATE TABLE messages (id VARCHAR(50) PRIMARY KEY, sender_id VARCHAR(50) REFERENCES users(id),
+       sender_name VARCHAR(100), text TEXT, timestamp FLOAT)""",
+    """CREATE TABLE reports (id VARCHAR(50) PRIMARY KEY, user_id VARCHAR(50) REFERENCES users(id),
+       user_name VARCHAR(100), apartment VARCHAR(50), title VARCHAR(100), description TEXT,
+       category VARCHAR(50), status VARCHAR(20), timestamp FLOAT)""",
+    """CREATE TABLE announcements (id VARCHAR(50) PRIMARY KEY, title VARCHAR(200), content TEXT, tone VARCHAR(50),
+       sender_name VARCHAR(100), timestamp FLOAT)""",
+]
+
+BASELINE_ROWS = [
+    "INSERT INTO users (id, name, role, apartment_id, status) VALUES ('r1', 'Resident', 'RESIDENT', 'A-101', 'Active')",
+    "INSERT INTO facilities (id, name, type, price) VALUES ('f1', 'Pool', 'Pool', 0)",
+    "INSERT INTO bills VALUES ('b1', 'r1', 'Water', 12.5, '2023-11-15', 'Unpaid', 'November 2023', NULL)",
+    "INSERT INTO bookings VALUES ('k1', 'f1', 'r1', 'Pool', 'Resident', '2023-11-20', '08:00', 'QR-k1', 'Confirmed')",
+    "INSERT INTO messages VALUES ('m1', 'r1', 'Resident', 'Hồ bơi mở cửa chưa?', 1700000000123.0)",
+    "INSERT INTO reports VALUES ('p1', 'r1', 'Resident', 'A-101', 'Broken lift', 'Lift stuck', 'Maintenance', "
+    "'Pending', 1700000000456.0)",
+    "INSERT INTO announcements VALUES ('a1', 'Pool closed', 'Cleaning day', 'info', 'Admin', 1700000000789.0)",
+]
+
+
+def _upgrade_all(engine):
+    migrations.upgrade(engine)
+    assert migrations.pending(engine) == []
+
+
+def test_upgrade_baseline_database_through_every_version(engine):
+    with engine.begin() as conn:
+        for statement in BASELINE_DDL + BASELINE_ROWS:
+            conn.execute(text(statement))
+
+    _upgrade_all(engine)
+
+    with engine.connect() as conn:
+        inspector = inspect(conn)
+        assert {"qr_hash", "checked_in_at", "updated_at"} <= {c["name"] for c in inspector.get_columns("bookings")}
+        assert "ix_bookings_qr_hash" in {ix["name"] for ix in inspector.get_indexes("bookings")}
+        assert "uq_bills_user_type_month" in {ix["name"] for ix in inspector.get_indexes("bills")}
+        booking = conn.execute(text("SELECT date, qr_hash FROM bookings WHERE id = 'k1'")).one()
+        assert booking.date == "2023-11-20" and booking.qr_hash
+        assert conn.execute(text("SELECT timestamp FROM messages")).scalar().startswith("2023-11-14 22:13:20.123")
+        assert conn.execute(text("SELECT count FROM bill_summary WHERE status = 'Unpaid'")).scalar() == 1
+        assert conn.execute(text("SELECT COUNT(*) FROM search_postings WHERE doc_id = 'm1'")).scalar() == 5
+        assert conn.execute(text("SELECT COUNT(*) FROM notifications WHERE ref_id = 'a1'")).scalar() == 1
+        assert conn.execute(text("SELECT COUNT(*) FROM search_terms WHERE term = ''")).scalar() == 0
+        assert conn.execute(text("SELECT doc_count FROM search_term_shards WHERE term = 'boi'")).scalar() == 1
+
+
+def test_every_migration_runs_on_its_own(engine):
+    # Dừng sau từng phiên bản rồi chạy tiếp: mỗi bước chỉ dựa vào schema của các bước trước nó
+    full = migrations.MIGRATIONS
+    try:
+        for count in range(1, len(full) + 1):
+            migrations.MIGRATIONS = full[:count]
+            migrations.upgrade(engine)
+    finally:
+        migrations.MIGRATIONS = full
+    assert migrations.pending(engine) == []
+
+
+def test_upgraded_schema_matches_models(engine):
+    import models
+
+    _upgrade_all(engine)
+    with engine.connect() as conn:
+        inspector = inspect(conn)
+        for table in models.Base.metadata.sorted_tables:
+            assert inspector.has_table(table.name), table.name
+            columns = {c["name"] for c in inspector.get_columns(table.name)}
+            assert {c.name for c in table.columns} <= columns, table.name
+            indexes = {ix["name"] for ix in inspector.get_indexes(table.name)}
+            assert {ix.name for ix in table.indexes} <= indexes, table.name
+
+
+def test_backfill_commits_each_batch(engine, monkeypatch):
+    monkeypatch.setattr(migrations, "BACKFILL_BATCH", 2)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, flag INTEGER)"))
+        conn.execute(text("INSERT INTO items (id) VALUES (1), (2), (3), (4), (5)"))
+    commits = []
+    event.listen(engine, "commit", lambda conn: commits.append(1))
+    with engine.connect() as conn:
+        migrations._backfill(conn, "items", "flag = 1", "flag IS NULL")
+    assert len(commits) == 3  # 2 + 2 + 1 dòng
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM items WHERE flag = 1")).scalar() == 5
+
+
+def test_interrupted_backfill_resumes_without_duplicates(engine, monkeypatch):
+    full = migrations.MIGRATIONS
+    monkeypatch.setattr(migrations, "MIGRATIONS", full[:8])
+    migrations.upgrade(engine)
+    with engine.begin() as conn:
+        for i in range(5):
+            conn.execute(text(f"INSERT INTO announcements (id, title, content) VALUES ('a{i}', 'T{i}', 'C')"))
+
+    # Lần chạy đầu dừng sau lô thứ nhất (vd: process bị tắt): lô đó đã được commit
+    monkeypatch.setattr(migrations, "BACKFILL_BATCH", 2)
+    monkeypatch.setattr(migrations, "MIGRATIONS", full[:9])
+    original = migrations.models.generate_uuid
+    calls = []
+
+    def crash_after_first_batch():
+        calls.append(1)
+        if len(calls) > 2:
+            raise RuntimeError("killed")
+        return original()
+
+    monkeypatch.setattr(migrations.models, "generate_uuid", crash_after_first_batch)
+    try:
+        migrations.upgrade(engine)
+    except RuntimeError:
+        pass
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM notifications")).scalar() == 2
+    assert 9 in {v for v, _n in migrations.pending(engine)}
+
+    monkeypatch.setattr(migrations.models, "generate_uuid", original)
+    migrations.upgrade(engine)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(DISTINCT ref_id), COUNT(*) FROM notifications")).one() == (5, 5)
+
+
+def test_aggregate_and_search_backfills_match_rebuild(engine, monkeypatch):
+    # 0006/0007 tự viết SQL theo schema lúc đó: kết quả phải giống aggregates/search.rebuild hiện tại
+    import aggregates
+    import search
+    from sqlalchemy.orm import Session
+
+    with engine.begin() as conn:
+        for statement in BASELINE_DDL + BASELINE_ROWS:
+            conn.execute(text(statement))
+        conn.execute(text("INSERT INTO bookings (id, facility_id, date, status) VALUES "
+                          "('k2', 'f1', '2023-11-21', 'Confirmed'), ('k3', 'f1', NULL, NULL)"))
+        conn.execute(text("INSERT INTO messages (id, text) VALUES ('m2', 'bơi bơi lội'), ('m3', NULL)"))
+        conn.execute(text("INSERT INTO reports (id, title, description) VALUES ('p2', 'Hồ bơi', NULL)"))
+    monkeypatch.setattr(migrations, "BACKFILL_BATCH", 1)
+    _upgrade_all(engine)
+
+    def snapshot():
+        with engine.connect() as conn:
+            tables = {name: sorted(map(tuple, conn.execute(text(f"SELECT * FROM {name}"))))
+                      for name in ("bill_summary", "booking_summary", "search_postings")}
+            tables["df"] = sorted(map(tuple, conn.execute(
+                text("SELECT term, SUM(doc_count) FROM search_term_shards GROUP BY term"))))
+            return tables
+
+    migrated = snapshot()
+    assert ("f1", "2023-11", "Confirmed", 2) in migrated["booking_summary"]
+    with Session(engine) as session:
+        aggregates.rebuild(session)
+        search.rebuild(session)
+        session.commit()
+    assert snapshot() == migrated
+
+
+def test_auto_migrate_defaults_to_sqlite_only(monkeypatch):
+    import importlib
+
+    import database
+
+    monkeypatch.delenv("AUTO_MIGRATE", raising=False)
+    try:
+        monkeypatch.setattr(database, "SQLALCHEMY_DATABASE_URL", "mssql+pyodbc://sa:x@db/MajeXDB")
+        assert importlib.reload(migrations).AUTO_MIGRATE is False
+        monkeypatch.setattr(database, "SQLALCHEMY_DATABASE_URL", "sqlite:///./majex.db")
+        assert importlib.reload(migrations).AUTO_MIGRATE is True
+    finally:
+        monkeypatch.undo()
+        importlib.reload(migrations)
+
+
+def test_column_rewrite_needs_explicit_upgrade(engine, monkeypatch):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE bills (id VARCHAR(50) PRIMARY KEY, due_date VARCHAR(20))"))
+    with engine.connect() as conn:
+        # Giả lập SQL Server: bước DROP COLUMN + sp_rename bị chặn khi chạy tự động
+        monkeypatch.setattr(conn.dialect, "name", "mssql")
+        conn.info["majex_allow_destructive"] = False
+        with pytest.raises(RuntimeError, match="python migrations.py upgrade"):
+            migrations._convert_column(conn, "bills", "due_date", "date")
@@ -0,0 +1,123 @@
+# backend/tests/test_notifications.py
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import migrations
+import models
+import notifications
+import realtime
+
+
+@pytest.fixture
+def db(engine):
+    migrations.upgrade(engine)
+    session = Session(bind=engine)
+    session.add(models.User(id="r1", name="Resident A", role="RESIDENT", apartment_id="A-402", status="Active"))
+    session.add(models.User(id="r2", name="Resident B", role="RESIDENT", apartment_id="B-101", status="Active"))
+    session.commit()
+    yield session
+    session.close()
+
+
+def _send(db, *notices):
+    rows = [notifications.notify(db, audience, target, "notice", title) for audience, target, title in notices]
+    db.commit()
+    return rows
+
+
+def _titles(db, user_id):
+    return [item["title"] for item in notifications.inbox(db, user_id)["items"]]
+
+
+def test_inbox_is_assembled_from_audiences(db):
+    _send(db, ("all", "", "everyone"), ("building", "A", "tower A"), ("apartment", "A-402", "flat"),
+          ("user", "r2", "just r2"), ("building", "C", "tower C"))
+
+    # Mỗi thông báo là một dòng, dù gửi cho cả khu
+    assert db.query(func.count(models.Notification.id)).scalar() == 5
+    assert sorted(_titles(db, "r1")) == ["everyone", "flat", "tower A"]
+    assert sorted(_titles(db, "r2")) == ["everyone", "just r2"]
+
+
+def test_invalid_audience_is_rejected(db):
+    for audience, target in (("floor", "3"), ("building", ""), ("user", None)):
+        with pytest.raises(HTTPException) as error:
+            notifications.notify(db, audience, target, "notice", "x")
+        assert error.value.status_code == 400
+    db.rollback()
+
+
+def test_mark_read_moves_forward_only(db):
+    _send(db, ("all", "", "first"))
+    _send(db, ("building", "A", "second"))
+    _send(db, ("user", "r1", "third"))
+    items = notifications.inbox(db, "r1")["items"]
+    newest, _middle, oldest = (item["id"] for item in items)
+    assert notifications.unread_count(db, "r1") == {"unread": 3, "capped": False}
+
+    assert notifications.mark_read(db, "r1", oldest) == {"unread": 2, "capped": False}
+    assert [item["read"] for item in notifications.inbox(db, "r1")["items"]] == [False, False, True]
+    assert notifications.mark_read(db, "r1") == {"unread": 0, "capped": False}
+    # Đánh dấu lại một thông báo cũ hơn không làm mốc lùi
+    assert notifications.mark_read(db, "r1", oldest)["unread"] == 0
+    assert notifications._read_key(db, "r1")[1] == newest
+    # r2 có mốc riêng
+    assert notifications.unread_count(db, "r2")["unread"] == 1
+
+
+def test_mark_read_of_invisible_notification_is_404(db):
+    row = _send(db, ("user", "r2", "private"))[0]
+    with pytest.raises(HTTPException) as error:
+        notifications.mark_read(db, "r1", row["id"])
+    assert error.value.status_code == 404
+
+
+def test_unread_count_is_capped(db, monkeypatch):
+    monkeypatch.setattr(notifications, "UNREAD_COUNT_CAP", 2)
+    _send(db, *[("all", "", f"n{i}") for i in range(5)])
+    assert notifications.unread_count(db, "r1") == {"unread": 2, "capped": True}
+
+
+class Socket:
+    def __init__(self):
+        self.scope = {"subprotocols": []}
+        self.client = None
+        self.sent = []
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def send_text(self, text):
+        self.sent.append(text)
+
+
+def test_push_after_commit_reaches_only_the_target_group(db):
+    async def scenario():
+        manager = realtime.ConnectionManager()
+        await manager.start()
+        notifications.attach(asyncio.get_running_loop(), manager.broadcast)
+        sockets = {}
+        for user_id in ("r1", "r2"):
+            sockets[user_id] = Socket()
+            await manager.connect(sockets[user_id])
+            manager.subscribe(sockets[user_id], notifications.subscriptions_for(db, user_id))
+        try:
+            notifications.notify(db, "building", "A", "notice", "rolled back")
+            db.rollback()
+            _send(db, ("building", "A", "lift"), ("all", "", "water"))
+            for _ in range(10):
+                await asyncio.sleep(0)
+        finally:
+            notifications._publisher = None
+            for ws in sockets.values():
+                manager.disconnect(ws)
+        return {user_id: ws.sent for user_id, ws in sockets.items()}
+
+    sent = asyncio.run(scenario())
+    assert all('"type":"notification"' in frame for frames in sent.values() for frame in frames)
+    assert ["lift" in f for f in sent["r1"]] == [True, False] and "water" in sent["r1"][1]
+    assert len(sent["r2"]) == 1 and "water" in sent["r2"][0]
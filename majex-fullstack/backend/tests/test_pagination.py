@@ -0,0 +1,81 @@
+# backend/tests/test_pagination.py
+from datetime import date, datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+import migrations
+import models
+import pagination
+
+KEYS = [models.Booking.date, models.Booking.id]
+
+
+@pytest.fixture
+def db(engine):
+    migrations.upgrade(engine)
+    session = Session(bind=engine)
+    # Booking cũ không có ngày xen giữa các booking có ngày
+    days = [date(2024, 1, 2), None, date(2024, 1, 1), None, date(2024, 1, 2), date(2024, 1, 3), None]
+    session.add_all(models.Booking(id=f"k{i}", date=day, status="Confirmed") for i, day in enumerate(days))
+    session.commit()
+    yield session
+    session.close()
+
+
+def _walk(db, limit, descending=False):
+    ids, cursor = [], None
+    for _ in range(20):
+        rows, cursor = pagination.paginate(db.query(models.Booking), KEYS, cursor, limit, descending)
+        ids.extend(row.id for row in rows)
+        if cursor is None:
+            return ids
+    raise AssertionError("pagination never finished")
+
+
+def test_cursor_round_trip_keeps_types():
+    values = [datetime(2024, 5, 6, 7, 8, 9, 123000), date(2024, 5, 6), None, "k1", 2.5, 3]
+    assert pagination.decode_cursor(pagination.encode_cursor(values), len(values)) == values
+
+
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("limit", [1, 2, 3, 10])
+def test_null_sort_keys_are_neither_skipped_nor_repeated(db, limit, descending):
+    expected = [row.id for row in db.query(models.Booking).order_by(
+        *(k.desc() if descending else k.asc() for k in KEYS))]
+    assert _walk(db, limit, descending) == expected
+    assert len(expected) == 7
+
+
+def test_cursor_positioned_on_null_key(db):
+    cursor = pagination.encode_cursor([None, "k1"])
+    rows, _next = pagination.paginate(db.query(models.Booking), KEYS, cursor, 10)
+    assert [row.id for row in rows] == ["k3", "k6", "k2", "k0", "k4", "k5"]
+    rows, _next = pagination.paginate(db.query(models.Booking), KEYS, cursor, 10, descending=True)
+    assert [row.id for row in rows] == []
+
+
+@pytest.mark.parametrize("cursor", [
+    "not-base64!!",
+    pagination.encode_cursor(["2024-01-01"]),                      # sai số phần tử
+    pagination.encode_cursor([20240101, "k1"]),                    # số thay cho ngày
+    pagination.encode_cursor([{"d": "2024-01-01"}, 7]),            # id không phải chuỗi
+    pagination.encode_cursor([{"d": "2024-01-01"}, None]),         # id không được NULL
+    pagination.encode_cursor([{"x": 1}, "k1"]),
+])
+def test_tampered_cursor_is_rejected(db, cursor):
+    with pytest.raises(HTTPException) as error:
+        pagination.paginate(db.query(models.Booking), KEYS, cursor, 10)
+    assert error.value.status_code == 400
+
+
+def test_tampered_cursor_over_http_returns_400():
+    from fastapi.testclient import TestClient
+
+    import main
+
+    migrations.upgrade()
+    client = TestClient(main.app)
+    assert client.get("/bookings", params={"cursor": pagination.encode_cursor([1, 2])}).status_code == 400
+    assert client.get("/bookings", params={"cursor": "garbage"}).status_code == 400
@@ -0,0 +1,246 @@
+# backend/tests/test_realtime.py
+import asyncio
+import json
+
+import realtime
+
+
+class Socket:
+    """WebSocket giả: ghi lại frame đã gửi; blocked=True thì send treo (client không đọc)."""
+
+    def __init__(self, subprotocols=(), blocked=False, broken=False):
+        self.scope = {"subprotocols": list(subprotocols)}
+        self.client = None
+        self.subprotocol = None
+        self.text = []
+        self.binary = []
+        self.closed_with = None
+        self.blocked = blocked
+        self.broken = broken
+        self.release = asyncio.Event()
+
+    async def accept(self, subprotocol=None):
+        self.subprotocol = subprotocol
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+    async def _wait(self):
+        if self.broken:
+            raise ConnectionResetError("peer gone")
+        if self.blocked:
+            await self.release.wait()
+
+    async def send_text(self, text):
+        await self._wait()
+        self.text.append(json.loads(text))
+
+    async def send_bytes(self, data):
+        await self._wait()
+        self.binary.append(realtime.msgpack.unpackb(data))
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def started(**kwargs) -> realtime.ConnectionManager:
+    manager = realtime.ConnectionManager(**kwargs)
+    await manager.start()
+    return manager
+
+
+# --- HÀNG ĐỢI RIÊNG TỪNG KẾT NỐI / SLOW CONSUMER ---
+
+def test_slow_client_does_not_delay_others():
+    async def scenario():
+        manager = await started(max_queue=100, max_lag=60)
+        fast, slow = Socket(), Socket(blocked=True)
+        await manager.connect(fast)
+        await manager.connect(slow)
+        for i in range(10):
+            await manager.broadcast({"type": "message", "id": i})
+        await settle()
+        # Client nhanh đã nhận hết; client chậm giữ một frame đang gửi và 9 frame chờ
+        assert [m["id"] for m in fast.text] == list(range(10))
+        assert manager.connections[slow].queue_depth() == 9
+        slow.release.set()
+        await settle()
+        assert [m["id"] for m in slow.text] == list(range(10))
+        for ws in (fast, slow):
+            manager.disconnect(ws)
+
+    run(scenario())
+
+
+def test_full_queue_evicts_only_that_client():
+    async def scenario():
+        manager = await started(max_queue=3, max_lag=60)
+        fast, slow = Socket(), Socket(blocked=True)
+        await manager.connect(fast)
+        await manager.connect(slow)
+        for i in range(6):
+            await manager.broadcast({"type": "message", "id": i})
+            await settle()  # tin đến lần lượt: writer của client nhanh kịp gửi
+        assert slow not in manager.connections and fast in manager.connections
+        assert slow.closed_with == realtime.SLOW_CONSUMER_CLOSE_CODE
+        assert manager.evicted == 1
+        assert len(fast.text) == 6
+        manager.disconnect(fast)
+
+    run(scenario())
+
+
+def test_lagging_client_is_evicted():
+    async def scenario():
+        manager = await started(max_queue=100, max_lag=0.05)
+        slow = Socket(blocked=True)
+        await manager.connect(slow)
+        await manager.broadcast({"type": "message", "id": 1})
+        await settle()
+        assert slow in manager.connections  # mới kẹt, chưa quá max_lag
+        await asyncio.sleep(0.1)
+        # Frame gửi riêng (send) cũng kiểm tra độ trễ như broadcast
+        assert manager.send(slow, {"type": "error", "detail": "x"}) is False
+        await settle()
+        assert slow not in manager.connections and slow.closed_with == realtime.SLOW_CONSUMER_CLOSE_CODE
+
+    run(scenario())
+
+
+def test_writer_error_removes_connection():
+    async def scenario():
+        manager = await started()
+        broken = Socket(broken=True)
+        await manager.connect(broken)
+        await manager.broadcast({"type": "message", "id": 1})
+        await settle()
+        assert broken not in manager.connections
+
+    run(scenario())
+
+
+def test_direct_send_keeps_order_with_broadcast():
+    async def scenario():
+        manager = await started()
+        ws = Socket()
+        await manager.connect(ws)
+        await manager.broadcast({"type": "message", "id": 1})
+        manager.send(ws, {"type": "error", "detail": "only you"})
+        await manager.broadcast({"type": "message", "id": 2})
+        await settle()
+        assert [m["type"] for m in ws.text] == ["message", "error", "message"]
+        manager.disconnect(ws)
+
+    run(scenario())
+
+
+# --- GIAO THỨC v1 (JSON) / v2 (MessagePack, gom frame, số online theo trạng thái) ---
+
+def test_subprotocol_negotiation():
+    async def scenario():
+        manager = await started()
+        v1, v2, other = Socket(), Socket([realtime.PROTOCOL_V2]), Socket(["graphql-ws"])
+        for ws in (v1, v2, other):
+            await manager.connect(ws)
+        binary = {ws.subprotocol: manager.connections[ws].binary for ws in (v1, v2, other)}
+        for ws in (v1, v2, other):
+            manager.disconnect(ws)
+        return binary
+
+    assert run(scenario()) == {None: False, realtime.PROTOCOL_V2: True}
+
+
+def test_v1_gets_one_text_frame_per_event():
+    async def scenario():
+        manager = await started()
+        ws = Socket()
+        await manager.connect(ws)
+        await manager.broadcast({"type": "message", "id": 1, "text": "chào"})
+        await manager.deliver_local({"type": "online_count", "count": 5})
+        await manager.deliver_local({"type": "online_count", "count": 5})
+        await settle()
+        manager.disconnect(ws)
+        return ws
+
+    ws = run(scenario())
+    assert ws.binary == []
+    assert ws.text == [{"type": "message", "id": 1, "text": "chào"},
+                       {"type": "online_count", "count": 5}, {"type": "online_count", "count": 5}]
+
+
+def test_v2_batches_events_and_sends_latest_presence_once():
+    async def scenario():
+        manager = await started()
+        ws = Socket([realtime.PROTOCOL_V2])
+        await manager.connect(ws)
+        manager.connections[ws].batch_window = 0.05
+        for i in range(3):
+            await manager.broadcast({"type": "message", "id": i})
+            await manager.deliver_local({"type": "online_count", "count": 10 + i})
+        await asyncio.sleep(0.15)
+        # Số online không đổi: không gửi lại
+        await manager.deliver_local({"type": "online_count", "count": 12})
+        await asyncio.sleep(0.1)
+        await manager.deliver_local({"type": "online_count", "count": 13})
+        await asyncio.sleep(0.1)
+        manager.disconnect(ws)
+        return ws
+
+    ws = run(scenario())
+    assert ws.text == []
+    # Một frame cho cả cửa sổ: 3 tin nhắn + số online mới nhất (không phải 3 lần)
+    assert ws.binary[0] == [{"type": "message", "id": 0}, {"type": "message", "id": 1},
+                            {"type": "message", "id": 2}, {"type": "online_count", "count": 12}]
+    assert ws.binary[1:] == [[{"type": "online_count", "count": 13}]]
+
+
+def test_v1_and_v2_receive_the_same_events():
+    async def scenario():
+        manager = await started()
+        v1, v2 = Socket(), Socket([realtime.PROTOCOL_V2])
+        await manager.connect(v1)
+        await manager.connect(v2)
+        manager.connections[v2].batch_window = 0
+        events = [{"type": "message", "id": f"m{i}", "senderName": "Cư dân", "timestamp": 1.5 * i} for i in range(5)]
+        for event in events:
+            await manager.broadcast(event)
+        await asyncio.sleep(0.05)
+        for ws in (v1, v2):
+            manager.disconnect(ws)
+        return events, v1, v2
+
+    events, v1, v2 = run(scenario())
+    assert v1.text == events
+    assert [event for frame in v2.binary for event in frame] == events
+
+
+class Incoming:
+    def __init__(self, *frames):
+        self.frames = list(frames)
+
+    async def receive(self):
+        return self.frames.pop(0)
+
+
+def test_receive_decodes_json_and_msgpack():
+    payload = {"type": "chat", "text": "xin chào", "senderId": "u1"}
+    ws = Incoming({"type": "websocket.receive", "text": realtime.encode_frame(payload)},
+                  {"type": "websocket.receive", "bytes": realtime.encode_binary(payload)},
+                  {"type": "websocket.disconnect", "code": 1001})
+    manager = realtime.ConnectionManager()
+
+    async def scenario():
+        received = [await manager.receive(ws), await manager.receive(ws)]
+        try:
+            await manager.receive(ws)
+        except realtime.WebSocketDisconnect as e:
+            received.append(e.code)
+        return received
+
+    assert run(scenario()) == [payload, payload, 1001]
@@ -0,0 +1,76 @@
+# backend/tests/test_scheduler.py
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+import migrations
+import models
+import scheduler
+import sync
+
+ROWS = 120
+SYNC_LIMIT = 50  # nhỏ hơn một lô của job: các dòng cùng updated_at phải trải qua nhiều trang
+
+
+@pytest.fixture
+def db(engine):
+    migrations.upgrade(engine)
+    session = Session(bind=engine)
+    session.add(models.User(id="admin", name="Admin", role="ADMIN", status="Active"))
+    session.add(models.Facility(id="f1", name="Pool", slot_minutes=60))
+    session.commit()
+    yield session
+    session.close()
+
+
+def _drain(db, cursor, name):
+    ids = []
+    for _ in range(20):
+        result = sync.collect_changes(db, "admin", cursor, limit=SYNC_LIMIT)
+        ids.extend(row.id for row in result["changes"][name])
+        cursor = result["cursor"]
+        if not result["has_more"]:
+            return ids
+    raise AssertionError("sync never finished")
+
+
+def _caught_up_cursor(db):
+    result = sync.collect_changes(db, "admin", limit=10000)
+    assert not result["has_more"]
+    return result["cursor"]
+
+
+def test_client_drains_overdue_bills_batch(db):
+    old = models.utcnow() - timedelta(days=1)
+    db.execute(insert(models.Bill.__table__), [
+        {"id": f"bill-{i:03d}", "user_id": "admin", "type": "Water", "amount": 1, "month": f"M{i}",
+         "status": "Unpaid", "due_date": date(2020, 1, 1), "updated_at": old}
+        for i in range(ROWS)
+    ])
+    db.commit()
+    cursor = _caught_up_cursor(db)
+
+    assert scheduler.mark_overdue_bills(db) == ROWS
+    stamps = {bill.updated_at for bill in db.query(models.Bill)}
+    assert len(stamps) == 1  # cả lô có cùng updated_at
+
+    ids = _drain(db, cursor, "bills")
+    assert sorted(ids) == sorted(f"bill-{i:03d}" for i in range(ROWS))
+    assert {bill.status for bill in db.query(models.Bill)} == {"Overdue"}
+
+
+def test_client_drains_completed_bookings_batch(db):
+    old = models.utcnow() - timedelta(days=1)
+    db.execute(insert(models.Booking.__table__), [
+        {"id": f"booking-{i:03d}", "facility_id": "f1", "user_id": "admin", "date": date(2020, 1, 1),
+         "time_slot": "08:00", "status": "Confirmed", "updated_at": old}
+        for i in range(ROWS)
+    ])
+    db.commit()
+    cursor = _caught_up_cursor(db)
+
+    assert scheduler.complete_past_bookings(db, now=datetime(2020, 1, 2, 12, 0)) == ROWS
+    ids = _drain(db, cursor, "bookings")
+    assert sorted(ids) == sorted(f"booking-{i:03d}" for i in range(ROWS))
@@ -0,0 +1,96 @@
+# backend/tests/test_search.py
+import itertools
+
+import pytest
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+import message_writer
+import migrations
+import models
+import search
+
+
+@pytest.fixture
+def db(engine):
+    migrations.upgrade(engine)
+    session = Session(bind=engine)
+    session.add(models.User(id="r1", name="Resident", role="RESIDENT", status="Active"))
+    session.commit()
+    search.corpus_size.forget()
+    yield session
+    session.close()
+    search.corpus_size.forget()
+
+
+def _messages(db, texts):
+    rows = [{"id": f"m{i}", "sender_id": "r1", "sender_name": "Resident", "text": text,
+             "timestamp": models.utcnow()} for i, text in enumerate(texts)]
+    message_writer._insert_batch(db, rows)
+
+
+def _shards(db, term: str) -> dict:
+    table = models.SearchTermShard
+    return dict(db.execute(select(table.shard, table.doc_count).where(table.term == term)).all())
+
+
+def test_indexing_does_not_write_a_shared_total_row(db):
+    _messages(db, ["hồ bơi mở cửa", "thang máy hỏng", "hồ bơi đóng cửa"])
+    assert _shards(db, "") == {}
+    assert sum(_shards(db, "boi").values()) == 2
+
+
+def test_term_counts_spread_over_shards(db, monkeypatch):
+    # Mỗi lô ghi vào một shard: lô đồng thời không cùng cập nhật một dòng của term phổ biến
+    shards = itertools.cycle([3, 7, 3])
+    monkeypatch.setattr(search.random, "randrange", lambda n: next(shards))
+    for batch in range(3):
+        rows = [{"id": f"b{batch}-{i}", "sender_id": "r1", "sender_name": "Resident", "text": "hồ bơi",
+                 "timestamp": models.utcnow()} for i in range(2)]
+        message_writer._insert_batch(db, rows)
+    assert _shards(db, "boi") == {3: 4, 7: 2}
+    # idf đọc tổng các shard
+    weights = search._query_terms(db, "bơi")
+    total = search.corpus_size.get(db)
+    assert weights["boi"] == pytest.approx(search.math.log(1 + (total - 6 + 0.5) / (6 + 0.5)))
+    assert db.execute(select(func.count()).select_from(models.SearchTermShard)).scalar() == 4
+
+
+def test_corpus_size_counts_source_rows_and_expires(db):
+    _messages(db, ["hồ bơi mở cửa", "thang máy hỏng"])
+    assert search.corpus_size.get(db) == 2
+    db.add(models.Announcement(id="a1", title="Bảo trì thang máy", content="Sáng mai"))
+    db.commit()
+    assert search.corpus_size.get(db) == 2  # còn trong TTL
+    search.corpus_size.expires_at = 0
+    assert search.corpus_size.get(db) == 3
+
+
+def test_ranking_uses_corpus_size(db):
+    _messages(db, ["thang máy hỏng"] + [f"tin nhắn số {i} về hồ bơi" for i in range(5)])
+    result = search.search(db, "thang máy")
+    assert [hit["id"] for hit in result["items"]] == ["m0"]
+    # 'boi' có trong 5/6 tài liệu (> COMMON_TERM_RATIO) nhưng vẫn tìm được khi là từ duy nhất
+    assert len(search.search(db, "hồ bơi")["items"]) == 5
+
+
+def test_candidates_are_capped_per_term(db, monkeypatch):
+    monkeypatch.setattr(search, "MAX_TERM_CANDIDATES", 3)
+    # tf của 'boi' trong m_i là i + 1; 'thang' chỉ có trong hai tài liệu tf thấp
+    # (thêm tài liệu khác để 'boi' không bị coi là từ quá phổ biến)
+    _messages(db, [" ".join(["bơi"] * (i + 1)) + (" thang" if i < 2 else "") for i in range(10)]
+              + [f"xin chào {i}" for i in range(12)])
+
+    def ids(q):
+        return [hit["id"] for hit in search.search(db, q, limit=50)["items"]]
+
+    # Chỉ 3 tài liệu tf cao nhất của mỗi term được chấm điểm
+    assert ids("bơi") == ["m9", "m8", "m7"]
+    # Tài liệu tìm thấy nhờ từ khác vẫn được cộng điểm của 'boi'
+    assert ids("thang bơi") == ["m1", "m0", "m9", "m8", "m7"]
+
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    search.search(db, "thang bơi", limit=50)
+    assert any("ORDER BY search_postings.tf DESC" in s and "LIMIT" in s for s in statements)
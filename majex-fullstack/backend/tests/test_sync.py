@@ -0,0 +1,94 @@
+# backend/tests/test_sync.py
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+import migrations
+import models
+import pagination
+import sync
+
+
+@pytest.fixture
+def db(engine):
+    migrations.upgrade(engine)
+    session = Session(bind=engine)
+    session.add(models.User(id="admin", name="Admin", role="ADMIN", status="Active"))
+    session.add(models.User(id="r1", name="Resident", role="RESIDENT", status="Active"))
+    session.commit()
+    yield session
+    session.close()
+
+
+def _drain(db, user_id, cursor=None, limit=10, max_calls=50):
+    seen = {}
+    for _ in range(max_calls):
+        result = sync.collect_changes(db, user_id, cursor, limit=limit)
+        for name, rows in result["changes"].items():
+            seen.setdefault(name, []).extend(row.id for row in rows)
+        cursor = result["cursor"]
+        if not result["has_more"]:
+            return seen, cursor
+    raise AssertionError("sync never finished")
+
+
+def test_more_rows_than_limit_with_one_updated_at(db):
+    stamp = models.utcnow() - timedelta(minutes=1)
+    db.execute(insert(models.Bill.__table__), [
+        {"id": f"bill-{i:03d}", "user_id": "r1", "type": "Water", "amount": 1, "month": f"M{i}",
+         "status": "Overdue", "updated_at": stamp}
+        for i in range(25)
+    ])
+    db.commit()
+
+    seen, _cursor = _drain(db, "admin", limit=10)
+    assert sorted(seen["bills"]) == [f"bill-{i:03d}" for i in range(25)]
+    assert len(seen["bills"]) == 25  # không trả trùng giữa các trang
+
+
+def test_caught_up_cursor_keeps_safety_window(db):
+    _seen, cursor = _drain(db, "admin")
+    # Dòng được gán updated_at trong cửa sổ an toàn nhưng commit sau lần sync trước vẫn được trả
+    late = models.utcnow() - sync.SYNC_SAFETY_WINDOW / 2
+    db.add(models.Announcement(id="late", title="Late", content="", updated_at=late))
+    db.commit()
+    seen, _cursor = _drain(db, "admin", cursor)
+    assert seen["announcements"] == ["late"]
+
+
+def test_resident_only_sees_own_rows(db):
+    db.add_all([
+        models.Bill(id="mine", user_id="r1", type="Water", amount=1, month="M1", status="Unpaid"),
+        models.Bill(id="other", user_id="admin", type="Water", amount=1, month="M1", status="Unpaid"),
+    ])
+    db.commit()
+    seen, _cursor = _drain(db, "r1")
+    assert seen["bills"] == ["mine"]
+    assert seen["users"] == ["r1"]
+
+
+def test_legacy_single_timestamp_cursor(db):
+    db.add(models.Facility(id="f1", name="Pool"))
+    db.commit()
+    legacy = pagination.encode_cursor([datetime(2000, 1, 1)])
+    seen, _cursor = _drain(db, "admin", legacy)
+    assert seen["facilities"] == ["f1"]
+    with pytest.raises(HTTPException):
+        sync.collect_changes(db, "admin", "not-a-cursor")
+
+
+@pytest.mark.parametrize("values", [
+    [1, "a"] * len(sync.ENTITIES),                               # số thay cho thời điểm
+    [{"dt": "2024-01-01T00:00:00"}, 5] * len(sync.ENTITIES),     # id không phải chuỗi
+    [{"d": "2024-01-01"}, "a"] * len(sync.ENTITIES),             # ngày thay cho thời điểm
+    ["2024-01-01", None] * len(sync.ENTITIES),
+    [42],                                                        # cursor cũ một giá trị, sai kiểu
+])
+def test_cursor_with_wrong_value_types_is_rejected(db, values):
+    with pytest.raises(HTTPException) as error:
+        sync.collect_changes(db, "admin", pagination.encode_cursor(values))
+    assert error.value.status_code == 400
+
@@ -0,0 +1,129 @@
+# backend/tests/test_warmup.py
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+import cache
+import main
+import notifications
+import warmup
+
+
+def _run(phases, retry_seconds=0.01):
+    async def scenario():
+        startup = warmup.Warmup(retry_seconds=retry_seconds)
+        startup.start(phases)
+        await asyncio.wait_for(startup.task, 2)
+        return startup
+
+    return asyncio.run(scenario())
+
+
+def test_phases_run_in_order_and_steps_in_parallel():
+    events = []
+
+    def step(name, delay=0.0):
+        async def run():
+            events.append(("start", name))
+            await asyncio.sleep(delay)
+            events.append(("end", name))
+        return run
+
+    startup = _run([
+        [("schema", step("schema"), True)],
+        [("pool", step("pool", 0.02), True), ("cache", step("cache"), False)],
+        [("scheduler", step("scheduler"), False)],
+    ])
+    assert startup.ready and startup.status()["status"] == "ready"
+    # pha 2 bắt đầu sau khi pha 1 xong; hai bước của pha 2 chạy chồng lên nhau; pha 3 chờ cả pha 2
+    assert events[:2] == [("start", "schema"), ("end", "schema")]
+    assert set(events[2:4]) == {("start", "pool"), ("start", "cache")}
+    assert events[-2:] == [("start", "scheduler"), ("end", "scheduler")]
+    assert set(startup.checks) == {"schema", "pool", "cache", "scheduler"}
+
+
+def test_optional_failure_does_not_block_readiness():
+    async def broken():
+        raise RuntimeError("cache unavailable")
+
+    async def ok():
+        pass
+
+    startup = _run([[("pool", ok, True), ("cache", broken, False)]])
+    assert startup.ready
+    assert startup.checks["cache"] == {"ok": False, "seconds": startup.checks["cache"]["seconds"],
+                                       "error": "cache unavailable"}
+
+
+def test_required_failure_is_retried_until_it_succeeds():
+    calls = {"pool": 0, "other": 0}
+    states = []
+
+    async def flaky_pool():
+        calls["pool"] += 1
+        if calls["pool"] < 3:
+            raise ConnectionError("db not up")
+
+    async def other():
+        calls["other"] += 1
+
+    async def scenario():
+        startup = warmup.Warmup(retry_seconds=0.02)
+        startup.start([[("pool", flaky_pool, True), ("other", other, True)]])
+        while not startup.task.done():
+            states.append(startup.state)
+            await asyncio.sleep(0.005)
+        return startup
+
+    startup = asyncio.run(scenario())
+    assert startup.ready and calls == {"pool": 3, "other": 1}  # chỉ bước lỗi được chạy lại
+    assert "error" in states and startup.checks["pool"]["ok"]
+
+
+def test_stop_reports_not_ready():
+    async def never():
+        await asyncio.sleep(10)
+
+    async def scenario():
+        startup = warmup.Warmup()
+        startup.start([[("pool", never, True)]])
+        await asyncio.sleep(0)
+        assert startup.state == "starting" and not startup.ready
+        await startup.stop()
+        return startup
+
+    startup = asyncio.run(scenario())
+    assert startup.status()["status"] == "stopping" and startup.task.cancelled()
+
+
+def test_healthz_and_readyz_follow_startup_state(monkeypatch):
+    startup = warmup.Warmup()
+    monkeypatch.setattr(main, "startup", startup)
+    client = TestClient(main.app)  # không chạy lifespan: trạng thái do test đặt
+
+    assert client.get("/healthz").json() == {"status": "ok"}
+    response = client.get("/readyz")
+    assert response.status_code == 503 and response.json()["status"] == "starting"
+    startup.state = "error"
+    assert client.get("/readyz").status_code == 503
+    startup.state = "ready"
+    assert client.get("/readyz").status_code == 200
+    startup.state = "stopping"
+    assert client.get("/readyz").status_code == 503
+    assert client.get("/healthz").status_code == 200
+
+
+def test_app_becomes_ready_after_warmup(monkeypatch):
+    # lifespan gắn publisher vào event loop của TestClient; gỡ ra khi loop đó đóng
+    monkeypatch.setattr(notifications, "_publisher", None)
+    monkeypatch.setattr(cache, "_publisher", None)
+    with TestClient(main.app) as client:
+        assert client.get("/healthz").status_code == 200
+        deadline = time.monotonic() + 10
+        while client.get("/readyz").status_code != 200:
+            assert time.monotonic() < deadline, client.get("/readyz").json()
+            time.sleep(0.05)
+        checks = client.get("/readyz").json()["checks"]
+        assert {"schema", "pool", "backplane"} <= set(checks)
+        assert all(checks[name]["ok"] for name in ("schema", "pool", "backplane"))
@@ -0,0 +1,129 @@
+# backend/warmup.py
+# Khởi động hai pha. Lifespan không chạm DB trước khi yield: worker nhận kết nối sau vài
+# ms và /healthz (liveness) trả lời ngay. Việc cần DB chạy trong một task nền, theo từng
+# pha; các bước trong cùng một pha chạy song song:
+#   1. kiểm tra / chạy migration
+#   2. mở sẵn kết nối trong pool, khởi động backplane, nạp cache nóng (facilities,
+#      announcements, tin nhắn gần đây, booking hôm nay)
+#   3. job nền
+# /readyz (readiness) chỉ trả 200 khi các bước bắt buộc đã xong, để load balancer chỉ
+# chuyển request tới worker đã "ấm". Bước bắt buộc lỗi (vd: DB chưa lên) được thử lại
+# sau WARMUP_RETRY_SECONDS; bước tùy chọn lỗi chỉ được ghi lại (cache sẽ nạp khi có request).
+import asyncio
+import os
+import time
+
+from sqlalchemy import text
+
+import database
+import migrations
+
+# Số kết nối mở sẵn cho mỗi engine (mặc định = pool_size)
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", str(database.DB_POOL_SIZE)))
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "5"))
+
+
+# --- CÁC BƯỚC DÙNG CHUNG ---
+
+async def check_schema():
+    if migrations.AUTO_MIGRATE:
+        await asyncio.to_thread(migrations.upgrade)
+        return
+    missing = await asyncio.to_thread(migrations.pending)
+    if missing:
+        raise RuntimeError(f"pending migrations: {[f'{v:04d} {n}' for v, n in missing]}")
+
+
+def _ping(engine):
+    connection = engine.connect()
+    connection.execute(text("SELECT 1"))
+    return connection
+
+
+async def warm_pool(engine, count: int = WARMUP_CONNECTIONS):
+    """Mở đồng thời `count` kết nối rồi trả về pool (request đầu tiên không phải chờ kết nối mới)."""
+    connections = await asyncio.gather(*(asyncio.to_thread(_ping, engine) for _ in range(count)),
+                                       return_exceptions=True)
+    for connection in connections:
+        if not isinstance(connection, BaseException):
+            connection.close()
+    errors = [c for c in connections if isinstance(c, BaseException)]
+    if errors:
+        raise errors[0]
+
+
+async def _ping_async(engine):
+    connection = await engine.connect()
+    await connection.execute(text("SELECT 1"))
+    return connection
+
+
+async def warm_async_pool(engine, count: int = WARMUP_CONNECTIONS):
+    connections = await asyncio.gather(*(_ping_async(engine) for _ in range(count)), return_exceptions=True)
+    for connection in connections:
+        if not isinstance(connection, BaseException):
+            await connection.close()
+    errors = [c for c in connections if isinstance(c, BaseException)]
+    if errors:
+        raise errors[0]
+
+
+# --- TRẠNG THÁI ---
+
+class Warmup:
+    def __init__(self, retry_seconds: float = WARMUP_RETRY_SECONDS):
+        self.retry_seconds = retry_seconds
+        self.state = "starting"  # starting | ready | error | stopping
+        self.checks = {}  # tên bước -> {"ok", "seconds", "error"}
+        self.started = time.monotonic()
+        self.ready_seconds = None
+        self.task = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def start(self, phases):
+        """phases: danh sách pha, mỗi pha là các (tên, hàm async không tham số, bắt buộc?)."""
+        self.started = time.monotonic()
+        self.task = asyncio.create_task(self._run(phases))
+
+    async def stop(self):
+        # Báo not-ready ngay để load balancer ngừng chuyển request trong lúc tắt
+        self.state = "stopping"
+        if self.task and not self.task.done():
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+
+    async def _step(self, name: str, func) -> bool:
+        started = time.perf_counter()
+        try:
+            await func()
+            error = None
+        except Exception as e:
+            error = str(e)[:300] or type(e).__name__
+            print(f"Warmup step '{name}' failed: {error}")
+        self.checks[name] = {"ok": error is None, "seconds": round(time.perf_counter() - started, 3), "error": error}
+        return error is None
+
+    async def _run(self, phases):
+        for phase in phases:
+            steps = list(phase)
+            while steps:
+                results = await asyncio.gather(*(self._step(name, func) for name, func, _required in steps))
+                if all(ok or not required for ok, (_name, _func, required) in zip(results, steps)):
+                    break
+                self.state = "error"
+                await asyncio.sleep(self.retry_seconds)
+                self.state = "starting"
+                steps = [step for step, ok in zip(steps, results) if not ok]
+        self.ready_seconds = round(time.monotonic() - self.started, 3)
+        self.state = "ready"
+        print(f"Worker ready in {self.ready_seconds}s")
+
+    def status(self) -> dict:
+        return {
+            "status": self.state,
+            "readySeconds": self.ready_seconds,
+            "checks": self.checks,
+        }
@@ -6,7 +6,7 @@ import { Dashboard } from './components/Dashboard';
 import { BookingSystem } from './components/BookingSystem';
 import { CommunityChat } from './components/Chat';
 import { Payments } from './components/Payments';
-import { User, UserRole, Bill, Booking, Message, ResidentRecord, Report, Facility } from './types';
+import { User, UserRole, Bill, Booking, Message, ResidentRecord, Report, Facility, Notification } from './types';
 import { Menu } from 'lucide-react';
 import { Login } from './components/Login';
 import { MyQRCodes } from './components/MyQRCodes';
@@ -62,6 +62,11 @@ export default function App() {
   const [announcements, setAnnouncements] = useState<any[]>([]);
   // [NEW] Online users count for chat
   const [onlineCount, setOnlineCount] = useState<number>(1);
+  // Cursor (timestamp, id) để xin tin nhắn cũ hơn qua WebSocket; null = đã hết lịch sử
+  const [chatCursor, setChatCursor] = useState<string | null>(null);
+  // Hộp thư thông báo (trang mới nhất) và số chưa đọc; thông báo mới đến qua WebSocket
+  const [notifications, setNotifications] = useState<Notification[]>([]);
+  const [unread, setUnread] = useState<{ unread: number; capped: boolean }>({ unread: 0, capped: false });
 
   // WebSocket Reference
   const ws = useRef<WebSocket | null>(null);
@@ -71,17 +76,18 @@ export default function App() {
     if (isLoggedIn && currentUser) {
       const fetchData = async () => {
         try {
-          // A. Load các dữ liệu chung (Facilities, Chat History, Announcements, Bookings, Users)
-          const [fetchedFacilities, fetchedMessages, fetchedAnnouncements, fetchedBookings, fetchedUsers] = await Promise.all([
+          // A. Load các dữ liệu chung (Facilities, Announcements, Bookings, Users)
+          // Lịch sử chat do WebSocket gửi ngay khi kết nối (frame 'history')
+          const [fetchedFacilities, fetchedAnnouncements, fetchedBookings, fetchedUsers] = await Promise.all([
             api.getFacilities(),
-            api.getMessages(),
             api.getAnnouncements ? api.getAnnouncements() : Promise.resolve([]),
             api.getBookings ? api.getBookings() : Promise.resolve([]),
             api.getUsers ? api.getUsers() : Promise.resolve([])
           ]);
+          api.getNotifications(currentUser.id).then(page => setNotifications(page.items || []));
+          api.getUnreadCount(currentUser.id).then(setUnread);
 
           setFacilities(fetchedFacilities || []);
-          setMessages(fetchedMessages || []);
           setAnnouncements(fetchedAnnouncements || []);
           setBookings(fetchedBookings || []);
 
@@ -147,6 +153,23 @@ export default function App() {
             setOnlineCount(data.count);
             return;
           }
+          // lịch sử: N tin mới nhất lúc kết nối, hoặc một trang cũ hơn khi backfill
+          if (data.type === 'history' && Array.isArray(data.messages)) {
+            setMessages((prev) => {
+              const known = new Set(prev.map(m => m.id));
+              const merged = [...data.messages.filter((m: Message) => !known.has(m.id)), ...prev];
+              return merged.sort((a, b) => a.timestamp - b.timestamp);
+            });
+            setChatCursor(data.hasMore ? data.cursor : null);
+            return;
+          }
+          // thông báo mới (server chỉ gửi cho đúng tòa / căn hộ / user đã identify)
+          if (data.type === 'notification') {
+            const { type, ...notification } = data;
+            setNotifications((prev) => prev.some(n => n.id === notification.id) ? prev : [{ ...notification, read: false }, ...prev]);
+            setUnread((prev) => ({ ...prev, unread: prev.unread + 1 }));
+            return;
+          }
           // chat message object
           if (data.type === 'message' || data.senderId) {
             setMessages((prev) => [...prev, data]);
@@ -184,6 +207,9 @@ export default function App() {
     localStorage.removeItem('majex_token');
     localStorage.removeItem('majex_user');
     setMessages([]);
+    setChatCursor(null);
+    setNotifications([]);
+    setUnread({ unread: 0, capped: false });
     setBills([]);
     setReports([]);
     setResidents([]);
@@ -193,6 +219,24 @@ export default function App() {
     if (ws.current) ws.current.close();
   };
 
+  // Xin thêm tin nhắn cũ hơn cursor hiện tại (server trả về frame 'history')
+  const handleLoadOlderMessages = () => {
+    if (chatCursor && ws.current && ws.current.readyState === WebSocket.OPEN) {
+      ws.current.send(JSON.stringify({ type: 'backfill', cursor: chatCursor, limit: 50 }));
+    }
+  };
+
+  // Đánh dấu đã đọc tới thông báo mới nhất (server chỉ dời mốc đọc của user về phía trước)
+  const handleMarkNotificationsRead = async () => {
+    if (!currentUser || notifications.length === 0) return;
+    try {
+      setUnread(await api.markNotificationsRead(currentUser.id, notifications[0].id));
+      setNotifications((prev) => prev.map(n => ({ ...n, read: true })));
+    } catch (e) {
+      console.error(e);
+    }
+  };
+
   // Chat Handler (Gửi qua WebSocket) - [FIX] Gửi kèm số phòng nếu resident
   const handleSendMessage = (text: string) => {
     if (!currentUser) return;
@@ -270,9 +314,11 @@ export default function App() {
   // Booking (Lưu DB)
   const handleAddBooking = async (b: Booking) => {
     try {
+      // Server cấp mã QR (token ký) cho booking, dùng bản đã lưu thay cho bản tạo ở client
       const saved = await api.createBooking(b);
       setBookings(p => [...p, saved]);
       alert("Đặt chỗ thành công!");
+      return saved as Booking;
     } catch (e) {
       console.error("Booking error:", e);
       alert("Lỗi khi đặt chỗ. Vui lòng thử lại.");
@@ -301,10 +347,15 @@ export default function App() {
   const handleDeleteResident = (id: string) => setResidents(p => p.filter(r => r.id !== id));
   const handleUpdateFacility = (fac: Facility) => setFacilities(p => p.map(f => f.id === fac.id ? fac : f));
   const handleDeleteFacility = (id: string) => setFacilities(p => p.filter(f => f.id !== id));
-  const handleVerifyQR = (qrData: string) => {
-     const booking = bookings.find(b => b.qrCodeData === qrData);
-     if (!booking) return { valid: false, message: 'Mã không hợp lệ' };
-     return { valid: true, message: 'Hợp lệ', booking };
+  const handleVerifyQR = async (qrData: string) => {
+     try {
+       // Server kiểm tra chữ ký / ngày và check-in (mã đã dùng sẽ bị từ chối)
+       const result = await api.checkIn(qrData);
+       return { valid: result.valid, message: result.message, booking: result.booking ?? undefined };
+     } catch (e) {
+       console.error("Check-in error:", e);
+       return { valid: false, message: 'Không kết nối được máy chủ' };
+     }
   };
   const handleUpdateProfile = (u: Partial<User>) => setCurrentUser(p => ({...p, ...u}));
 
@@ -326,10 +377,13 @@ export default function App() {
                   // [NEW] Pass thêm data cho Dashboard tính toán
                   residentsCount={residents.length}
                   reportsCount={reports.filter(r => r.status === 'Pending').length}
+                  notifications={notifications}
+                  unreadCount={unread}
+                  onMarkRead={handleMarkNotificationsRead}
                />;
       case 'chat':
         // Pass onlineCount và tổng thành viên để hiển thị presence
-        return <CommunityChat user={currentUser} messages={messages} sendMessage={handleSendMessage} role={currentUser.role} onlineCount={onlineCount} totalMembers={residents.length + 1} />;
+        return <CommunityChat user={currentUser} messages={messages} sendMessage={handleSendMessage} role={currentUser.role} onlineCount={onlineCount} totalMembers={residents.length + 1} hasOlder={!!chatCursor} onLoadOlder={handleLoadOlderMessages} />;
       
       // Resident
       case 'payments':
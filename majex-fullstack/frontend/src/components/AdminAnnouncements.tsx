@@ -2,6 +2,7 @@
 import React, { useState } from 'react';
 import { generateAnnouncement } from '../services/geminiService';
 import { Sparkles, Send, Bell } from 'lucide-react';
+import { api } from '../services/api';
 
 export const AdminAnnouncements: React.FC = () => {
   const [topic, setTopic] = useState('');
@@ -17,6 +18,18 @@ export const AdminAnnouncements: React.FC = () => {
     setIsGenerating(false);
   };
 
+  // Lưu announcement; server tạo một thông báo chung và đẩy realtime tới mọi cư dân đang online
+  const handleSend = async () => {
+    try {
+      await api.createAnnouncement({ title: topic || generatedText.split('\n')[0].slice(0, 200), content: generatedText, tone });
+      alert('Announcement Sent!');
+      setGeneratedText('');
+      setTopic('');
+    } catch (e) {
+      alert('Gửi thông báo thất bại');
+    }
+  };
+
   return (
     <div className="space-y-6">
       <h2 className="text-2xl font-bold text-slate-800">Broadcast Announcements</h2>
@@ -84,7 +97,7 @@ export const AdminAnnouncements: React.FC = () => {
              <button 
                 className="flex-1 py-3 bg-slate-900 text-white rounded-lg hover:bg-slate-800 flex items-center justify-center gap-2 font-medium disabled:opacity-50"
                 disabled={!generatedText}
-                onClick={() => {alert('Announcement Sent!'); setGeneratedText(''); setTopic('');}}
+                onClick={handleSend}
               >
                 <Send className="w-4 h-4" /> Send to All Residents
               </button>
@@ -4,7 +4,7 @@ import { ScanLine, CheckCircle, XCircle, Camera, RefreshCw, AlertTriangle } from
 import { Booking } from '../types';
 
 interface AdminScannerProps {
-  onVerify: (qrData: string) => { valid: boolean; message: string; booking?: Booking };
+  onVerify: (qrData: string) => Promise<{ valid: boolean; message: string; booking?: Booking }>;
 }
 
 export const AdminScanner: React.FC<AdminScannerProps> = ({ onVerify }) => {
@@ -87,10 +87,10 @@ export const AdminScanner: React.FC<AdminScannerProps> = ({ onVerify }) => {
     };
   }, [isScanning, result]);
 
-  const handleScan = (data: string) => {
+  const handleScan = async (data: string) => {
     setIsScanning(false);
-    // Verify logic
-    const verificationResult = onVerify(data);
+    // Verify logic (server-side check-in)
+    const verificationResult = await onVerify(data);
     setResult(verificationResult);
   };
 
@@ -1,12 +1,13 @@
 
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
+import { api } from '../services/api';
 import { Facility, Booking, User } from '../types';
 import { QRCodeCanvas } from 'qrcode.react';
 import { Clock, CheckCircle, Calendar, Trash2, XCircle, DollarSign } from 'lucide-react';
 
 interface BookingSystemProps {
   user: User;
-  addBooking: (booking: Booking) => void;
+  addBooking: (booking: Booking) => Promise<Booking | undefined>;
   cancelBooking: (bookingId: string) => void;
   bookings: Booking[];
   facilities: Facility[]; 
@@ -19,12 +20,26 @@ export const BookingSystem: React.FC<BookingSystemProps> = ({ user, addBooking,
   const [selectedDate, setSelectedDate] = useState<string>(new Date().toISOString().split('T')[0]);
   const [selectedSlot, setSelectedSlot] = useState<string | null>(null);
   const [successModal, setSuccessModal] = useState<Booking | null>(null);
+  // Lịch trống lấy từ server (null = chưa tải được, dùng TIME_SLOTS mặc định)
+  const [availability, setAvailability] = useState<{ timeSlot: string; available: boolean }[] | null>(null);
+
+  useEffect(() => {
+    if (!selectedFacility) return;
+    let cancelled = false;
+    api.getAvailability(selectedFacility.id, selectedDate)
+      .then(res => { if (!cancelled) setAvailability(res ? res.slots : null); })
+      .catch(() => { if (!cancelled) setAvailability(null); });
+    return () => { cancelled = true; };
+  }, [selectedFacility, selectedDate, bookings]);
+
+  const slotOptions = availability ? availability.map(s => s.timeSlot) : TIME_SLOTS;
 
   const isSlotOccupied = (facilityId: string, date: string, slot: string) => {
+    if (availability) return !availability.find(s => s.timeSlot === slot)?.available;
     return bookings.some(b => b.facilityId === facilityId && b.date === date && b.timeSlot === slot && b.status === 'Confirmed');
   };
 
-  const handleBook = () => {
+  const handleBook = async () => {
     if (!selectedFacility || !selectedSlot) return;
 
     const newBooking: Booking = {
@@ -39,8 +54,9 @@ export const BookingSystem: React.FC<BookingSystemProps> = ({ user, addBooking,
       status: 'Confirmed'
     };
 
-    addBooking(newBooking);
-    setSuccessModal(newBooking);
+    // Hiển thị mã QR do server cấp (nếu lưu thất bại thì không có mã để hiển thị)
+    const saved = await addBooking(newBooking);
+    if (saved) setSuccessModal(saved);
     setSelectedSlot(null);
   };
 
@@ -111,7 +127,7 @@ export const BookingSystem: React.FC<BookingSystemProps> = ({ user, addBooking,
             <div>
               <label className="block text-sm font-medium text-slate-700 mb-2">Available Slots</label>
               <div className="grid grid-cols-3 gap-2">
-                {TIME_SLOTS.map(slot => {
+                {slotOptions.map(slot => {
                   const occupied = isSlotOccupied(selectedFacility.id, selectedDate, slot);
                   return (
                     <button
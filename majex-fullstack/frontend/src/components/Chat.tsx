@@ -9,6 +9,8 @@ interface ChatProps {
   role: UserRole;
   onlineCount: number; // Nhận số lượng online thật
   totalMembers: number; // Nhận tổng số thành viên thật
+  hasOlder?: boolean; // Còn tin nhắn cũ hơn trên server
+  onLoadOlder?: () => void;
 }
 
 export const CommunityChat: React.FC<ChatProps> = ({ 
@@ -17,7 +19,9 @@ export const CommunityChat: React.FC<ChatProps> = ({
   sendMessage, 
   role, 
   onlineCount, 
-  totalMembers 
+  totalMembers,
+  hasOlder,
+  onLoadOlder
 }) => {
   const [input, setInput] = useState('');
   const messagesEndRef = useRef<HTMLDivElement>(null);
@@ -27,9 +31,11 @@ export const CommunityChat: React.FC<ChatProps> = ({
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
   };
 
+  // Chỉ cuộn khi có tin mới ở cuối (không cuộn khi nạp thêm tin cũ ở đầu)
+  const lastMessageId = messages.length ? messages[messages.length - 1].id : null;
   useEffect(() => {
     scrollToBottom();
-  }, [messages]);
+  }, [lastMessageId]);
 
   const handleSend = (e?: React.FormEvent) => {
     if (e) e.preventDefault();
@@ -55,6 +61,13 @@ export const CommunityChat: React.FC<ChatProps> = ({
 
       {/* Messages Area */}
       <div className="flex-1 overflow-y-auto p-4 space-y-4 bg-slate-50/50">
+        {hasOlder && onLoadOlder && (
+          <div className="text-center">
+            <button onClick={onLoadOlder} className="text-xs text-indigo-600 hover:underline">
+              Xem tin nhắn cũ hơn
+            </button>
+          </div>
+        )}
         {messages.length === 0 ? (
           <div className="text-center text-slate-400 mt-10 text-sm">
             Chưa có tin nhắn nào. Hãy bắt đầu cuộc trò chuyện!
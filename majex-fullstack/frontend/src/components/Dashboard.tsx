@@ -1,7 +1,8 @@
-import React from 'react';
-import { UserRole, User, Bill, Booking } from '../types';
+import React, { useEffect, useState } from 'react';
+import { UserRole, User, Bill, Booking, Notification } from '../types';
 import { BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer, PieChart, Pie, Cell } from 'recharts';
 import { DollarSign, Calendar, Users, AlertCircle } from 'lucide-react';
+import { api } from '../services/api';
 
 interface DashboardProps {
   user: User;
@@ -10,22 +11,39 @@ interface DashboardProps {
   bookings: Booking[];
   residentsCount?: number; // [NEW] Nhận số liệu thật
   reportsCount?: number;   // [NEW] Nhận số liệu thật
+  notifications?: Notification[];
+  unreadCount?: { unread: number; capped: boolean };
+  onMarkRead?: () => void;
 }
 
+const NOTIFICATION_COLORS: Record<string, string> = {
+  announcement: 'border-blue-500',
+  bill: 'border-orange-500',
+  report: 'border-green-500',
+  notice: 'border-yellow-500',
+};
+
 export const Dashboard: React.FC<DashboardProps> = ({ 
-  user, role, bills, bookings, residentsCount = 0, reportsCount = 0 
+  user, role, bills, bookings, residentsCount = 0, reportsCount = 0,
+  notifications = [], unreadCount, onMarkRead
 }) => {
   const pendingBills = bills.filter(b => b.status === 'Unpaid' || b.status === 'Overdue');
   const upcomingBookings = bookings.filter(b => new Date(b.date) >= new Date() && b.status === 'Confirmed');
 
+  // Admin: số liệu tổng hợp tính sẵn trên server (/admin/summary)
+  const [summary, setSummary] = useState<any>(null);
+  useEffect(() => {
+    if (role === UserRole.ADMIN) api.getAdminSummary().then(setSummary).catch(() => setSummary(null));
+  }, [role, bills, bookings]);
+
   // Mock Data for Admin Charts
-  const paymentData = [
+  const mockPaymentData = [
     { name: 'Jan', amount: 4000 },
     { name: 'Feb', amount: 3000 },
     { name: 'Mar', amount: 5000 },
     { name: 'Apr', amount: 4500 },
   ];
-  const serviceUsageData = [
+  const mockServiceUsageData = [
     { name: 'Pool', value: 400 },
     { name: 'Gym', value: 300 },
     { name: 'Tennis', value: 200 },
@@ -34,12 +52,32 @@ export const Dashboard: React.FC<DashboardProps> = ({
   const COLORS = ['#0088FE', '#00C49F', '#FFBB28', '#FF8042'];
 
   // Admin: Tính tổng doanh thu thực tế
-  const totalRevenue = bills
+  const totalRevenue = summary ? summary.collected : bills
     .filter(b => b.status === 'Paid')
     .reduce((sum, bill) => sum + bill.amount, 0);
   
   // Admin: Đếm số booking đang active
-  const activeBookingsCount = bookings.filter(b => b.status === 'Confirmed').length;
+  const activeBookingsCount = summary ? summary.activeBookings : bookings.filter(b => b.status === 'Confirmed').length;
+
+  // Admin: doanh thu đã thu theo tháng (6 tháng gần nhất) và lượt đặt theo tiện ích
+  const paidByMonth: Record<string, number> = {};
+  (summary?.bills || []).filter((r: any) => r.status === 'Paid').forEach((r: any) => {
+    paidByMonth[r.month] = (paidByMonth[r.month] || 0) + r.amount;
+  });
+  const paymentData = Object.keys(paidByMonth).length > 0
+    ? Object.entries(paidByMonth)
+        .sort(([a], [b]) => Date.parse(`1 ${a}`) - Date.parse(`1 ${b}`))
+        .slice(-6)
+        .map(([month, amount]) => ({ name: month.slice(0, 3), amount }))
+    : mockPaymentData;
+  const usageByFacility: Record<string, number> = {};
+  (summary?.bookings || []).filter((r: any) => r.status !== 'Cancelled').forEach((r: any) => {
+    const name = r.facilityName || r.facilityId;
+    usageByFacility[name] = (usageByFacility[name] || 0) + r.count;
+  });
+  const serviceUsageData = Object.keys(usageByFacility).length > 0
+    ? Object.entries(usageByFacility).map(([name, value]) => ({ name, value }))
+    : mockServiceUsageData;
 
   if (role === UserRole.RESIDENT) {
     return (
@@ -118,7 +156,30 @@ export const Dashboard: React.FC<DashboardProps> = ({
 
         {/* Notification Area */}
         <div className="bg-white rounded-xl shadow-sm p-6 border border-slate-100">
-          <h3 className="text-lg font-semibold text-slate-800 mb-4">Recent Announcements</h3>
+          <div className="flex justify-between items-center mb-4">
+            <h3 className="text-lg font-semibold text-slate-800">
+              Recent Announcements
+              {unreadCount && unreadCount.unread > 0 && (
+                <span className="ml-2 px-2 py-0.5 bg-red-100 text-red-600 text-xs rounded-full">
+                  {unreadCount.capped ? `${unreadCount.unread - 1}+` : unreadCount.unread} mới
+                </span>
+              )}
+            </h3>
+            {unreadCount && unreadCount.unread > 0 && onMarkRead && (
+              <button onClick={onMarkRead} className="text-xs text-indigo-600 hover:underline">Đánh dấu đã đọc</button>
+            )}
+          </div>
+          {notifications.length > 0 ? (
+            <div className="space-y-4">
+              {notifications.slice(0, 5).map(n => (
+                <div key={n.id} className={`border-l-4 ${NOTIFICATION_COLORS[n.kind] || 'border-slate-300'} pl-4 py-1`}>
+                  <h4 className={`text-slate-800 ${n.read ? 'font-normal' : 'font-semibold'}`}>{n.title}</h4>
+                  {n.body && <p className="text-sm text-slate-600 mt-1">{n.body}</p>}
+                  <p className="text-xs text-slate-400 mt-2">{new Date(n.timestamp).toLocaleString()}</p>
+                </div>
+              ))}
+            </div>
+          ) : (
           <div className="space-y-4">
             <div className="border-l-4 border-blue-500 pl-4 py-1">
               <h4 className="font-medium text-slate-800">Monthly Fire Drill</h4>
@@ -131,6 +192,7 @@ export const Dashboard: React.FC<DashboardProps> = ({
               <p className="text-xs text-slate-400 mt-2">Admin • 4 days ago</p>
             </div>
           </div>
+          )}
         </div>
       </div>
     );
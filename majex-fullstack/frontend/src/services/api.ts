@@ -3,7 +3,7 @@ export const WS_URL = 'ws://localhost:8000/ws/chat';
 
 export const api = {
   // --- USERS ---
-  getUsers: async () => (await fetch(`${API_URL}/users`)).json(),
+  getUsers: async () => (await fetch(`${API_URL}/users?paginate=false`)).json(),
   createUser: async (user: any) => (await fetch(`${API_URL}/users`, {
       method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(user)
   })).json(),
@@ -16,30 +16,72 @@ export const api = {
 
   // --- BILLS ---
   getMyBills: async (userId: string) => {
-      const res = await fetch(`${API_URL}/bills/${userId}`);
+      const res = await fetch(`${API_URL}/bills/${userId}?paginate=false`);
       return res.ok ? res.json() : [];
   },
   payBill: async (billId: string) => (await fetch(`${API_URL}/bills/${billId}/pay`, { method: 'PUT' })).json(),
 
   // --- CHAT ---
-  getMessages: async () => (await fetch(`${API_URL}/messages`)).json(),
+  getMessages: async () => (await fetch(`${API_URL}/messages?paginate=false`)).json(),
 
   // --- REPORTS ---
-  getReports: async () => (await fetch(`${API_URL}/reports`)).json(),
+  getReports: async () => (await fetch(`${API_URL}/reports?paginate=false`)).json(),
   createReport: async (report: any) => (await fetch(`${API_URL}/reports`, {
       method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(report)
   })).json(),
   resolveReport: async (reportId: string) => (await fetch(`${API_URL}/reports/${reportId}/resolve`, { method: 'PUT' })).json(),
 
   // --- BOOKINGS (FIXED) ---
-  getBookings: async () => (await fetch(`${API_URL}/bookings`)).json(),
-  createBooking: async (booking: any) => (await fetch(`${API_URL}/bookings`, {
-      method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(booking)
-  })).json(),
+  getBookings: async () => (await fetch(`${API_URL}/bookings?paginate=false`)).json(),
+  createBooking: async (booking: any) => {
+      const res = await fetch(`${API_URL}/bookings`, {
+          method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(booking)
+      });
+      // 409 = khung giờ đã đủ chỗ (server kiểm tra trùng lịch)
+      if (!res.ok) throw new Error((await res.json()).detail || 'Booking failed');
+      return res.json();
+  },
+  getAvailability: async (facilityId: string, date: string) => {
+      const res = await fetch(`${API_URL}/facilities/${facilityId}/availability?date=${date}`);
+      return res.ok ? res.json() : null;
+  },
   cancelBooking: async (bookingId: string) => (await fetch(`${API_URL}/bookings/${bookingId}/cancel`, { method: 'PUT' })).json(),
 
+  // --- CHECK-IN (quét QR ở cổng; mỗi mã chỉ check-in được một lần) ---
+  checkIn: async (code: string, facilityId?: string) => (await fetch(`${API_URL}/checkin`, {
+      method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ code, facilityId })
+  })).json(),
+
+  // --- ADMIN (tổng hợp tính sẵn trên server) ---
+  getAdminSummary: async () => {
+      const res = await fetch(`${API_URL}/admin/summary`);
+      return res.ok ? res.json() : null;
+  },
+
+  // --- NOTIFICATIONS (hộp thư của từng user; thông báo mới đến qua WebSocket) ---
+  getNotifications: async (userId: string, cursor?: string) => {
+      const params = new URLSearchParams({ limit: '20' });
+      if (cursor) params.set('cursor', cursor);
+      const res = await fetch(`${API_URL}/notifications/${userId}?${params}`);
+      return res.ok ? res.json() : { items: [], nextCursor: null };
+  },
+  getUnreadCount: async (userId: string) => {
+      const res = await fetch(`${API_URL}/notifications/${userId}/unread-count`);
+      return res.ok ? res.json() : { unread: 0, capped: false };
+  },
+  markNotificationsRead: async (userId: string, until?: string) => (await fetch(`${API_URL}/notifications/${userId}/read`, {
+      method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ until })
+  })).json(),
+
   // --- ANNOUNCEMENTS ---
-  getAnnouncements: async () => (await fetch(`${API_URL}/announcements`)).json(),
+  getAnnouncements: async () => (await fetch(`${API_URL}/announcements?paginate=false`)).json(),
+  createAnnouncement: async (announcement: any) => {
+      const res = await fetch(`${API_URL}/announcements`, {
+          method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(announcement)
+      });
+      if (!res.ok) throw new Error('Announcement failed');
+      return res.json();
+  },
   
   WS_URL
 };
\ No newline at end of file
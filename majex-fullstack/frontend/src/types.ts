@@ -45,6 +45,7 @@ export interface Booking {
   timeSlot: string;
   qrCodeData: string;
   status: 'Confirmed' | 'Cancelled' | 'Completed';
+  checkedInAt?: number | null; // Thời điểm quét mã ở cổng (ms)
 }
 
 export interface Message {
@@ -58,11 +59,14 @@ export interface Message {
 
 export interface Notification {
   id: string;
+  audience: 'all' | 'building' | 'apartment' | 'user';
+  target: string;
+  kind: 'announcement' | 'bill' | 'report' | 'notice';
   title: string;
-  content: string;
-  date: string;
-  sender: string;
-  type: 'General' | 'Emergency' | 'Personal';
+  body: string;
+  refId?: string | null;
+  timestamp: number;
+  read?: boolean;
 }
 
 export interface ResidentRecord {